@@ -1,12 +1,21 @@
 import os
-from typing import Dict
-from openai import OpenAI
+from typing import AsyncIterator, Dict, List, Optional
 from rich.console import Console
+from llm_client import LLMClient, get_llm_client
+from llm_cache import LLMCache
+import snapshot
+from tracing import span
 
 class AIAnalyst:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    def __init__(self, llm: Optional[LLMClient] = None, cache: Optional[LLMCache] = None):
+        self.llm = llm or get_llm_client()
+        if cache is None and os.environ.get("LLM_CACHE_ENABLED", "1") != "0":
+            cache = LLMCache()
+        self.cache = cache
         self.console = Console()
+        self.model = "gpt-4o-mini"
+        self.temperature = 0.17
+        self.max_tokens = 1500
         self.system_prompt = """As an assistant personifying an Expert in Markets and Stock Market, your task is to provide counsel to the user regarding a stock after analyzing the information given to you. Utilize your deep understanding of macroeconomic indicators and market dynamics, expertise in fundamental and technical analysis, proficiency in risk management and portfolio construction, quantitative and analytical skills, ability to interpret financial statements and market data, familiarity with trading strategies and market microstructure, and skill in using financial modeling tools and data analytics.
 
 In addition, draw upon your strategic vision and leadership to design and implement complex investment strategies, mastery of advanced risk management and capital allocation techniques, knowledge of alternative investments, derivatives, and leverage strategies, quantitative analysis and financial modeling skills, expertise in identifying and exploiting market inefficiencies, regulatory and compliance knowledge, proficiency in investor relations and capital raising, team management and mentorship abilities, resilience and adaptability in changing market environments, and robust decision-making skills under pressure and uncertainty.
@@ -15,6 +24,7 @@ Provide comprehensive counsel that considers the user's needs and the current ma
 
     def format_analysis_data(self, ticker: str, data: Dict) -> str:
         """Format the stock analysis data for the AI prompt"""
+        data = snapshot.as_dict(data)
         current_price = data['market_data']['current_price']
         shares = data['market_data']['shares_outstanding']
         market_cap = current_price * shares
@@ -62,25 +72,77 @@ Historical FCF:
         
         return analysis
 
+    def build_messages(self, ticker: str, data: Dict) -> List[Dict[str, str]]:
+        """Build the chat messages for the analysis request"""
+        analysis_data = self.format_analysis_data(ticker, data)
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": f"Please analyze this stock data and provide your expert recommendation:\n\n{analysis_data}"}
+        ]
+
+    def cache_key(self, ticker: str, data: Dict) -> str:
+        """Cache key for the analysis of this ticker and data"""
+        return self.cache.make_key(self.model, self.system_prompt, self.temperature, ticker, snapshot.as_dict(data))
+
     async def get_analysis(self, ticker: str, data: Dict) -> str:
         """Get AI analysis for the stock"""
         try:
-            analysis_data = self.format_analysis_data(ticker, data)
-            
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": f"Please analyze this stock data and provide your expert recommendation:\n\n{analysis_data}"}
-            ]
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.17,
-                max_tokens=1500
-            )
+            key = self.cache_key(ticker, data) if self.cache else None
+            if key:
+                cached = await self.cache.get(key)
+                if cached:
+                    return cached
+
+            with span('ai_analysis', ticker=ticker, model=self.model):
+                response = await self.llm.chat(
+                    model=self.model,
+                    messages=self.build_messages(ticker, data),
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens
+                )
             
-            return response.choices[0].message.content
+            content = response.choices[0].message.content
+            if key and content:
+                await self.cache.set(key, content)
+            return content
             
         except Exception as e:
             self.console.print(f"\n[red]Error getting AI analysis: {str(e)}[/red]")
             return "AI analysis unavailable at the moment."
+
+    async def stream_analysis(self, ticker: str, data: Dict) -> AsyncIterator[str]:
+        """
+        Get AI analysis for the stock, yielding tokens as they arrive. A failure
+        before the first token yields the usual fallback message; a failure
+        after it raises, so the partial text is never passed off as complete.
+        """
+        yielded = False
+        try:
+            key = self.cache_key(ticker, data) if self.cache else None
+            if key:
+                cached = await self.cache.get(key)
+                if cached:
+                    yielded = True
+                    yield cached
+                    return
+
+            content = ""
+            with span('ai_analysis.stream', ticker=ticker, model=self.model) as trace:
+                async for token in self.llm.chat_stream(
+                    model=self.model,
+                    messages=self.build_messages(ticker, data),
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens
+                ):
+                    content += token
+                    yielded = True
+                    yield token
+                trace.set(chars=len(content))
+
+            if key and content:
+                await self.cache.set(key, content)
+        except Exception as e:
+            if yielded:
+                raise
+            self.console.print(f"\n[red]Error getting AI analysis: {str(e)}[/red]")
+            yield "AI analysis unavailable at the moment."
@@ -0,0 +1,367 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+import metrics
+import ratings
+import retry
+import tracing
+from database import Database
+from middleware.error_handler import APIError, error_handler_middleware
+from middleware.rate_limiter import rate_limit_middleware
+from schemas.validation import BatchValuationRequest, TerminalMethod
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI(title="IntrinsicAI", description="Análise de valor intrínseco de ações")
+
+# Os spans do pipeline alimentam o histograma de etapas mesmo com TRACE_MODE=off
+tracing.add_listener(metrics.observe_span)
+
+STORE_VALUATIONS = os.environ.get('API_STORE_VALUATIONS', '1') != '0'
+VALID_SOURCES = ('yahoo', 'alpha_vantage', 'both')
+# Prazo de cada avaliação: nenhuma retentativa começa se não couber no tempo restante
+REQUEST_DEADLINE = float(os.environ.get('API_DEADLINE_SECONDS', 30))
+# Com preferred_source='both', quanto esperar (s) pela fonte mais lenta para comparar os valores (0: não espera)
+RECONCILE_SECONDS = float(os.environ.get('API_RECONCILE_SECONDS', 0))
+
+_yahoo = None
+_dcf_model = None
+_ai_analyst = None
+_screener = None
+_pending_writes = set()
+
+
+def get_yahoo():
+    global _yahoo
+    if _yahoo is None:
+        from yahoo_finance import YahooFinanceAPI
+        _yahoo = YahooFinanceAPI(max_workers=int(os.environ.get('API_WORKERS', 8)))
+    return _yahoo
+
+
+def get_dcf_model():
+    global _dcf_model
+    if _dcf_model is None:
+        from dcf_model import DCFModel
+        api_key = os.environ.get('ALPHA_VANTAGE_API_KEY')
+        if not api_key:
+            raise APIError(503, "ALPHA_VANTAGE_API_KEY não configurada")
+        _dcf_model = DCFModel(api_key)
+    return _dcf_model
+
+
+def get_ai_analyst():
+    global _ai_analyst
+    if _ai_analyst is None:
+        from ai_analysis import AIAnalyst
+        _ai_analyst = AIAnalyst()
+    return _ai_analyst
+
+
+def get_screener():
+    global _screener
+    if _screener is None:
+        from screener import Screener
+        _screener = Screener()
+    return _screener
+
+
+# Registrados de dentro para fora: rate limit, tratamento de erros e, por fora, as métricas
+app.middleware("http")(rate_limit_middleware)
+app.middleware("http")(error_handler_middleware)
+
+
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    metrics.HTTP_REQUESTS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.HTTP_REQUESTS_IN_FLIGHT.dec()
+        # O template da rota mantém a cardinalidade baixa (um rótulo por endpoint, não por ticker)
+        route = request.scope.get('route')
+        endpoint = getattr(route, 'path', 'unmatched')
+        metrics.HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            endpoint=endpoint, method=request.method, status=str(status)
+        )
+
+
+@app.get("/ping")
+async def ping():
+    return {"status": "ok"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+async def _yahoo_valuation(ticker: str) -> Dict:
+    try:
+        data = await get_yahoo().get_financials(ticker)
+    except Exception as e:
+        _raise_if_expired(e)
+        raise APIError(502, "Falha ao obter dados do Yahoo Finance", str(e))
+    value = ratings.valuation(data)
+    return {
+        'source': 'yahoo',
+        'current_price': data['market_data']['current_price'],
+        'intrinsic_value': value['fair_value'],
+        'details': {
+            'fcf_per_share': value['fcf_per_share'],
+            'wacc': data['valuation'].get('wacc'),
+            'suggested_multiple': data['valuation']['suggested_multiple'],
+            'fcf_growth_rate': data['cash_flow']['free_cashflow']['growth_rate'],
+        },
+        'data': data,
+    }
+
+
+async def _quote(ticker: str) -> Optional[float]:
+    """Latest price (Yahoo fast quote); None if unavailable, so no upside or recommendation is made up"""
+    try:
+        return await get_yahoo().get_current_price(ticker)
+    except Exception as e:
+        logger.warning(f"Cotação de {ticker} indisponível: {str(e)}")
+        return None
+
+
+async def _alpha_vantage_valuation(ticker: str, growth_rate: Optional[float], discount_rate: float,
+                                   terminal_method: str, quote: Optional[asyncio.Future] = None) -> Dict:
+    """DCF valuation; quote is a price task shared with the caller (started here if not given)"""
+    # O OVERVIEW do Alpha Vantage não traz cotação (market_price é a máxima de 52 semanas): a cotação vem do Yahoo
+    own_quote = quote is None
+    if own_quote:
+        quote = asyncio.ensure_future(_quote(ticker))
+    try:
+        result = await get_dcf_model().calculate_intrinsic_value(
+            ticker, growth_rate=growth_rate, discount_rate=discount_rate, terminal_method=terminal_method
+        )
+        # Cotação compartilhada: cancelar esta avaliação não pode cancelar a cotação de quem chamou
+        current_price = await (quote if own_quote else asyncio.shield(quote))
+    except BaseException:
+        if own_quote:
+            quote.cancel()
+        raise
+    return {
+        'source': 'alpha_vantage',
+        'current_price': current_price,
+        'intrinsic_value': result['dcf_analysis']['per_share_value'],
+        'details': result['dcf_analysis'],
+    }
+
+
+def _is_complete(valuation: Dict) -> bool:
+    value = valuation.get('intrinsic_value')
+    return value is not None and math.isfinite(value) and value > 0
+
+
+async def _hedged_valuation(ticker: str, growth_rate: Optional[float], discount_rate: float,
+                            terminal_method: str) -> Dict:
+    """
+    Both sources at once: the first complete valuation wins and the other is
+    cancelled, so one slow or throttled provider does not hold the response.
+    With API_RECONCILE_SECONDS the slower one gets that long to arrive and
+    is reported next to the winner. Either winner is priced with the same
+    Yahoo quote, so upside and recommendation do not depend on who won.
+    """
+    quote = asyncio.ensure_future(_quote(ticker))
+    try:
+        source, valuation, others = await retry.race({
+            'alpha_vantage': lambda: _alpha_vantage_valuation(
+                ticker, growth_rate, discount_rate, terminal_method, quote
+            ),
+            'yahoo': lambda: _yahoo_valuation(ticker),
+        }, validate=_is_complete, grace=RECONCILE_SECONDS)
+        price = await quote
+    except APIError:
+        raise
+    except Exception as e:
+        _raise_if_expired(e)
+        raise APIError(502, "Nenhuma fonte retornou uma avaliação válida", str(e))
+    finally:
+        quote.cancel()
+        await asyncio.gather(quote, return_exceptions=True)
+
+    if price is not None:
+        valuation['current_price'] = price
+
+    for other_source, other in others.items():
+        difference = (other['intrinsic_value'] - valuation['intrinsic_value']) / valuation['intrinsic_value'] * 100
+        valuation['details'] = dict(valuation['details'], reconciliation={
+            'source': other_source,
+            'intrinsic_value': round(other['intrinsic_value'], 2),
+            'difference': round(difference, 2),
+        })
+        # A análise da IA precisa dos dados do Yahoo, mesmo quando o Alpha Vantage chega primeiro
+        if 'data' in other and 'data' not in valuation:
+            valuation['data'] = other['data']
+    logger.debug(f"{ticker}: avaliação de {source} ({len(others)} fonte(s) reconciliada(s))")
+    return valuation
+
+
+def _store_in_background(valuation: Dict):
+    """Persist without holding the response; queued writes count in /metrics until MongoDB answers"""
+    task = asyncio.create_task(Database.store_valuation(dict(valuation)))
+    _pending_writes.add(task)
+    metrics.MONGO_PENDING_WRITES.inc()
+    task.add_done_callback(_write_done)
+
+
+def _write_done(task: asyncio.Task):
+    _pending_writes.discard(task)
+    metrics.MONGO_PENDING_WRITES.dec()
+
+
+def _raise_if_expired(error: Exception):
+    if retry.expired():
+        raise APIError(504, "Tempo limite da avaliação esgotado", str(error))
+
+
+async def _valuate(ticker: str, growth_rate: Optional[float], discount_rate: float, terminal_method: str,
+                   margin_of_safety: float, preferred_source: str, include_ai: bool = False) -> Dict:
+    with retry.deadline(REQUEST_DEADLINE):
+        return await _valuate_within_deadline(ticker, growth_rate, discount_rate, terminal_method,
+                                              margin_of_safety, preferred_source, include_ai)
+
+
+async def _valuate_within_deadline(ticker: str, growth_rate: Optional[float], discount_rate: float,
+                                   terminal_method: str, margin_of_safety: float, preferred_source: str,
+                                   include_ai: bool) -> Dict:
+    if preferred_source == 'yahoo':
+        valuation = await _yahoo_valuation(ticker)
+    elif preferred_source == 'both':
+        valuation = await _hedged_valuation(ticker, growth_rate, discount_rate, terminal_method)
+    else:
+        try:
+            valuation = await _alpha_vantage_valuation(ticker, growth_rate, discount_rate, terminal_method)
+        except APIError:
+            raise
+        except Exception as e:
+            _raise_if_expired(e)
+            raise
+
+    intrinsic_value = valuation['intrinsic_value']
+    current_price = valuation['current_price']
+    upside = ((intrinsic_value - current_price) / current_price * 100) if current_price else None
+    response = {
+        'ticker': ticker,
+        'source': valuation['source'],
+        'current_price': current_price,
+        'intrinsic_value': round(intrinsic_value, 2),
+        'margin_of_safety': margin_of_safety,
+        'margin_of_safety_value': round(intrinsic_value * (1 - margin_of_safety), 2),
+        'upside': round(upside, 2) if upside is not None else None,
+        'recommendation': ratings.recommendation(upside) if upside is not None else None,
+        'details': valuation['details'],
+    }
+
+    if STORE_VALUATIONS:
+        _store_in_background(response)
+
+    # A análise da IA usa os dados do Yahoo; no DCF do Alpha Vantage ela não se aplica
+    if include_ai and 'data' in valuation:
+        response['ai_analysis'] = await get_ai_analyst().get_analysis(ticker, valuation['data'])
+    return response
+
+
+@app.get("/api/v1/valuation/{ticker}")
+async def get_valuation(
+    ticker: str,
+    growth_rate: Optional[float] = Query(None, ge=0.0, le=1.0),
+    discount_rate: float = Query(0.1, ge=0.0, le=1.0),
+    terminal_method: TerminalMethod = Query(TerminalMethod.GORDON),
+    margin_of_safety: float = Query(0.3, ge=0.0, le=1.0),
+    preferred_source: str = Query('yahoo'),
+    include_ai: bool = Query(False),
+):
+    """Intrinsic value per share from Yahoo (FCF multiple) or Alpha Vantage (DCF)"""
+    ticker = ticker.upper()
+    if not ticker.replace('.', '').isalnum() or len(ticker) > 12:
+        raise APIError(422, "Ticker inválido", ticker)
+    preferred_source = preferred_source.lower()
+    if preferred_source not in VALID_SOURCES:
+        raise APIError(422, f"preferred_source deve ser um de {list(VALID_SOURCES)}")
+
+    return await _valuate(ticker, growth_rate, discount_rate, terminal_method.value,
+                          margin_of_safety, preferred_source, include_ai)
+
+
+def _sse(event: str, data) -> str:
+    """One server-sent event; data goes as JSON so tokens with line breaks stay in one frame"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.get("/api/v1/valuation/{ticker}/analysis/stream")
+async def stream_analysis(ticker: str):
+    """
+    AI analysis as server-sent events: one `token` event per chunk, then
+    `done`, or `error` if the model fails halfway (the text already sent
+    is incomplete).
+    """
+    ticker = ticker.upper()
+    if not ticker.replace('.', '').isalnum() or len(ticker) > 12:
+        raise APIError(422, "Ticker inválido", ticker)
+    # Falhas nos dados ainda viram uma resposta de erro normal, antes de o stream começar
+    with retry.deadline(REQUEST_DEADLINE):
+        data = (await _yahoo_valuation(ticker))['data']
+
+    async def events():
+        try:
+            async for token in get_ai_analyst().stream_analysis(ticker, data):
+                yield _sse('token', token)
+        except Exception as e:
+            logger.warning(f"{ticker}: análise da IA interrompida: {str(e)}")
+            yield _sse('error', {'error': "Análise da IA interrompida", 'details': str(e)})
+            return
+        yield _sse('done', {})
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+@app.post("/api/v1/valuation/batch")
+async def batch_valuation(request: BatchValuationRequest):
+    """Value several tickers concurrently; failures are reported per ticker"""
+    async def one(ticker: str) -> Dict:
+        try:
+            return await _valuate(ticker, request.growth_rate, request.discount_rate,
+                                  request.terminal_method.value, request.margin_of_safety,
+                                  request.preferred_source)
+        except APIError as e:
+            return {'ticker': ticker, 'error': e.message, 'details': e.details}
+        except Exception as e:
+            return {'ticker': ticker, 'error': str(e)}
+
+    tickers = list(dict.fromkeys(request.tickers))
+    return {'results': await asyncio.gather(*(one(t) for t in tickers))}
+
+
+@app.get("/api/v1/valuation/{ticker}/history")
+async def get_valuation_history(ticker: str, limit: int = Query(10, ge=1, le=100)):
+    return await Database.get_historical_valuations(ticker.upper(), limit)
+
+
+@app.get("/api/v1/screen")
+async def screen(q: str = Query("", max_length=500), limit: int = Query(50, ge=1, le=1000)):
+    """Filter and rank every ticker of the fundamentals store, e.g. q=fcf_to_income > 90 order by upside desc"""
+    from screener import QueryError
+    try:
+        results = get_screener().screen(q, limit=limit)
+    except QueryError as e:
+        raise APIError(400, "Consulta inválida", str(e))
+    except ValueError as e:
+        raise APIError(503, "Store de fundamentos indisponível", str(e))
+    return {'query': q, 'count': len(results), 'results': results}
@@ -0,0 +1,369 @@
+import hashlib
+import json
+import logging
+import math
+import os
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+import dcf_model
+import ratings
+import screener
+from fundamentals_store import MARKET_TEXT_FIELDS, STATEMENTS, FundamentalsStore, fields
+from market_params import get_market_params
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), 'cache', 'backtest')
+
+MODELS = ('multiple', 'dcf')
+MODEL_VERSIONS = {'multiple': screener.MODEL_VERSION, 'dcf': dcf_model.MODEL_VERSION}
+
+SPAN = 1 << 20  # Chave de busca: índice do ticker * SPAN + dia (dias desde 1970)
+PRICE_TOLERANCE_DAYS = 7  # Preço mais antigo aceito antes da data de rebalanceamento
+CAGR_PERIODS = 4  # Períodos anuais que o Yahoo costuma devolver
+DCF_PERIODS = len(dcf_model.FCF_WEIGHTS)
+BUY_THRESHOLD = dict((label, threshold) for threshold, label in ratings.RECOMMENDATION_BANDS)['Buy']
+MIN_OBSERVATIONS = 5  # Um por quintil
+
+
+def _days(column) -> np.ndarray:
+    return column.to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+def rebalance_dates(start: date, end: date, every_months: int) -> np.ndarray:
+    """Month ends between start and end, every `every_months` months"""
+    months = np.arange(np.datetime64(start, 'M'), np.datetime64(end, 'M') + 1, every_months)
+    ends = (months + 1).astype('datetime64[D]') - 1
+    return ends[(ends >= np.datetime64(start, 'D')) & (ends <= np.datetime64(end, 'D'))]
+
+
+class _Timeline:
+    """
+    Rows of one statement sorted by ticker and by the day they became
+    available (period + lag), for vectorized as-of lookups.
+    """
+
+    def __init__(self, table, universe: np.ndarray, lag_days: int, columns: List[str]):
+        names = table.column('ticker').to_numpy()
+        index = np.minimum(np.searchsorted(universe, names), max(len(universe) - 1, 0))
+        keep = (universe[index] == names) if len(universe) else np.zeros(len(names), dtype=bool)
+        ticker = index[keep].astype(np.int64)
+        day = _days(table.column('period'))[keep] + lag_days
+        order = np.argsort(ticker * SPAN + day, kind='stable')
+        self.ticker = ticker[order]
+        self.day = day[order]
+        self.keys = self.ticker * SPAN + self.day
+        self.values = {
+            name: table.column(name).to_numpy().astype(float)[keep][order] for name in columns
+        }
+
+    def asof(self, ticker: np.ndarray, day: np.ndarray) -> np.ndarray:
+        """Position of the newest row available on `day`, -1 if none"""
+        position = np.searchsorted(self.keys, ticker * SPAN + day, side='right') - 1
+        return self.back(position, ticker, 0)
+
+    def back(self, position: np.ndarray, ticker: np.ndarray, periods: int) -> np.ndarray:
+        """Position `periods` rows older for the same ticker, -1 if none"""
+        older = position - periods
+        if not len(self.keys):
+            return np.full(len(position), -1)
+        valid = (position >= 0) & (older >= 0)
+        valid &= self.ticker[np.where(valid, older, 0)] == ticker
+        return np.where(valid, older, -1)
+
+    def get(self, name: str, position: np.ndarray) -> np.ndarray:
+        if not len(self.keys):
+            return np.full(len(position), np.nan)
+        return np.where(position >= 0, self.values[name][np.maximum(position, 0)], np.nan)
+
+
+def _spearman(x: np.ndarray, y: np.ndarray) -> float:
+    rank_x = np.argsort(np.argsort(x)).astype(float)
+    rank_y = np.argsort(np.argsort(y)).astype(float)
+    if rank_x.std() == 0 or rank_y.std() == 0:
+        return float('nan')
+    return float(np.corrcoef(rank_x, rank_y)[0, 1])
+
+
+def _clean(value):
+    """NaN/inf -> None for the JSON cache and the CLI"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class Backtest:
+    """
+    Point-in-time backtest of the valuation models over the fundamentals
+    store: on each rebalance date every ticker is valued only with the
+    statements already published (period + lag) and the close of that day,
+    and the upside is compared with the forward return over the horizon.
+    Results are cached per model version, parameters and store contents.
+    """
+
+    def __init__(self, store: Optional[FundamentalsStore] = None, cache_dir: Optional[str] = None):
+        self.store = store or FundamentalsStore()
+        self.cache_dir = cache_dir or os.environ.get('BACKTEST_CACHE_DIR') or DEFAULT_CACHE_DIR
+
+    def _fingerprint(self) -> List:
+        files = []
+        for statement in STATEMENTS:
+            path = os.path.join(self.store.path, f"{statement}.arrow")
+            if os.path.exists(path):
+                stat = os.stat(path)
+                files.append([statement, stat.st_mtime_ns, stat.st_size])
+        return files
+
+    def _cache_path(self, model: str, params: Dict) -> str:
+        market = get_market_params().snapshot()
+        key = json.dumps({
+            'model': model, 'version': MODEL_VERSIONS[model], 'params': params, 'store': self._fingerprint(),
+            # O modelo de múltiplo usa as taxas de WACC correntes de cada país
+            'market': sorted(
+                (code, p.risk_free_rate, p.equity_risk_premium, p.tax_rate) for code, p in market.countries.items()
+            ) if model == 'multiple' else None,
+            # Os dois modelos convertem o FCF da moeda das demonstrações para a da cotação
+            'fx': sorted(market.fx.items()),
+        }, sort_keys=True)
+        digest = hashlib.sha256(key.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{model}-{digest}.json")
+
+    def run(self, start: date, end: date, every_months: int = 3, horizon_months: int = 12, lag_days: int = 90,
+            models: Sequence[str] = MODELS, discount_rate: float = 0.1, refresh: bool = False) -> Dict[str, Dict]:
+        """
+        Backtest each model; returns {model: {'params', 'summary', 'dates'}},
+        where 'dates' has the per-date IC, quintile returns and hit rate.
+        """
+        unknown = [m for m in models if m not in MODELS]
+        if unknown:
+            raise ValueError(f"Modelo inválido: {', '.join(unknown)}. Use um de {list(MODELS)}")
+        if every_months < 1 or horizon_months < 1 or lag_days < 0:
+            raise ValueError("Intervalo e horizonte devem ser de pelo menos 1 mês e a defasagem não pode ser negativa")
+        if start > end:
+            raise ValueError("A data inicial deve ser anterior à final")
+
+        params = {
+            'start': start.isoformat(), 'end': end.isoformat(), 'every_months': every_months,
+            'horizon_months': horizon_months, 'lag_days': lag_days, 'discount_rate': discount_rate,
+        }
+        results: Dict[str, Dict] = {}
+        pending = []
+        for model in models:
+            path = self._cache_path(model, params)
+            if not refresh and os.path.exists(path):
+                with open(path) as f:
+                    results[model] = json.load(f)
+                logger.debug(f"Backtest de {model} lido do cache {path}")
+            else:
+                pending.append((model, path))
+
+        if pending:
+            panel = self._panel(start, end, every_months, horizon_months, lag_days)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for model, path in pending:
+                if model == 'multiple':
+                    upside = self._multiple_upside(panel)
+                else:
+                    upside = self._dcf_upside(panel, discount_rate)
+                result = self._evaluate(panel, upside)
+                result['params'] = dict(params, model=model, version=MODEL_VERSIONS[model])
+                temp = path + '.tmp'
+                with open(temp, 'w') as f:
+                    json.dump(result, f)
+                os.replace(temp, path)
+                results[model] = result
+        return {model: results[model] for model in models}
+
+    def _panel(self, start: date, end: date, every_months: int, horizon_months: int, lag_days: int) -> Dict:
+        """Flat (date x ticker) arrays with the point-in-time price and forward return"""
+        universe = np.array(sorted(self.store.tickers('prices')), dtype=object)
+        if not len(universe):
+            raise ValueError(f"Sem histórico de preços em {self.store.path}; use 'fundamentals --prices 10y'")
+
+        dates = rebalance_dates(start, end, every_months)
+        months = dates.astype('datetime64[M]')
+        forward_dates = (months + 1 + horizon_months).astype('datetime64[D]') - 1
+
+        ticker = np.tile(np.arange(len(universe), dtype=np.int64), len(dates))
+        day = np.repeat(dates.astype(np.int64), len(universe))
+        forward_day = np.repeat(forward_dates.astype(np.int64), len(universe))
+
+        prices = _Timeline(self.store.table('prices'), universe, 0, ['close'])
+
+        def close(on: np.ndarray) -> np.ndarray:
+            position = prices.asof(ticker, on)
+            value = prices.get('close', position)
+            stale = on - np.where(position >= 0, prices.day[np.maximum(position, 0)], 0) > PRICE_TOLERANCE_DAYS
+            return np.where(stale | ~(value > 0), np.nan, value)
+
+        price = close(day)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            forward_return = close(forward_day) / price - 1
+
+        # Beta, ações e moedas do snapshot de mercado mais recente (sem histórico no store)
+        market = self.store.latest('market', ['shares_outstanding', 'beta'] + MARKET_TEXT_FIELDS)
+        market_index = {name: i for i, name in enumerate(market.column('ticker').to_pylist())}
+        rows = np.array([market_index.get(name, -1) for name in universe], dtype=np.int64)
+
+        def market_column(name: str) -> np.ndarray:
+            values = market.column(name).to_numpy().astype(float)
+            aligned = np.where(rows >= 0, values[np.maximum(rows, 0)] if len(values) else np.nan, np.nan)
+            return aligned[ticker]
+
+        currencies = {}
+        for name in MARKET_TEXT_FIELDS:
+            values = market.column(name).to_pylist()
+            currencies[name] = np.array([values[row] if row >= 0 else None for row in rows], dtype=object)
+        # Fator da moeda das demonstrações para a da cotação, por ticker do universo
+        fx = screener.statement_fx(dict(currencies, ticker=universe), get_market_params().snapshot())
+
+        timelines = {
+            statement: _Timeline(self.store.table(statement), universe, lag_days, fields(statement))
+            for statement in ('income', 'balance', 'cash_flow')
+        }
+        return {
+            'universe': universe, 'dates': dates, 'ticker': ticker, 'day': day, 'price': price,
+            'forward_return': forward_return, 'market_shares': market_column('shares_outstanding'),
+            'beta': market_column('beta'), 'fx': fx[ticker], 'timelines': timelines,
+            **{name: values[ticker] for name, values in currencies.items()},
+        }
+
+    @staticmethod
+    def _shares(panel: Dict, balance: _Timeline, position: np.ndarray) -> np.ndarray:
+        shares = balance.get('shares_outstanding', position)
+        return np.where(shares > 0, shares, panel['market_shares'])
+
+    def _multiple_upside(self, panel: Dict) -> np.ndarray:
+        """screener.score (the get_dynamic_multiple rules) on point-in-time inputs"""
+        ticker, day = panel['ticker'], panel['day']
+        cash_flow, income, balance = (panel['timelines'][s] for s in ('cash_flow', 'income', 'balance'))
+        cf = cash_flow.asof(ticker, day)
+        inc = income.asof(ticker, day)
+        bal = balance.asof(ticker, day)
+
+        # CAGR do FCF como calculate_cagr: só períodos com FCF, do mais recente ao mais antigo, em len(histórico) anos
+        fcf = cash_flow.get('free_cash_flow', cf)
+        newest = np.full(len(cf), np.nan)
+        first = np.full(len(cf), np.nan)
+        periods = np.zeros(len(cf))
+        for k in range(CAGR_PERIODS):
+            value = cash_flow.get('free_cash_flow', cf if k == 0 else cash_flow.back(cf, ticker, k))
+            reported = np.isfinite(value)
+            newest = np.where(reported & np.isnan(newest), value, newest)
+            first = np.where(reported, value, first)
+            periods += reported
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cagr = (np.power(newest / first, 1.0 / periods) - 1) * 100
+        growth = np.where((periods >= 2) & (first > 0) & np.isfinite(cagr), cagr, 0.0)
+
+        shares = self._shares(panel, balance, bal)
+        inputs = {
+            'ticker': panel['universe'][ticker],
+            'price': panel['price'],
+            'shares_outstanding': shares,
+            'market_cap': panel['price'] * shares,
+            'beta': panel['beta'],
+            'net_income': income.get('net_income', inc),
+            'interest_expense': income.get('interest_expense', inc),
+            'total_debt': balance.get('total_debt', bal),
+            'free_cash_flow': fcf,
+            'operating_cash_flow': cash_flow.get('operating_cash_flow', cf),
+            'capital_expenditure': cash_flow.get('capital_expenditure', cf),
+            'working_capital_change': cash_flow.get('working_capital_change', cf),
+            'fcf_growth_rate': growth,
+            # score() converte FCF e dívida para a moeda da cotação
+            'currency': panel['currency'],
+            'financial_currency': panel['financial_currency'],
+        }
+        return screener.score(inputs)['upside']
+
+    def _dcf_upside(self, panel: Dict, discount_rate: float) -> np.ndarray:
+        """DCFModel's rules (weighted FCF, revenue growth, project_dcf) on point-in-time inputs"""
+        ticker, day = panel['ticker'], panel['day']
+        cash_flow, income, balance = (panel['timelines'][s] for s in ('cash_flow', 'income', 'balance'))
+        cf = cash_flow.asof(ticker, day)
+        inc = income.asof(ticker, day)
+        cf_rows = [cash_flow.back(cf, ticker, k) for k in range(DCF_PERIODS)]
+        income_rows = [income.back(inc, ticker, k) for k in range(DCF_PERIODS)]
+        years = np.minimum(sum(r >= 0 for r in cf_rows), sum(r >= 0 for r in income_rows))
+
+        # Média ponderada do FCF sobre os anos disponíveis (até 5)
+        weighted = np.zeros(len(ticker))
+        weights = np.zeros(len(ticker))
+        for k, (rows, weight) in enumerate(zip(cf_rows, dcf_model.FCF_WEIGHTS)):
+            used = k < years
+            weighted += np.where(used, np.nan_to_num(cash_flow.get('free_cash_flow', rows)) * weight, 0.0)
+            weights += np.where(used, weight, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_fcf = weighted / weights * panel['fx']
+
+        # Crescimento médio da receita ano contra ano; 3% sem dados, limitado a 2%-20%
+        revenue = [np.nan_to_num(income.get('revenue', rows)) for rows in income_rows]
+        total = np.zeros(len(ticker))
+        count = np.zeros(len(ticker))
+        for k in range(DCF_PERIODS - 1):
+            used = (k < years - 1) & (revenue[k + 1] > 0)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                total += np.where(used, (revenue[k] - revenue[k + 1]) / revenue[k + 1], 0.0)
+            count += used
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth = np.where(count > 0, total / count, 0.03)
+        growth = np.clip(growth, 0.02, 0.20)
+
+        valued = (years > 0) & (avg_fcf > 0)
+        total_value = dcf_model.project_dcf(np.where(valued, avg_fcf, 0.0), growth, discount_rate)['total_value']
+        shares = self._shares(panel, balance, balance.asof(ticker, day))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            per_share = total_value / shares
+            upside = (per_share / panel['price'] - 1) * 100
+        return np.where(valued & (per_share > 0), upside, np.nan)
+
+    @staticmethod
+    def _evaluate(panel: Dict, upside: np.ndarray) -> Dict:
+        """Per-date rank IC, quintile returns and Buy hit rate, plus their summary"""
+        tickers = len(panel['universe'])
+        forward_return = panel['forward_return']
+        rows = []
+        hits = signals = 0
+        for i, day in enumerate(panel['dates']):
+            window = slice(i * tickers, (i + 1) * tickers)
+            x, y = upside[window], forward_return[window]
+            valid = np.isfinite(x) & np.isfinite(y)
+            x, y = x[valid], y[valid]
+            row = {
+                'date': str(day), 'n': int(valid.sum()), 'ic': None, 'top_quintile': None,
+                'bottom_quintile': None, 'spread': None, 'buys': 0, 'hit_rate': None,
+                'universe_return': _clean(float(y.mean())) if len(y) else None,
+            }
+            if len(y) >= MIN_OBSERVATIONS:
+                order = np.argsort(x, kind='stable')
+                quintiles = np.array_split(y[order], 5)
+                top, bottom = float(quintiles[-1].mean()), float(quintiles[0].mean())
+                buys = x > BUY_THRESHOLD
+                row.update({
+                    'ic': _clean(_spearman(x, y)), 'top_quintile': top, 'bottom_quintile': bottom,
+                    'spread': top - bottom, 'buys': int(buys.sum()),
+                    'hit_rate': float((y[buys] > 0).mean()) if buys.any() else None,
+                })
+                hits += int((y[buys] > 0).sum())
+                signals += int(buys.sum())
+            rows.append(row)
+
+        ics = np.array([r['ic'] for r in rows if r['ic'] is not None], dtype=float)
+        spreads = np.array([r['spread'] for r in rows if r['spread'] is not None], dtype=float)
+        ic_t = None
+        if len(ics) >= 2 and ics.std(ddof=1) > 0:
+            ic_t = float(ics.mean() / (ics.std(ddof=1) / math.sqrt(len(ics))))
+        summary = {
+            'dates': len(ics),
+            'observations': sum(r['n'] for r in rows),
+            'mean_ic': float(ics.mean()) if len(ics) else None,
+            'ic_t_stat': ic_t,
+            'mean_spread': float(spreads.mean()) if len(spreads) else None,
+            'hit_rate': hits / signals if signals else None,
+            'buys': signals,
+        }
+        return {'summary': summary, 'dates': rows}
@@ -0,0 +1,239 @@
+import asyncio
+import csv
+import json
+import logging
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+import quick_analysis
+from market_params import get_market_params
+
+logger = logging.getLogger(__name__)
+
+# Colunas de saída, na ordem em que são escritas
+FIELDS: List[Tuple[str, str]] = [
+    ('ticker', 'string'),
+    ('status', 'string'),
+    ('error', 'string'),
+    ('current_price', 'float'),
+    ('shares_outstanding', 'float'),
+    ('latest_fcf', 'float'),
+    ('fcf_growth_rate', 'float'),
+    ('fcf_to_income', 'float'),
+    ('debt_to_fcf', 'float'),
+    ('working_capital_change', 'float'),
+    ('wacc', 'float'),
+    ('suggested_multiple', 'float'),
+    ('fair_value', 'float'),
+    ('upside', 'float'),
+    ('recommendation', 'string'),
+    ('growth_rating', 'string'),
+    ('quality_rating', 'string'),
+    ('quality_score', 'int'),
+    ('narrative', 'string'),
+    ('ai_analysis', 'string'),
+]
+FIELD_NAMES = [name for name, _ in FIELDS]
+
+
+def read_tickers(path: str) -> List[str]:
+    """Read tickers from a file (one per line or comma separated, # starts a comment)"""
+    tickers = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            for item in line.replace(',', ' ').split():
+                ticker = item.strip().upper()
+                if ticker and ticker not in tickers:
+                    tickers.append(ticker)
+    return tickers
+
+
+def build_row(ticker: str, data: Optional[Dict] = None, error: Optional[str] = None,
+              ai_analysis: Optional[str] = None) -> Dict:
+    """Flatten one analysis result into an output row"""
+    row = {name: None for name in FIELD_NAMES}
+    row['ticker'] = ticker
+    if error is not None:
+        row['status'] = 'error'
+        row['error'] = error
+        return row
+
+    summary = quick_analysis.build_summary(ticker, data)
+    fcf = data['cash_flow']['free_cashflow']
+    quality = data['cash_flow']['quality']
+    row.update({
+        'status': 'ok',
+        'current_price': data['market_data']['current_price'],
+        'shares_outstanding': data['market_data']['shares_outstanding'],
+        'latest_fcf': fcf['latest'],
+        'fcf_growth_rate': fcf['growth_rate'],
+        'fcf_to_income': quality['fcf_to_income'],
+        'debt_to_fcf': quality['debt_to_fcf'],
+        'working_capital_change': quality['working_capital_change'],
+        'wacc': data['valuation'].get('wacc'),
+        'suggested_multiple': data['valuation']['suggested_multiple'],
+        'fair_value': summary['fair_value'],
+        'upside': summary['upside'],
+        'recommendation': summary['recommendation'],
+        'growth_rating': summary['growth_rating'],
+        'quality_rating': summary['quality_rating'],
+        'quality_score': summary['quality_score'],
+        'narrative': summary['narrative'],
+        'ai_analysis': ai_analysis,
+    })
+    return row
+
+
+class ResultWriter:
+    """Incrementally writes result rows; subclasses implement one format"""
+
+    def write(self, row: Dict):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CSVResultWriter(ResultWriter):
+    def __init__(self, path: str):
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=FIELD_NAMES)
+        self._writer.writeheader()
+
+    def write(self, row: Dict):
+        self._writer.writerow(row)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class JSONLinesResultWriter(ResultWriter):
+    def __init__(self, path: str):
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def write(self, row: Dict):
+        self._file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetResultWriter(ResultWriter):
+    """Buffers rows and writes them as Parquet row groups"""
+
+    def __init__(self, path: str, row_group_size: int = 100):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Saída Parquet requer o pacote pyarrow (pip install pyarrow)")
+
+        types = {'string': pa.string(), 'float': pa.float64(), 'int': pa.int64()}
+        self._pa = pa
+        self._schema = pa.schema([(name, types[kind]) for name, kind in FIELDS])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._buffer: List[Dict] = []
+        self._row_group_size = row_group_size
+
+    def write(self, row: Dict):
+        self._buffer.append(row)
+        if len(self._buffer) >= self._row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            table = self._pa.Table.from_pylist(self._buffer, schema=self._schema)
+            self._writer.write_table(table)
+            self._buffer = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+WRITERS = {
+    'csv': CSVResultWriter,
+    'jsonl': JSONLinesResultWriter,
+    'parquet': ParquetResultWriter,
+}
+
+
+def open_writer(path: str, fmt: Optional[str] = None) -> ResultWriter:
+    """Open a result writer, inferring the format from the extension if not given"""
+    if fmt is None:
+        ext = os.path.splitext(path)[1].lower().lstrip('.')
+        fmt = {'json': 'jsonl', 'ndjson': 'jsonl', 'pq': 'parquet'}.get(ext, ext)
+    fmt = fmt.lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"Formato de saída inválido: {fmt}. Use um de {list(WRITERS)}")
+    return WRITERS[fmt](path)
+
+
+class BatchRunner:
+    """Runs fetch -> valuation -> optional AI for many tickers on one event loop"""
+
+    def __init__(self, concurrency: int = 8, include_ai: bool = False, yahoo=None, ai_analyst=None,
+                 processes: int = 0):
+        self.concurrency = concurrency
+        self.include_ai = include_ai
+        self._owns_yahoo = yahoo is None
+        if yahoo is None:
+            from yahoo_finance import YahooFinanceAPI
+            # processes > 0: parsing e métricas em processos (universos grandes em máquinas com muitos núcleos)
+            yahoo = YahooFinanceAPI(max_workers=concurrency, processes=processes)
+        self.yahoo = yahoo
+        self._ai_analyst = None
+        if include_ai:
+            if ai_analyst is None:
+                from ai_analysis import AIAnalyst
+                ai_analyst = AIAnalyst()
+            self._ai_analyst = ai_analyst
+
+    async def analyze(self, ticker: str) -> Dict:
+        """Analyze one ticker, returning an output row (errors become rows too)"""
+        try:
+            data = await self.yahoo.get_financials(ticker)
+        except Exception as e:
+            return build_row(ticker, error=str(e))
+
+        ai_analysis = None
+        if self._ai_analyst is not None:
+            ai_analysis = await self._ai_analyst.get_analysis(ticker, data)
+
+        try:
+            return build_row(ticker, data, ai_analysis=ai_analysis)
+        except Exception as e:
+            return build_row(ticker, error=f"Invalid data: {str(e)}")
+
+    async def run(self, tickers: List[str], writer: ResultWriter,
+                  on_result: Optional[Callable[[Dict], None]] = None) -> Dict[str, int]:
+        """Analyze all tickers, writing each row as soon as it is ready"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(ticker: str) -> Dict:
+            async with semaphore:
+                return await self.analyze(ticker)
+
+        counts = {'ok': 0, 'error': 0}
+        # Todos os WACC do lote usam os mesmos parâmetros de mercado (uma leitura no total)
+        with get_market_params().pin():
+            for next_result in asyncio.as_completed([bounded(t) for t in tickers]):
+                row = await next_result
+                writer.write(row)
+                counts[row['status']] += 1
+                if on_result:
+                    on_result(row)
+        return counts
+
+    def close(self):
+        if self._owns_yahoo:
+            self.yahoo.close()
@@ -0,0 +1,245 @@
+import asyncio
+import shutil
+import tempfile
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Tuple
+from unittest import mock
+
+from benchmarks.fixtures import FixtureTicker, alpha_vantage_payloads, universe
+
+# Cada caso recebe o universo de fixtures e devolve a função medida (sync ou async),
+# que processa todos os tickers; a montagem fica fora da medição.
+CASES: Dict[str, Callable] = {}
+_scratch_dirs: List[str] = []
+
+
+def case(name: str):
+    def register(setup: Callable) -> Callable:
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def _scratch(prefix: str) -> str:
+    path = tempfile.mkdtemp(prefix=prefix)
+    _scratch_dirs.append(path)
+    return path
+
+
+def _tickers(size: int, fixtures: Dict) -> List[FixtureTicker]:
+    return [FixtureTicker(name, fixture, scale) for name, fixture, scale in universe(size, fixtures)]
+
+
+def _yahoo():
+    from yahoo_finance import YahooFinanceAPI
+    return YahooFinanceAPI(max_workers=1)
+
+
+@case('yahoo.get_data_sync')
+def get_data_sync(size: int, fixtures: Dict):
+    api = _yahoo()
+    stocks = {stock.ticker: stock for stock in _tickers(size, fixtures)}
+    patcher = mock.patch('yahoo_finance.yf.Ticker', side_effect=lambda ticker: stocks[ticker])
+
+    def run():
+        with patcher:
+            for ticker in stocks:
+                api._get_data_sync(ticker)
+    return run
+
+
+@case('yahoo.compute_chunk')
+def compute_chunk(size: int, fixtures: Dict):
+    """What one worker process does in the process mode: unpack the arrays, parse and apply the rules"""
+    import yahoo_finance
+    from market_params import get_market_params
+
+    api = _yahoo()
+    stocks = {stock.ticker: stock for stock in _tickers(size, fixtures)}
+    with mock.patch('yahoo_finance.yf.Ticker', side_effect=lambda ticker: stocks[ticker]):
+        fetched = [(ticker, api._fetch_sync(ticker)) for ticker in stocks]
+    market = get_market_params().snapshot()
+    chunk = [
+        (ticker, info, {name: yahoo_finance._pack_frame(frame) for name, frame in statements.items()}, market)
+        for ticker, (info, statements) in fetched
+    ]
+
+    def run():
+        yahoo_finance._compute_chunk(chunk)
+    return run
+
+
+@case('yahoo.quality_metrics')
+def quality_metrics(size: int, fixtures: Dict):
+    api = _yahoo()
+    stocks = _tickers(size, fixtures)
+
+    def run():
+        for stock in stocks:
+            api.calculate_quality_metrics(stock)
+    return run
+
+
+@case('yahoo.wacc')
+def wacc(size: int, fixtures: Dict):
+    api = _yahoo()
+    stocks = _tickers(size, fixtures)
+
+    def run():
+        for stock in stocks:
+            api.calculate_wacc(stock)
+    return run
+
+
+@case('yahoo.dynamic_multiple')
+def dynamic_multiple(size: int, fixtures: Dict):
+    api = _yahoo()
+    inputs = [
+        (4.0 + i % 20, {'fcf_to_income': 60.0 + i % 50, 'debt_to_fcf': (i % 8) * 1.0}, 6.0 + i % 9)
+        for i in range(size)
+    ]
+
+    def run():
+        for growth_rate, quality, wacc_value in inputs:
+            api.get_dynamic_multiple(growth_rate, quality, wacc_value)
+    return run
+
+
+def _dcf_model(size: int, fixtures: Dict, cache_dir: str):
+    from dcf_model import DCFModel
+
+    payloads = {
+        name: alpha_vantage_payloads(fixture, scale)
+        for name, fixture, scale in universe(size, fixtures, require='alpha_vantage')
+    }
+
+    class FixtureDCFModel(DCFModel):
+        async def _fetch_data(self, function: str, ticker: str) -> Dict:
+            return payloads[ticker][function]
+
+    model = FixtureDCFModel(api_key='fixture')
+    model.cache_dir = cache_dir
+    return model, list(payloads)
+
+
+@case('dcf.intrinsic_value')
+def intrinsic_value(size: int, fixtures: Dict):
+    """Payload parsing plus projection, with the file cache taken out of the loop"""
+    model, tickers = _dcf_model(size, fixtures, _scratch('bench-dcf-'))
+
+    async def no_cache(*args, **kwargs):
+        return None
+    model._get_from_cache = no_cache
+    model._save_to_cache = no_cache
+
+    async def run():
+        for ticker in tickers:
+            await model.calculate_intrinsic_value(ticker)
+    return run
+
+
+@case('cache.dcf_write')
+def dcf_cache_write(size: int, fixtures: Dict):
+    model, tickers = _dcf_model(size, fixtures, _scratch('bench-dcf-'))
+    data = _processed_financials(model, tickers[0])
+
+    async def run():
+        for ticker in tickers:
+            await model._save_to_cache(ticker, data)
+    return run
+
+
+@case('cache.dcf_read')
+def dcf_cache_read(size: int, fixtures: Dict):
+    model, tickers = _dcf_model(size, fixtures, _scratch('bench-dcf-'))
+    data = _processed_financials(model, tickers[0])
+    asyncio.run(_save_all(model, tickers, data))
+
+    async def run():
+        for ticker in tickers:
+            await model._get_from_cache(ticker)
+    return run
+
+
+async def _save_all(model, tickers: List[str], data: Dict):
+    for ticker in tickers:
+        await model._save_to_cache(ticker, data)
+
+
+def _processed_financials(model, ticker: str) -> Dict:
+    async def no_cache(*args, **kwargs):
+        return None
+    original = model._get_from_cache, model._save_to_cache
+    model._get_from_cache = model._save_to_cache = no_cache
+    try:
+        return asyncio.run(model.fetch_financials(ticker))
+    finally:
+        model._get_from_cache, model._save_to_cache = original
+
+
+def _llm_cache_entries(size: int) -> Tuple[object, List[str]]:
+    from llm_cache import LLMCache
+
+    cache = LLMCache(cache_dir=_scratch('bench-llm-'))
+    keys = [
+        cache.make_key('gpt-4o-mini', 'system', 0.17, f"T{i:05d}", {'price': 100.0 + i})
+        for i in range(size)
+    ]
+    return cache, keys
+
+
+@case('cache.llm_write')
+def llm_cache_write(size: int, fixtures: Dict):
+    cache, keys = _llm_cache_entries(size)
+    content = 'Análise ' * 400
+
+    async def run():
+        for key in keys:
+            await cache.set(key, content)
+    return run
+
+
+@case('cache.llm_read')
+def llm_cache_read(size: int, fixtures: Dict):
+    cache, keys = _llm_cache_entries(size)
+    # Abaixo do limite de entradas, senão a leitura mediria misses
+    keys = keys[:cache.max_entries]
+    asyncio.run(_fill(cache, keys))
+
+    async def run():
+        for key in keys:
+            await cache.get(key)
+    return run
+
+
+async def _fill(cache, keys: List[str]):
+    for key in keys:
+        await cache.set(key, 'Análise ' * 400)
+
+
+@case('rate_limiter.check')
+def rate_limiter(size: int, fixtures: Dict):
+    """`size` requests from one client inside the window (the limiter's worst case)"""
+    from middleware.rate_limiter import RateLimiter
+
+    request = SimpleNamespace(client=SimpleNamespace(host='10.0.0.1'))
+
+    async def run():
+        limiter = RateLimiter(requests_per_minute=size + 1)
+        for _ in range(size):
+            await limiter.check_rate_limit(request)
+    return run
+
+
+def prepare(name: str, size: int, fixtures: Dict) -> Callable[[], None]:
+    """Build the case and wrap it so every run is a plain call"""
+    run = CASES[name](size, fixtures)
+    if asyncio.iscoroutinefunction(run):
+        return lambda: asyncio.run(run())
+    return run
+
+
+def cleanup():
+    """Remove the scratch cache directories created by the cases"""
+    while _scratch_dirs:
+        shutil.rmtree(_scratch_dirs.pop(), ignore_errors=True)
@@ -0,0 +1,117 @@
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(__file__)
+HISTORY_PATH = os.path.join(BENCH_DIR, 'results', 'history.jsonl')
+THRESHOLDS_PATH = os.path.join(BENCH_DIR, 'thresholds.json')
+
+# Quantas execuções anteriores (na mesma máquina) formam a linha de base
+BASELINE_RUNS = 3
+
+
+def result_key(case: str, size: int) -> str:
+    return f"{case}@{size}"
+
+
+def summarize(timings: List[float], size: int) -> Dict:
+    """Per-ticker statistics, in microseconds, from the wall time of each repetition"""
+    per_item = sorted(t / size * 1e6 for t in timings)
+    p95_index = min(len(per_item) - 1, int(round(0.95 * (len(per_item) - 1))))
+    return {
+        'median_us': round(statistics.median(per_item), 3),
+        'min_us': round(per_item[0], 3),
+        'p95_us': round(per_item[p95_index], 3),
+        'runs': len(per_item),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def make_run(results: Dict[str, Dict]) -> Dict:
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'host': socket.gethostname(),
+        'python': platform.python_version(),
+        'results': results,
+    }
+
+
+def load_history(path: str = HISTORY_PATH) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(run: Dict, path: str = HISTORY_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run, ensure_ascii=False) + '\n')
+
+
+def load_thresholds(path: str = THRESHOLDS_PATH) -> Dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def baseline(history: List[Dict], host: str, runs: int = BASELINE_RUNS) -> Dict[str, float]:
+    """Median per-ticker time of each case over the last `runs` runs on this host"""
+    samples: Dict[str, List[float]] = {}
+    for run in reversed(history):
+        if run.get('host') != host:
+            continue
+        for key, result in run['results'].items():
+            values = samples.setdefault(key, [])
+            if len(values) < runs:
+                values.append(result['median_us'])
+    return {key: statistics.median(values) for key, values in samples.items()}
+
+
+def compare(results: Dict[str, Dict], history: List[Dict], thresholds: Dict, host: str) -> List[Dict]:
+    """
+    Check each result against its absolute budget and against the recent
+    baseline on the same host. Returns one row per result with a status of
+    ok, new (no baseline yet) or regression.
+    """
+    base = baseline(history, host)
+    default = thresholds.get('default', {})
+    rows = []
+    for key, result in results.items():
+        case = key.split('@', 1)[0]
+        limits = dict(default, **thresholds.get('cases', {}).get(case, {}))
+        median = result['median_us']
+        previous = base.get(key)
+        change = (median / previous - 1) if previous else None
+
+        reasons = []
+        budget = limits.get('max_us_per_item')
+        if budget is not None and median > budget:
+            reasons.append(f"acima do orçamento de {budget}µs")
+        max_regression = limits.get('max_regression')
+        if change is not None and max_regression is not None and change > max_regression:
+            reasons.append(f"{change:+.0%} sobre a linha de base (limite {max_regression:+.0%})")
+
+        if reasons:
+            status = 'regression'
+        else:
+            status = 'new' if previous is None else 'ok'
+        rows.append({
+            'key': key, 'median_us': median, 'baseline_us': previous,
+            'change': change, 'status': status, 'reasons': reasons,
+        })
+    return rows
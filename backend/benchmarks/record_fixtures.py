@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+from typing import Dict
+
+from benchmarks.fixtures import FIXTURES_DIR, STATEMENTS
+
+# Campos do info usados pelo YahooFinanceAPI (o resto só aumentaria as fixtures)
+INFO_FIELDS = ('currentPrice', 'regularMarketPrice', 'sharesOutstanding', 'beta', 'marketCap', 'currency')
+
+
+def _statement(frame) -> Dict:
+    if frame is None or frame.empty:
+        return {'columns': [], 'rows': {}}
+    return {
+        'columns': [str(column.date()) if hasattr(column, 'date') else str(column) for column in frame.columns],
+        'rows': {
+            str(label): [None if value != value else float(value) for value in frame.loc[label].tolist()]
+            for label in frame.index
+        },
+    }
+
+
+def record(ticker: str) -> str:
+    """Fetch one ticker from Yahoo Finance and save it in the fixture format"""
+    import yfinance as yf
+
+    stock = yf.Ticker(ticker)
+    info = stock.info
+    fixture = {
+        'ticker': ticker,
+        'info': {key: info[key] for key in INFO_FIELDS if key in info},
+        'statements': {name: _statement(getattr(stock, name)) for name in STATEMENTS},
+    }
+    path = os.path.join(FIXTURES_DIR, f"{ticker.replace('.', '_')}.json")
+    # As respostas do Alpha Vantage gravadas antes são mantidas
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            previous = json.load(f)
+        if 'alpha_vantage' in previous:
+            fixture['alpha_vantage'] = previous['alpha_vantage']
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(fixture, f, indent=2)
+        f.write('\n')
+    return path
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit("Uso: python -m benchmarks.record_fixtures TICKER [TICKER...]")
+    for ticker in sys.argv[1:]:
+        print(f"{ticker}: {record(ticker.upper())}")
@@ -0,0 +1,99 @@
+import gc
+import logging
+import socket
+import time
+from typing import List, Optional
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks import cases, history
+from benchmarks.fixtures import load_fixtures
+
+console = Console()
+app = typer.Typer(add_completion=False)
+
+DEFAULT_SIZES = "1,100,5000"
+
+
+def repetitions(size: int) -> int:
+    """More repetitions for small universes so the medians are stable"""
+    return max(3, min(30, 3000 // size))
+
+
+def measure(name: str, size: int, fixtures) -> dict:
+    run = cases.prepare(name, size, fixtures)
+    run()  # Aquecimento: imports, caches do pandas, criação do executor
+    timings = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repetitions(size)):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+            gc.collect()
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return history.summarize(timings, size)
+
+
+@app.command()
+def main(
+    sizes: str = typer.Option(DEFAULT_SIZES, "--sizes", help="Tamanhos do universo de tickers, separados por vírgula"),
+    case: Optional[List[str]] = typer.Option(None, "--case", "-k", help="Executa só os casos cujo nome contém o texto"),
+    save: bool = typer.Option(False, "--save", help="Acrescenta o resultado ao histórico"),
+    check: bool = typer.Option(False, "--check", help="Sai com código 1 se houver regressão"),
+):
+    """Benchmarks offline dos caminhos críticos da avaliação, com fixtures gravadas."""
+    # Os avisos de cada ticker inundariam a saída e distorceriam as medições
+    logging.disable(logging.WARNING)
+
+    fixtures = load_fixtures()
+    size_list = [int(s) for s in sizes.split(',') if s.strip()]
+    names = [n for n in cases.CASES if not case or any(k in n for k in case)]
+    if not names:
+        console.print(f"[red]Nenhum caso corresponde a {case}. Casos: {', '.join(cases.CASES)}[/red]")
+        raise typer.Exit(code=2)
+
+    results = {}
+    try:
+        for name in names:
+            for size in size_list:
+                console.print(f"[dim]{name} @ {size}...[/dim]")
+                results[history.result_key(name, size)] = measure(name, size, fixtures)
+    finally:
+        cases.cleanup()
+
+    rows = history.compare(results, history.load_history(), history.load_thresholds(), socket.gethostname())
+
+    table = Table(title="Benchmarks (µs por ticker)", show_header=True)
+    table.add_column("Caso")
+    table.add_column("Mediana", justify="right")
+    table.add_column("p95", justify="right")
+    table.add_column("Linha de base", justify="right")
+    table.add_column("Variação", justify="right")
+    table.add_column("Status")
+    styles = {'ok': 'green', 'new': 'cyan', 'regression': 'bold red'}
+    for row in rows:
+        result = results[row['key']]
+        baseline = f"{row['baseline_us']:,.1f}" if row['baseline_us'] is not None else "-"
+        change = f"{row['change']:+.1%}" if row['change'] is not None else "-"
+        status = f"[{styles[row['status']]}]{row['status']}[/{styles[row['status']]}]"
+        if row['reasons']:
+            status += f" ({'; '.join(row['reasons'])})"
+        table.add_row(row['key'], f"{result['median_us']:,.1f}", f"{result['p95_us']:,.1f}", baseline, change, status)
+    console.print(table)
+
+    if save:
+        history.append_history(history.make_run(results))
+        console.print(f"[green]Resultado salvo em {history.HISTORY_PATH}[/green]")
+
+    if check and any(row['status'] == 'regression' for row in rows):
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import os
+import stat
+import time
+from typing import Dict, Optional
+
+from daemon_client import STREAM_LIMIT, default_socket_path
+
+logger = logging.getLogger(__name__)
+
+SOCKET_PROBE_TIMEOUT = 2.0
+
+
+class AnalysisDaemon:
+    """
+    Long-lived process that owns the data clients and their caches and
+    answers newline-delimited JSON requests on a Unix socket.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, yahoo=None, ai_analyst=None, ticker_finder=None):
+        if yahoo is None:
+            from yahoo_finance import YahooFinanceAPI
+            yahoo = YahooFinanceAPI(max_workers=int(os.environ.get('DAEMON_WORKERS', 8)))
+        if ai_analyst is None:
+            from ai_analysis import AIAnalyst
+            ai_analyst = AIAnalyst()
+        if ticker_finder is None:
+            from ticker_finder import TickerFinder
+            ticker_finder = TickerFinder()
+
+        self.socket_path = socket_path or default_socket_path()
+        self.yahoo = yahoo
+        self.ai_analyst = ai_analyst
+        self.ticker_finder = ticker_finder
+        self._dcf_model = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._started = time.time()
+        self._requests = 0
+
+    @property
+    def dcf_model(self):
+        if self._dcf_model is None:
+            from dcf_model import DCFModel
+            api_key = os.environ.get('ALPHA_VANTAGE_API_KEY')
+            if not api_key:
+                raise ValueError("ALPHA_VANTAGE_API_KEY não configurada")
+            self._dcf_model = DCFModel(api_key)
+        return self._dcf_model
+
+    async def _send(self, writer: asyncio.StreamWriter, message: Dict):
+        writer.write((json.dumps(message) + '\n').encode('utf-8'))
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._requests += 1
+                try:
+                    request = json.loads(line)
+                    await self._dispatch(request.get('op'), request.get('params') or {}, writer)
+                except Exception as e:
+                    await self._send(writer, {'ok': False, 'error': str(e)})
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, op: str, params: Dict, writer: asyncio.StreamWriter):
+        if op == 'ping':
+            result = {'uptime': time.time() - self._started, 'requests': self._requests}
+        elif op == 'financials':
+            result = await self.yahoo.get_financials(params['ticker'])
+        elif op == 'fundamentals':
+            record = await self.yahoo.get_fundamentals(params['ticker'])
+            # Datas viajam como texto ISO no protocolo JSON
+            result = {
+                statement: [dict(row, period=row['period'].isoformat()) for row in rows]
+                for statement, rows in record.items()
+            }
+        elif op == 'price':
+            result = await self.yahoo.get_current_price(params['ticker'])
+        elif op == 'resolve':
+            result = await self.ticker_finder.get_company_ticker(params['company_name'])
+        elif op == 'analysis':
+            if params.get('stream'):
+                async for token in self.ai_analyst.stream_analysis(params['ticker'], params['data']):
+                    await self._send(writer, {'ok': True, 'done': False, 'token': token})
+                result = None
+            else:
+                result = await self.ai_analyst.get_analysis(params['ticker'], params['data'])
+        elif op == 'dcf':
+            ticker = params.pop('ticker')
+            result = await self.dcf_model.calculate_intrinsic_value(ticker, **params)
+        elif op == 'shutdown':
+            await self._send(writer, {'ok': True, 'done': True, 'result': None})
+            self._server.close()
+            return
+        else:
+            raise ValueError(f"Operação desconhecida: {op}")
+
+        await self._send(writer, {'ok': True, 'done': True, 'result': result})
+
+    async def _claim_socket(self):
+        """Remove a stale socket left by a dead daemon; refuse to replace a live one or a regular file"""
+        try:
+            mode = os.lstat(self.socket_path).st_mode
+        except FileNotFoundError:
+            return
+        if not stat.S_ISSOCK(mode):
+            raise ValueError(f"{self.socket_path} existe e não é um socket; remova-o ou use --socket")
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(self.socket_path), SOCKET_PROBE_TIMEOUT)
+        except FileNotFoundError:
+            return
+        except ConnectionRefusedError:
+            # Ninguém escuta: sobra de um daemon que morreu
+            logger.info(f"Removendo socket abandonado em {self.socket_path}")
+            os.remove(self.socket_path)
+            return
+        except asyncio.TimeoutError:
+            # Fila de conexões cheia: há um processo vivo do outro lado
+            raise ValueError(f"Um processo ocupado já escuta em {self.socket_path}")
+        writer.close()
+        raise ValueError(f"Já existe um daemon ouvindo em {self.socket_path}")
+
+    async def serve(self):
+        """Listen on the socket until a shutdown request arrives"""
+        await self._claim_socket()
+        # Criado já com 0600: um chmod depois do bind deixaria uma janela em que outros usuários conectam
+        previous_umask = os.umask(0o177)
+        try:
+            self._server = await asyncio.start_unix_server(self._handle, path=self.socket_path, limit=STREAM_LIMIT)
+        finally:
+            os.umask(previous_umask)
+        logger.info(f"Daemon de análise ouvindo em {self.socket_path}")
+        try:
+            async with self._server:
+                await self._server.wait_closed()
+        finally:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            from llm_client import close_llm_client
+            await close_llm_client()
+            logger.info("Daemon de análise encerrado")
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import os
+import tempfile
+from typing import AsyncIterator, Dict, Optional
+
+# Limite de uma linha do protocolo (respostas com dados financeiros são pequenas)
+STREAM_LIMIT = 16 * 1024 * 1024
+
+
+def default_socket_path() -> str:
+    """Socket path from INTRINSIC_SOCKET or a per-user file in the temp dir"""
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.environ.get(
+        'INTRINSIC_SOCKET',
+        os.path.join(tempfile.gettempdir(), f"intrinsicai-{uid}.sock")
+    )
+
+
+class DaemonError(Exception):
+    pass
+
+
+class DaemonClient:
+    """
+    Thin client for the analysis daemon. Exposes the same coroutines as
+    YahooFinanceAPI, TickerFinder and AIAnalyst so callers can swap it in.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None):
+        self.socket_path = socket_path or default_socket_path()
+
+    @classmethod
+    async def connect(cls, socket_path: Optional[str] = None) -> Optional['DaemonClient']:
+        """Return a client if a daemon answers on the socket, otherwise None"""
+        if os.environ.get('INTRINSIC_DAEMON', '1') == '0':
+            return None
+        client = cls(socket_path)
+        if not os.path.exists(client.socket_path):
+            return None
+        try:
+            await client.request('ping')
+            return client
+        except (OSError, DaemonError):
+            return None
+
+    async def _messages(self, op: str, params: Dict) -> AsyncIterator[Dict]:
+        reader, writer = await asyncio.open_unix_connection(self.socket_path, limit=STREAM_LIMIT)
+        try:
+            writer.write((json.dumps({'op': op, 'params': params}) + '\n').encode('utf-8'))
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    raise DaemonError("Conexão com o daemon encerrada inesperadamente")
+                message = json.loads(line)
+                if not message.get('ok', True):
+                    raise DaemonError(message.get('error', 'Erro desconhecido no daemon'))
+                yield message
+                if message.get('done', True):
+                    return
+        finally:
+            writer.close()
+
+    async def request(self, op: str, **params):
+        """Send one request and return its result"""
+        async for message in self._messages(op, params):
+            if message.get('done', True):
+                return message.get('result')
+
+    async def get_financials(self, ticker: str) -> Dict:
+        try:
+            return await self.request('financials', ticker=ticker)
+        except DaemonError as e:
+            raise Exception(str(e))
+
+    async def get_fundamentals(self, ticker: str) -> Dict:
+        try:
+            return await self.request('fundamentals', ticker=ticker)
+        except DaemonError as e:
+            raise Exception(str(e))
+
+    async def get_current_price(self, ticker: str) -> float:
+        try:
+            return await self.request('price', ticker=ticker)
+        except DaemonError as e:
+            raise Exception(str(e))
+
+    async def get_company_ticker(self, company_name: str) -> Optional[Dict[str, str]]:
+        return await self.request('resolve', company_name=company_name)
+
+    async def get_analysis(self, ticker: str, data: Dict) -> str:
+        return await self.request('analysis', ticker=ticker, data=data)
+
+    async def stream_analysis(self, ticker: str, data: Dict) -> AsyncIterator[str]:
+        async for message in self._messages('analysis', {'ticker': ticker, 'data': data, 'stream': True}):
+            if 'token' in message:
+                yield message['token']
+
+    async def calculate_intrinsic_value(self, ticker: str, **params) -> Dict:
+        return await self.request('dcf', ticker=ticker, **params)
+
+    async def shutdown(self):
+        await self.request('shutdown')
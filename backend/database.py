@@ -4,6 +4,8 @@ from datetime import datetime, timedelta
 import logging
 from typing import Dict, List
 
+from tracing import span
+
 logger = logging.getLogger(__name__)
 
 class Database:
@@ -37,7 +39,8 @@ class Database:
                 valuation_data['valuation_date'] = datetime.now().isoformat()
 
             # Store the valuation
-            result = await collection.insert_one(valuation_data)
+            with span('db.store_valuation', ticker=valuation_data.get('ticker')):
+                result = await collection.insert_one(valuation_data)
             logger.info(f"Stored valuation for {valuation_data['ticker']}")
             return bool(result.inserted_id)
 
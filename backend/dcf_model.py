@@ -9,13 +9,74 @@ import time
 from datetime import datetime, timedelta
 import aiofiles
 
+import metrics
+from resilience import CircuitOpenError, get_upstream
+from retry import DeadlineExceeded, get_policy
+from tracing import span
+from transport import get_transport
+
 logger = logging.getLogger(__name__)
 
+# Incrementar ao mudar qualquer regra do modelo: invalida os backtests em cache
+MODEL_VERSION = 1
+
+# Pesos da média do FCF, do ano mais recente para o mais antigo
+FCF_WEIGHTS = [1.0, 0.8, 0.6, 0.4, 0.2]
+HIGH_GROWTH_YEARS = 5
+MIN_GROWTH = 0.03
+MAX_PERPETUAL_GROWTH = 0.03
+EXIT_MULTIPLE = 12
+
+
+def weighted_average_fcf(fcf_values: List[float]) -> float:
+    weights = FCF_WEIGHTS[:len(fcf_values)]
+    return sum(fcf * w for fcf, w in zip(fcf_values, weights)) / sum(weights)
+
+
+def project_dcf(base_fcf, growth_rate, discount_rate: float = 0.1, years: int = 10,
+                terminal_method: str = 'gordon') -> Dict[str, np.ndarray]:
+    """
+    DCF projection for scalars or arrays (one value per ticker/date):
+    growth_rate for HIGH_GROWTH_YEARS, then fading to MIN_GROWTH, plus a
+    Gordon or exit-multiple terminal value. Rows where the discount rate
+    does not exceed the perpetual growth get NaN.
+    """
+    base_fcf = np.asarray(base_fcf, dtype=float)[..., None]
+    growth_rate = np.asarray(growth_rate, dtype=float)[..., None]
+    year = np.arange(1, years + 1, dtype=float)
+
+    fade = np.maximum(growth_rate * (1 - (year - HIGH_GROWTH_YEARS) / 10), MIN_GROWTH)
+    year_growth = np.where(year <= HIGH_GROWTH_YEARS, growth_rate, fade)
+    cash_flows = base_fcf * (1 + year_growth) ** year
+
+    final_cashflow = cash_flows[..., -1]
+    if terminal_method == 'gordon':
+        perpetual_growth = np.minimum(growth_rate[..., 0] / 2, MAX_PERPETUAL_GROWTH)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terminal_value = np.where(
+                discount_rate > perpetual_growth,
+                final_cashflow * (1 + perpetual_growth) / (discount_rate - perpetual_growth),
+                np.nan
+            )
+    else:  # exit_multiple
+        terminal_value = final_cashflow * EXIT_MULTIPLE
+
+    npv_cash_flows = (cash_flows / (1 + discount_rate) ** year).sum(axis=-1)
+    npv_terminal = terminal_value / (1 + discount_rate) ** years
+    return {
+        'cash_flows': cash_flows,
+        'terminal_value': terminal_value,
+        'npv_cash_flows': npv_cash_flows,
+        'npv_terminal': npv_terminal,
+        'total_value': npv_cash_flows + npv_terminal,
+    }
+
+
 class DCFModel:
     def __init__(self, api_key: str):
         self.api_key = api_key
-        self.base_url = "https://www.alphavantage.co/query"
-        self.cache_dir = os.path.join(os.path.dirname(__file__), 'cache')
+        self.base_url = os.environ.get('ALPHA_VANTAGE_BASE_URL', "https://www.alphavantage.co/query")
+        self.cache_dir = os.environ.get('DCF_CACHE_DIR') or os.path.join(os.path.dirname(__file__), 'cache')
         os.makedirs(self.cache_dir, exist_ok=True)
         self.timeout = aiohttp.ClientTimeout(total=10)  # 10 seconds timeout
         
@@ -29,45 +90,40 @@ class DCFModel:
             if cached_data:
                 logger.info(f"Usando dados em cache para {ticker}")
                 return cached_data
-            
-            # Se não estiver em cache, busca da API com retentativas
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    # Busca dados dos endpoints principais
-                    tasks = [
-                        self._fetch_data("CASH_FLOW", ticker),        # Principal: Fluxo de Caixa
-                        self._fetch_data("INCOME_STATEMENT", ticker),  # Secundário: Demonstração de Resultados
-                        self._fetch_data("OVERVIEW", ticker),         # Dados gerais da empresa
-                    ]
-                    
-                    results = await asyncio.gather(*tasks, return_exceptions=True)
-                    
-                    # Verifica erros
-                    errors = [r for r in results if isinstance(r, Exception)]
-                    if errors:
-                        error_msg = str(errors[0])
-                        if "API rate limit exceeded" in error_msg:
-                            raise ValueError("Limite de requisições da API excedido. Tente novamente em alguns minutos.")
-                        elif "timeout" in error_msg.lower():
-                            if attempt < max_retries - 1:
-                                logger.warning(f"Timeout na tentativa {attempt + 1}, tentando novamente...")
-                                await asyncio.sleep(1)
-                                continue
-                            raise ValueError("Timeout na conexão. Verifique sua conexão com a internet.")
-                        else:
-                            raise ValueError(f"Erro na API: {error_msg}")
-                    
-                    cash_flow, income, overview = results
-                    break  # Sucesso, sai do loop de tentativas
-                    
-                except asyncio.TimeoutError:
-                    if attempt < max_retries - 1:
-                        logger.warning(f"Timeout na tentativa {attempt + 1}, tentando novamente...")
-                        await asyncio.sleep(1)
-                        continue
+
+            # Circuito aberto: nem tenta; serve o cache vencido, se houver
+            if not get_upstream('alpha_vantage').available():
+                return await self._stale_or_raise(ticker, "circuito aberto após falhas seguidas")
+            
+            # Se não estiver em cache, busca da API (cada endpoint com retentativas e backoff)
+            results = await asyncio.gather(
+                self._fetch_data("CASH_FLOW", ticker),         # Principal: Fluxo de Caixa
+                self._fetch_data("INCOME_STATEMENT", ticker),  # Secundário: Demonstração de Resultados
+                self._fetch_data("OVERVIEW", ticker),          # Dados gerais da empresa
+                return_exceptions=True
+            )
+
+            # Verifica erros
+            errors = [r for r in results if isinstance(r, Exception)]
+            if errors:
+                error_msg = str(errors[0])
+                if any(isinstance(e, CircuitOpenError) for e in errors):
+                    return await self._stale_or_raise(ticker, error_msg)
+                if any(isinstance(e, DeadlineExceeded) for e in errors):
+                    raise ValueError("Tempo limite da requisição esgotado ao consultar o Alpha Vantage")
+                if "API rate limit exceeded" in error_msg:
+                    stale = await self._get_from_cache(ticker, max_age=None)
+                    if stale:
+                        logger.warning(f"Limite do Alpha Vantage atingido; usando dados vencidos em cache para {ticker}")
+                        return stale
+                    raise ValueError("Limite de requisições da API excedido. Tente novamente em alguns minutos.")
+                elif "timeout" in error_msg.lower():
                     raise ValueError("Timeout na conexão. Verifique sua conexão com a internet.")
-            
+                else:
+                    raise ValueError(f"Erro na API: {error_msg}")
+
+            cash_flow, income, overview = results
+
             # Validação inicial dos dados
             if not cash_flow or not income or not overview:
                 missing = []
@@ -130,9 +186,7 @@ class DCFModel:
             
             # Calcula médias (com pesos maiores para anos mais recentes)
             if len(fcf_values) > 0:
-                weights = [1.0, 0.8, 0.6, 0.4, 0.2][:len(fcf_values)]
-                weight_sum = sum(weights)
-                avg_fcf = sum(fcf * w for fcf, w in zip(fcf_values, weights)) / weight_sum
+                avg_fcf = weighted_average_fcf(fcf_values)
             else:
                 raise ValueError("Não foi possível calcular o fluxo de caixa livre médio")
             
@@ -205,33 +259,63 @@ class DCFModel:
                 'apikey': self.api_key
             }
             
-            async with aiohttp.ClientSession(timeout=self.timeout) as session:
-                async with session.get(self.base_url, params=params) as response:
-                    if response.status != 200:
-                        raise ValueError(f"API request failed with status {response.status}")
-                    
-                    data = await response.json()
-                    
-                    if "Error Message" in data:
-                        raise ValueError(data["Error Message"])
-                    
-                    if "Note" in data and "Thank you for using Alpha Vantage!" in data["Note"]:
-                        raise ValueError("API rate limit exceeded")
-                    
-                    await asyncio.sleep(0.25)  # Rate limiting
-                    return data
-                    
-        except asyncio.TimeoutError:
+            with span('fetch.alpha_vantage', function=function, ticker=ticker):
+                # A chave da API fica fora da requisição gravada no arquivo do transporte
+                data = await get_policy('alpha_vantage').call(lambda: get_upstream('alpha_vantage').call(
+                    lambda: get_transport().call(
+                        'alpha_vantage', {'function': function, 'symbol': ticker},
+                        lambda: self._request(params)
+                    )
+                ))
+            metrics.record_upstream('alpha_vantage')
+            return data
+
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
+        except asyncio.TimeoutError as e:
+            metrics.record_upstream('alpha_vantage', e)
             raise ValueError(f"Timeout while fetching {function} data")
         except Exception as e:
+            metrics.record_upstream('alpha_vantage', e)
             logger.error(f"Error fetching {function} data for {ticker}: {str(e)}")
             raise
 
-    async def _get_from_cache(self, ticker: str) -> Optional[Dict]:
-        """Get data from cache if available and not expired"""
+    async def _request(self, params: Dict) -> Dict:
+        """Single HTTP request to Alpha Vantage"""
+        async with aiohttp.ClientSession(timeout=self.timeout) as session:
+            async with session.get(self.base_url, params=params) as response:
+                if response.status != 200:
+                    raise ValueError(f"API request failed with status {response.status}")
+
+                data = await response.json()
+
+                if "Error Message" in data:
+                    raise ValueError(data["Error Message"])
+
+                if "Note" in data and "Thank you for using Alpha Vantage!" in data["Note"]:
+                    raise ValueError("API rate limit exceeded")
+
+                # Respostas mais recentes avisam o limite em "Information"
+                if "Information" in data and "rate limit" in data["Information"].lower():
+                    raise ValueError("API rate limit exceeded")
+
+                await asyncio.sleep(0.25)  # Rate limiting
+                return data
+
+    async def _stale_or_raise(self, ticker: str, reason: str) -> Dict:
+        """Expired cache entry while Alpha Vantage is unavailable, or a ValueError if there is none"""
+        stale = await self._get_from_cache(ticker, max_age=None)
+        if stale:
+            logger.warning(f"Alpha Vantage indisponível ({reason}); usando dados vencidos em cache para {ticker}")
+            return stale
+        raise ValueError(f"Alpha Vantage indisponível: {reason}")
+
+    async def _get_from_cache(self, ticker: str, max_age: Optional[timedelta] = timedelta(hours=24)) -> Optional[Dict]:
+        """Get data from cache if available and not older than max_age (None: any age)"""
         cache_file = os.path.join(self.cache_dir, f"{ticker.lower()}.json")
         try:
             if not os.path.exists(cache_file):
+                metrics.record_cache('alpha_vantage', hit=False)
                 return None
                 
             async with aiofiles.open(cache_file, 'r') as f:
@@ -239,13 +323,16 @@ class DCFModel:
                 
             # Check if cache is expired (24 hours)
             cache_time = datetime.fromisoformat(cached['cache_timestamp'])
-            if datetime.now() - cache_time > timedelta(hours=24):
+            if max_age is not None and datetime.now() - cache_time > max_age:
+                metrics.record_cache('alpha_vantage', hit=False)
                 return None
                 
+            metrics.record_cache('alpha_vantage', hit=True)
             return cached['data']
             
         except Exception as e:
             logger.error(f"Error reading cache for {ticker}: {str(e)}")
+            metrics.record_cache('alpha_vantage', hit=False)
             return None
             
     async def _save_to_cache(self, ticker: str, data: Dict):
@@ -292,9 +379,23 @@ class DCFModel:
         """
         Realiza análise DCF usando média histórica de FCF e crescimento
         """
+        with span('dcf', ticker=ticker, terminal_method=terminal_method):
+            return await self._calculate_intrinsic_value(
+                ticker, growth_rate, discount_rate, years, terminal_method
+            )
+
+    async def _calculate_intrinsic_value(
+        self,
+        ticker: str,
+        growth_rate: Optional[float],
+        discount_rate: float,
+        years: int,
+        terminal_method: str
+    ) -> Dict:
         try:
             # Busca dados financeiros
-            financials = await self.fetch_financials(ticker)
+            with span('dcf.fetch_financials', ticker=ticker):
+                financials = await self.fetch_financials(ticker)
             
             # Extrai métricas principais
             fcf_data = financials['financial_metrics']['cash_flow']
@@ -309,46 +410,17 @@ class DCFModel:
                 growth_rate = max(min(income_data['historical_growth'], 0.20), 0.02)
                 logger.info(f"Usando taxa de crescimento histórica de {growth_rate:.1%}")
             
-            # Projeta fluxos de caixa futuros
-            cash_flows = []
-            for year in range(1, years + 1):
-                # Aplica taxa de crescimento decrescente após 5 anos
-                if year <= 5:
-                    year_growth = growth_rate
-                else:
-                    # Reduz gradualmente para 3% (crescimento perpétuo conservador)
-                    year_growth = max(growth_rate * (1 - (year - 5) / 10), 0.03)
-                
-                projected_fcf = base_fcf * (1 + year_growth) ** year
-                cash_flows.append(projected_fcf)
-            
-            # Calcula valor terminal
-            if terminal_method == 'gordon':
-                # Usa taxa de crescimento perpétuo conservadora
-                perpetual_growth = min(growth_rate / 2, 0.03)  # Máximo de 3%
-                
-                if discount_rate <= perpetual_growth:
-                    raise ValueError("Taxa de desconto deve ser maior que a taxa de crescimento perpétuo")
-                
-                terminal_value = cash_flows[-1] * (1 + perpetual_growth) / (discount_rate - perpetual_growth)
-            else:  # exit_multiple
-                # Usa múltiplo de saída conservador baseado no setor
-                exit_multiple = 12  # Múltiplo EV/FCFF conservador
-                terminal_value = cash_flows[-1] * exit_multiple
-            
-            # Calcula valor presente
-            def calculate_present_value(future_value, rate, year):
-                if rate <= -1:  # Evita divisão por zero ou denominadores negativos
-                    raise ValueError("Taxa de desconto inválida")
-                return future_value / ((1 + rate) ** year)
-            
-            # Calcula VPL dos fluxos de caixa e valor terminal
-            try:
-                npv_cash_flows = sum(calculate_present_value(cf, discount_rate, year) 
-                                   for year, cf in enumerate(cash_flows, 1))
-                npv_terminal = calculate_present_value(terminal_value, discount_rate, years)
-            except (ValueError, ZeroDivisionError) as e:
-                raise ValueError(f"Erro nos cálculos de valor presente: {str(e)}")
+            if discount_rate <= -1:  # Evita divisão por zero ou denominadores negativos
+                raise ValueError("Erro nos cálculos de valor presente: Taxa de desconto inválida")
+            if terminal_method == 'gordon' and discount_rate <= min(growth_rate / 2, MAX_PERPETUAL_GROWTH):
+                raise ValueError("Taxa de desconto deve ser maior que a taxa de crescimento perpétuo")
+
+            # Projeta os fluxos (crescimento decrescente após 5 anos), o valor terminal e os valores presentes
+            projection = project_dcf(base_fcf, growth_rate, discount_rate, years, terminal_method)
+            cash_flows = projection['cash_flows'].tolist()
+            terminal_value = float(projection['terminal_value'])
+            npv_cash_flows = float(projection['npv_cash_flows'])
+            npv_terminal = float(projection['npv_terminal'])
             
             # Calcula valor total e por ação
             total_value = npv_cash_flows + npv_terminal
@@ -0,0 +1,316 @@
+import logging
+import math
+import os
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'cache', 'fundamentals')
+
+# Demonstrações canônicas -> campo -> rótulos do Yahoo Finance, na ordem de preferência
+# (os mesmos que YahooFinanceAPI procura ao calcular qualidade e WACC)
+STATEMENT_FIELDS: Dict[str, Dict[str, List[str]]] = {
+    'income': {
+        'revenue': ['Total Revenue', 'Operating Revenue'],
+        'operating_income': ['Operating Income', 'EBIT'],
+        'net_income': ['Net Income', 'Net Income Common Stockholders'],
+        'interest_expense': ['Interest Expense', 'Interest Expense Non Operating', 'Interest Expense Net'],
+    },
+    'balance': {
+        'total_debt': ['Total Debt', 'Long Term Debt', 'Short Long Term Debt', 'Current Debt'],
+        'total_assets': ['Total Assets'],
+        'total_equity': ['Stockholders Equity', 'Total Equity Gross Minority Interest'],
+        'cash': ['Cash And Cash Equivalents', 'Cash Cash Equivalents And Short Term Investments'],
+        'shares_outstanding': ['Ordinary Shares Number', 'Share Issued'],
+    },
+    'cash_flow': {
+        'operating_cash_flow': [
+            'Total Cash From Operating Activities', 'Operating Cash Flow', 'Cash Flow From Operating Activities',
+            'Net Operating Cash Flow', 'Cash Flow from Operating Activities',
+        ],
+        'capital_expenditure': [
+            'Capital Expenditures', 'Purchase Of Plant And Equipment', 'Purchase Of Property And Equipment',
+            'Property Plant And Equipment', 'Capex', 'Capital Expenditure',
+        ],
+        'free_cash_flow': ['Free Cash Flow'],
+        'working_capital_change': ['Change In Working Capital', 'Changes In Working Capital'],
+    },
+}
+# calculate_wacc soma todos os rótulos de dívida e de juros encontrados; o store guarda a mesma soma
+SUMMED_FIELDS = {'total_debt', 'interest_expense'}
+
+MARKET_FIELDS = ['price', 'shares_outstanding', 'market_cap', 'beta']
+# Moedas da cotação e das demonstrações (financialCurrency): o FCF e a dívida são convertidos para a da cotação
+MARKET_TEXT_FIELDS = ['currency', 'financial_currency']
+PRICE_FIELDS = ['close']
+STATEMENTS = tuple(STATEMENT_FIELDS) + ('market', 'prices')
+
+
+def fields(statement: str) -> List[str]:
+    if statement == 'market':
+        return MARKET_FIELDS
+    if statement == 'prices':
+        return PRICE_FIELDS
+    return list(STATEMENT_FIELDS[statement])
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        raise ValueError("O store de fundamentos requer o pacote pyarrow (pip install pyarrow)")
+    return pa, pc
+
+
+def _number(value) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def _period(label) -> date:
+    if isinstance(label, datetime):
+        return label.date()
+    if isinstance(label, date):
+        return label
+    if hasattr(label, 'date'):  # pandas.Timestamp
+        return label.date()
+    return datetime.fromisoformat(str(label)[:10]).date()
+
+
+def extract(ticker: str, statements: Dict, info: Dict, as_of: Optional[date] = None,
+            prices=None) -> Dict[str, List[Dict]]:
+    """
+    Turn yfinance frames ({'income': df, 'balance': df, 'cash_flow': df},
+    rows = labels, columns = periods), the info dict and optionally the
+    price history (yf.Ticker.history(), indexed by date) into plain rows per
+    canonical statement. Nothing returned references the DataFrames.
+    """
+    records: Dict[str, List[Dict]] = {}
+    for statement, mapping in STATEMENT_FIELDS.items():
+        frame = statements.get(statement)
+        if frame is None or frame.empty:
+            continue
+        rows = []
+        for period in frame.columns:
+            row = {'ticker': ticker, 'period': _period(period)}
+            for field, labels in mapping.items():
+                value = 0.0 if field in SUMMED_FIELDS else None
+                for label in labels:
+                    if label in frame.index:
+                        number = _number(frame.at[label, period])
+                        if number is None:
+                            continue
+                        if field not in SUMMED_FIELDS:
+                            value = number
+                            break
+                        value += abs(number) if field == 'interest_expense' else number
+                row[field] = value
+            rows.append(row)
+        records[statement] = rows
+
+    cash_flow = records.get('cash_flow', [])
+    for row in cash_flow:
+        if row['free_cash_flow'] is None and row['operating_cash_flow'] is not None:
+            row['free_cash_flow'] = row['operating_cash_flow'] + (row['capital_expenditure'] or 0.0)
+
+    records['market'] = [{
+        'ticker': ticker,
+        'period': as_of or date.today(),
+        'price': _number(info.get('currentPrice') or info.get('regularMarketPrice')),
+        'shares_outstanding': _number(info.get('sharesOutstanding')),
+        'market_cap': _number(info.get('marketCap')),
+        'beta': _number(info.get('beta')),
+        'currency': info.get('currency'),
+        'financial_currency': info.get('financialCurrency'),
+    }]
+    if prices is not None and not prices.empty:
+        records['prices'] = [
+            {'ticker': ticker, 'period': _period(day), 'close': close}
+            for day, close in zip(prices.index, (_number(v) for v in prices['Close']))
+            if close is not None
+        ]
+    return records
+
+
+class FundamentalsStore:
+    """
+    Columnar fundamentals for the whole universe: one Arrow IPC file per
+    canonical statement (income, balance, cash_flow, market) and for the
+    daily closes (prices), rows sorted by ticker and then period (newest
+    first). Files are opened memory-mapped, so reads are zero-copy and scans
+    touch only the columns they use.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get('FUNDAMENTALS_PATH') or DEFAULT_PATH
+        self._tables: Dict[str, object] = {}
+        self._index: Dict[str, Dict[str, Tuple[int, int]]] = {}
+
+    def _file(self, statement: str) -> str:
+        return os.path.join(self.path, f"{statement}.arrow")
+
+    def _schema(self, statement: str):
+        pa, _ = _pyarrow()
+        text = MARKET_TEXT_FIELDS if statement == 'market' else []
+        return pa.schema(
+            [('ticker', pa.string()), ('period', pa.date32())] +
+            [(field, pa.float64()) for field in fields(statement)] +
+            [(field, pa.string()) for field in text]
+        )
+
+    def table(self, statement: str):
+        """The whole statement as a memory-mapped pyarrow Table"""
+        if statement not in STATEMENTS:
+            raise ValueError(f"Demonstração inválida: {statement}. Use uma de {list(STATEMENTS)}")
+        if statement not in self._tables:
+            pa, _ = _pyarrow()
+            if os.path.exists(self._file(statement)):
+                source = pa.memory_map(self._file(statement), 'r')
+                table = pa.ipc.open_file(source).read_all()
+                # Arquivos gravados antes de uma coluna existir: a coluna vem vazia
+                schema = self._schema(statement)
+                for field in schema:
+                    if field.name not in table.column_names:
+                        table = table.append_column(field, pa.nulls(table.num_rows, field.type))
+                self._tables[statement] = table.select(schema.names)
+            else:
+                self._tables[statement] = self._schema(statement).empty_table()
+        return self._tables[statement]
+
+    def _runs(self, statement: str) -> Dict[str, Tuple[int, int]]:
+        """ticker -> (first row, end row); the file is sorted by ticker"""
+        if statement not in self._index:
+            import numpy as np
+            tickers = self.table(statement).column('ticker').to_numpy()
+            if len(tickers) == 0:
+                self._index[statement] = {}
+            else:
+                starts = np.flatnonzero(np.r_[True, tickers[1:] != tickers[:-1]])
+                ends = np.r_[starts[1:], len(tickers)]
+                self._index[statement] = {
+                    tickers[start]: (int(start), int(end)) for start, end in zip(starts, ends)
+                }
+        return self._index[statement]
+
+    def tickers(self, statement: str = 'market') -> List[str]:
+        return list(self._runs(statement))
+
+    def history(self, ticker: str, statement: str):
+        """Every period of one ticker, newest first (a zero-copy slice)"""
+        start, end = self._runs(statement).get(ticker, (0, 0))
+        return self.table(statement).slice(start, end - start)
+
+    def latest(self, statement: str, columns: Optional[List[str]] = None):
+        """One row per ticker with its most recent period"""
+        import numpy as np
+        table = self.table(statement)
+        if columns is not None:
+            table = table.select(['ticker', 'period'] + list(columns))
+        starts = np.array([start for start, _ in self._runs(statement).values()], dtype=np.int64)
+        return table.take(starts)
+
+    def valuation_inputs(self):
+        """
+        Latest FCF, net income, debt and WACC inputs of every ticker in one
+        table, with the quote and statement currencies, plus the FCF CAGR over the stored periods that have
+        an FCF (same rule as YahooFinanceAPI.calculate_cagr). Built with vectorized reads only.
+        """
+        import numpy as np
+        pa, _ = _pyarrow()
+
+        market = self.latest('market')
+        tickers = market.column('ticker').to_pylist()
+        columns = {'ticker': market.column('ticker')}
+        for field in MARKET_FIELDS + MARKET_TEXT_FIELDS:
+            columns[field] = market.column(field)
+
+        def aligned(statement: str, names: List[str]):
+            runs = self._runs(statement)
+            rows = np.array([runs.get(t, (-1, -1))[0] for t in tickers], dtype=np.int64)
+            present = rows >= 0
+            table = self.table(statement)
+            for name in names:
+                values = np.full(len(tickers), np.nan)
+                if present.any():
+                    column = table.column(name).take(pa.array(rows[present]))
+                    values[present] = column.to_numpy().astype(float)
+                columns[name] = pa.array(values, from_pandas=True)
+            return runs, present
+
+        aligned('income', ['net_income', 'interest_expense'])
+        aligned('balance', ['total_debt'])
+        runs, present = aligned('cash_flow', [
+            'free_cash_flow', 'operating_cash_flow', 'capital_expenditure', 'working_capital_change'
+        ])
+
+        # CAGR do FCF como ratings.cagr: só períodos com FCF, do mais recente ao mais antigo, em len(histórico) anos
+        fcf = self.table('cash_flow').column('free_cash_flow').to_numpy().astype(float)
+        finite = np.isfinite(fcf)
+        positions = np.arange(len(fcf))
+        # Próximo e anterior índice com FCF, para achar as pontas de cada ticker sem laço
+        next_finite = np.minimum.accumulate(np.where(finite, positions, len(fcf))[::-1])[::-1]
+        previous_finite = np.maximum.accumulate(np.where(finite, positions, -1))
+        counts = np.r_[0, np.cumsum(finite)]
+        bounds = np.array([runs.get(t, (0, 0)) for t in tickers], dtype=np.int64).reshape(-1, 2)
+        periods = counts[bounds[:, 1]] - counts[bounds[:, 0]]
+        growth = np.zeros(len(tickers))
+        valid = present & (periods >= 2)
+        if valid.any():
+            newest = fcf[next_finite[bounds[valid, 0]]]
+            oldest = fcf[previous_finite[bounds[valid, 1] - 1]]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cagr = (np.power(newest / oldest, 1.0 / periods[valid]) - 1) * 100
+            growth[valid] = np.where((oldest > 0) & np.isfinite(cagr), cagr, 0.0)
+        columns['fcf_growth_rate'] = pa.array(growth)
+        return pa.table(columns)
+
+    def write(self, records: Iterable[Dict[str, List[Dict]]]):
+        """
+        Add or replace tickers. Each item is extract()'s output for one
+        ticker; every statement file is rewritten once, sorted, and swapped in
+        atomically. A record without prices keeps the stored price history.
+        """
+        pa, pc = _pyarrow()
+        new_rows: Dict[str, List[Dict]] = {statement: [] for statement in STATEMENTS}
+        replaced: Dict[str, set] = {statement: set() for statement in STATEMENTS}
+        for record in records:
+            tickers = {row['ticker'] for rows in record.values() for row in rows}
+            for statement in STATEMENTS:
+                if statement != 'prices' or statement in record:
+                    replaced[statement] |= tickers
+            for statement, rows in record.items():
+                new_rows[statement].extend(rows)
+        if not any(replaced.values()):
+            return
+
+        os.makedirs(self.path, exist_ok=True)
+        for statement in STATEMENTS:
+            schema = self._schema(statement)
+            existing = self.table(statement)
+            if existing.num_rows:
+                keep = pc.invert(pc.is_in(existing.column('ticker'), value_set=pa.array(sorted(replaced[statement]), pa.string())))
+                existing = existing.filter(keep)
+            added = pa.Table.from_pylist(new_rows[statement], schema=schema)
+            table = pa.concat_tables([existing.cast(schema), added])
+            table = table.sort_by([('ticker', 'ascending'), ('period', 'descending')])
+
+            # Solta o mapeamento antigo antes de substituir o arquivo
+            self._tables.pop(statement, None)
+            self._index.pop(statement, None)
+            existing = None
+
+            temp = self._file(statement) + '.tmp'
+            with pa.OSFile(temp, 'wb') as sink:
+                with pa.ipc.new_file(sink, schema) as writer:
+                    writer.write_table(table, max_chunksize=65536)
+            os.replace(temp, self._file(statement))
+        logger.info(f"{len(replaced['market'])} tickers gravados no store de fundamentos em {self.path}")
+
+    def close(self):
+        self._tables.clear()
+        self._index.clear()
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+import aiofiles
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_HOURS = 24.0
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_TOLERANCE = 0.02  # Variações relativas de até ~2% reutilizam a mesma análise
+
+
+def quantize(value: float, tolerance: float) -> Any:
+    """
+    Map a number to a (sign, log-scale bucket) pair so values within
+    ~tolerance share a key. The sign is kept apart from the bucket: the
+    bucket of |x| < 1 is negative, and folding the sign into it would put
+    x and 1/x (or x and -x) in the same bucket.
+    """
+    if tolerance <= 0 or value == 0 or not math.isfinite(value):
+        return value
+    bucket = round(math.log(abs(value)) / math.log1p(tolerance))
+    return (1 if value > 0 else -1, bucket)
+
+
+def normalize_analysis_data(data: Any, tolerance: float) -> Any:
+    """Recursively quantize every number in the analysis data"""
+    if isinstance(data, dict):
+        return {str(k): normalize_analysis_data(v, tolerance) for k, v in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [normalize_analysis_data(v, tolerance) for v in data]
+    if isinstance(data, bool) or data is None or isinstance(data, str):
+        return data
+    try:
+        return quantize(float(data), tolerance)
+    except (TypeError, ValueError):
+        return str(data)
+
+
+class LLMCache:
+    """Persistent cache of LLM completions keyed on the normalized prompt inputs"""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        ttl_hours: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        tolerance: Optional[float] = None
+    ):
+        self.cache_dir = cache_dir or os.environ.get("LLM_CACHE_DIR") or os.path.join(
+            os.path.dirname(__file__), 'cache', 'llm'
+        )
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.ttl = timedelta(hours=ttl_hours if ttl_hours is not None else float(
+            os.environ.get("LLM_CACHE_TTL_HOURS", DEFAULT_TTL_HOURS)
+        ))
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.environ.get("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+        )
+        self.tolerance = tolerance if tolerance is not None else float(
+            os.environ.get("LLM_CACHE_TOLERANCE", DEFAULT_TOLERANCE)
+        )
+
+    def make_key(self, model: str, system_prompt: str, temperature: float, ticker: str, data: Dict) -> str:
+        """Hash the request parameters and the normalized analysis data"""
+        payload = {
+            'model': model,
+            'system_prompt': system_prompt,
+            'temperature': temperature,
+            'ticker': ticker.upper(),
+            'data': normalize_analysis_data(data, self.tolerance)
+        }
+        encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    async def get(self, key: str) -> Optional[str]:
+        """Get a cached completion if available and not expired"""
+        cache_file = self._path(key)
+        try:
+            if not os.path.exists(cache_file):
+                metrics.record_cache('llm', hit=False)
+                return None
+
+            async with aiofiles.open(cache_file, 'r') as f:
+                cached = json.loads(await f.read())
+
+            cache_time = datetime.fromisoformat(cached['cache_timestamp'])
+            if datetime.now() - cache_time > self.ttl:
+                os.remove(cache_file)
+                metrics.record_cache('llm', hit=False)
+                return None
+
+            metrics.record_cache('llm', hit=True)
+            return cached['content']
+
+        except Exception as e:
+            logger.error(f"Error reading LLM cache entry {key}: {str(e)}")
+            metrics.record_cache('llm', hit=False)
+            return None
+
+    async def set(self, key: str, content: str):
+        """Save a completion and evict the oldest entries beyond the size cap"""
+        try:
+            cache_data = {
+                'cache_timestamp': datetime.now().isoformat(),
+                'content': content
+            }
+            async with aiofiles.open(self._path(key), 'w') as f:
+                await f.write(json.dumps(cache_data))
+            self._evict()
+        except Exception as e:
+            logger.error(f"Error saving LLM cache entry {key}: {str(e)}")
+
+    def _evict(self):
+        """Remove the least recently written entries beyond max_entries"""
+        entries = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if name.endswith('.json')
+        ]
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
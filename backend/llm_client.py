@@ -0,0 +1,153 @@
+import asyncio
+import os
+import logging
+import threading
+import weakref
+from typing import AsyncIterator, Optional, Tuple, TYPE_CHECKING
+
+import metrics
+from retry import RetryPolicy
+from transport import REPLAY, RECORD, get_transport
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_MAX_RETRIES = 2
+
+
+class LLMClient:
+    """
+    Shared AsyncOpenAI client with a bounded number of in-flight requests
+    (per event loop: each loop gets its own connection pool and limit).
+    Retries (max_retries, jittered backoff within the request deadline) are
+    done here rather than by the SDK, so they share the pipeline's policy.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None
+    ):
+        self.max_concurrency = max_concurrency if max_concurrency is not None else int(
+            os.environ.get("OPENAI_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)
+        )
+        if self.max_concurrency < 1:
+            raise ValueError(f"max_concurrency deve ser pelo menos 1 (recebido {self.max_concurrency})")
+        self.timeout = timeout if timeout is not None else float(os.environ.get("OPENAI_TIMEOUT", DEFAULT_TIMEOUT))
+        self.max_retries = max_retries if max_retries is not None else int(
+            os.environ.get("OPENAI_MAX_RETRIES", DEFAULT_MAX_RETRIES)
+        )
+        self.retry = RetryPolicy('openai', attempts=self.max_retries + 1)
+        # Um cliente e um semáforo por event loop; somem junto com o loop
+        self._bound: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Tuple]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _bind(self) -> Tuple[Optional["AsyncOpenAI"], asyncio.Semaphore]:
+        """Return the client and semaphore of the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            bound = self._bound.get(loop)
+            if bound is None:
+                # The httpx connection pool and the semaphore belong to the loop
+                # that created them, so each loop gets its own; loops running in
+                # other threads keep theirs (and their requests in flight).
+                bound = self._bound[loop] = (self._new_client(), asyncio.Semaphore(self.max_concurrency))
+        return bound
+
+    def _new_client(self) -> Optional["AsyncOpenAI"]:
+        # openai is imported here so name lookups served locally never load it.
+        # Replays never reach the network, so they need neither the client nor a key
+        if get_transport().mode_for('openai') == REPLAY:
+            return None
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(
+            api_key=os.environ.get("OPENAI_API_KEY"),
+            timeout=self.timeout,
+            max_retries=0
+        )
+
+    async def chat(self, **kwargs):
+        """Create a chat completion, waiting for a free slot if the limit is reached"""
+        client, semaphore = self._bind()
+
+        async def attempt():
+            # A vaga é liberada durante o backoff entre tentativas
+            async with semaphore:
+                return await get_transport().call(
+                    'openai', kwargs, lambda: client.chat.completions.create(**kwargs),
+                    encode=lambda completion: completion.model_dump(), decode=_decode_completion
+                )
+        try:
+            response = await self.retry.call(attempt)
+        except Exception as e:
+            metrics.record_upstream('openai', e)
+            raise
+        metrics.record_upstream('openai')
+        return response
+
+    async def chat_stream(self, **kwargs) -> AsyncIterator[str]:
+        """Stream a chat completion, yielding content deltas as they arrive"""
+        client, semaphore = self._bind()
+        transport = get_transport()
+        mode = transport.mode_for('openai.stream')
+        async with semaphore:
+            try:
+                if mode == REPLAY:
+                    for delta in await transport.replay('openai.stream', kwargs):
+                        yield delta
+                else:
+                    deltas = []
+                    # Só a abertura é repetida: depois do primeiro trecho enviado não há como recomeçar
+                    stream = await self.retry.call(lambda: client.chat.completions.create(stream=True, **kwargs))
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            deltas.append(delta)
+                            yield delta
+                    if mode == RECORD:
+                        transport.record('openai.stream', kwargs, deltas)
+            except Exception as e:
+                metrics.record_upstream('openai', e)
+                raise
+        metrics.record_upstream('openai')
+
+    async def close(self):
+        """Close the HTTP connection pool of the running event loop (call it before the loop ends)"""
+        with self._lock:
+            bound = self._bound.pop(asyncio.get_running_loop(), None)
+        if bound is not None and bound[0] is not None:
+            await bound[0].close()
+
+
+def _decode_completion(data):
+    """Rebuild a recorded completion so callers keep using response.choices[0].message.content"""
+    from openai.types.chat import ChatCompletion
+    return ChatCompletion.model_validate(data)
+
+
+_shared_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """Get the process-wide LLM client"""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = LLMClient()
+        logger.debug(
+            f"Created shared LLM client (concurrency={_shared_client.max_concurrency}, "
+            f"timeout={_shared_client.timeout}s, retries={_shared_client.max_retries})"
+        )
+    return _shared_client
+
+
+async def close_llm_client():
+    """Close the shared client's connections on the running loop, if it was ever created"""
+    if _shared_client is not None:
+        await _shared_client.close()
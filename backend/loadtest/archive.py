@@ -0,0 +1,48 @@
+import gzip
+import json
+from typing import Dict, List
+
+from benchmarks.fixtures import STATEMENTS, universe
+from transport import request_key
+
+
+def _frame(statement: Dict, scale: float) -> Dict:
+    """A fixture statement in the encoding YahooFinanceAPI uses for the transport archive"""
+    if not statement or not statement['rows']:
+        return {'frame': {'index': [], 'columns': [], 'data': []}}
+    return {'frame': {
+        'index': list(statement['rows']),
+        'columns': list(statement['columns']),
+        'data': [[v * scale if v is not None else None for v in values] for values in statement['rows'].values()],
+    }}
+
+
+def yahoo_entries(ticker: str, fixture: Dict, scale: float) -> List[Dict]:
+    info = dict(fixture['info'])
+    for key in ('sharesOutstanding', 'marketCap'):
+        if key in info:
+            info[key] = info[key] * scale
+
+    responses = {'info': {'value': info}, 'fast_info.last_price': info.get('currentPrice')}
+    for name in STATEMENTS:
+        responses[name] = _frame(fixture['statements'].get(name), scale)
+
+    entries = []
+    for attribute, response in responses.items():
+        request = {'ticker': ticker, 'attribute': attribute}
+        entries.append({
+            'key': request_key('yahoo', request), 'service': 'yahoo',
+            'request': request, 'response': response,
+        })
+    return entries
+
+
+def build_yahoo_archive(path: str, size: int, fixtures: Dict[str, Dict]) -> List[str]:
+    """Write a replay archive answering Yahoo for `size` synthetic tickers; returns the tickers"""
+    tickers = []
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        for ticker, fixture, scale in universe(size, fixtures):
+            for entry in yahoo_entries(ticker, fixture, scale):
+                f.write(json.dumps(entry) + '\n')
+            tickers.append(ticker)
+    return tickers
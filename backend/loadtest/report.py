@@ -0,0 +1,92 @@
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+KINDS = ('valuation', 'batch', 'history', 'repeat', 'ai')
+DEFAULT_MIX = "valuation=55,repeat=25,history=10,batch=5,ai=5"
+
+
+def parse_mix(value: str) -> List[Tuple[str, float]]:
+    """'valuation=60,repeat=40' -> [(kind, weight)], weights normalized to 1"""
+    mix = []
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        kind, _, weight = item.partition('=')
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise ValueError(f"Tipo de requisição inválido: {kind}. Use um de {list(KINDS)}")
+        mix.append((kind, float(weight or 1)))
+    total = sum(weight for _, weight in mix)
+    if total <= 0:
+        raise ValueError("A mistura de requisições precisa de ao menos um peso positivo")
+    return [(kind, weight / total) for kind, weight in mix if weight > 0]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class StepResult:
+    """Outcome of one load step (one target RPS)"""
+
+    def __init__(self, target_rps: float, duration: float):
+        self.target_rps = target_rps
+        self.duration = duration
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.sent = 0
+        self.rss_peak: Dict[int, int] = {}
+
+    def add(self, kind: str, latency: float, ok: bool):
+        self.latencies.setdefault(kind, []).append(latency)
+        if not ok:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def sample_rss(self, pids: List[int]):
+        for pid in pids:
+            rss = rss_bytes(pid)
+            if rss is not None:
+                self.rss_peak[pid] = max(self.rss_peak.get(pid, 0), rss)
+
+    def summary(self, kind: Optional[str] = None) -> Dict:
+        if kind is None:
+            values = sorted(v for latencies in self.latencies.values() for v in latencies)
+            errors = sum(self.errors.values())
+        else:
+            values = sorted(self.latencies.get(kind, []))
+            errors = self.errors.get(kind, 0)
+        completed = len(values)
+        return {
+            'completed': completed,
+            'throughput': completed / self.duration if self.duration else 0.0,
+            'error_rate': errors / completed if completed else 0.0,
+            'p50': percentile(values, 0.50),
+            'p95': percentile(values, 0.95),
+            'p99': percentile(values, 0.99),
+        }
+
+
+def rss_bytes(pid: int) -> Optional[int]:
+    """Resident memory of a process from /proc (Linux); None elsewhere"""
+    try:
+        with open(f"/proc/{pid}/status", encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        return None
+    return None
+
+
+def child_pids(pid: int) -> List[int]:
+    """Direct children of a process (the uvicorn workers), from /proc"""
+    path = f"/proc/{pid}/task/{pid}/children"
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='ascii') as f:
+        return [int(p) for p in f.read().split()]
@@ -0,0 +1,253 @@
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+import typer
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks.fixtures import load_fixtures
+from loadtest.archive import build_yahoo_archive
+from loadtest.report import DEFAULT_MIX, StepResult, child_pids, parse_mix
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+console = Console()
+app = typer.Typer(add_completion=False)
+
+
+def _spawn(args: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable] + args, cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+
+
+async def _wait_ready(session: aiohttp.ClientSession, url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Processo encerrou ao iniciar:\n{process.stderr.read()[-2000:]}")
+        try:
+            async with session.get(url) as response:
+                if response.status < 500:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Tempo esgotado esperando {url}")
+
+
+class LoadGenerator:
+    """Open-loop load: requests start on schedule whether or not earlier ones finished"""
+
+    def __init__(self, base_url: str, tickers: List[str], alpha_vantage_tickers: List[str],
+                 mix, source: str, batch_size: int, hot_set: int, seed: Optional[int]):
+        self.base_url = base_url
+        self.tickers = tickers
+        self.alpha_vantage_tickers = alpha_vantage_tickers
+        self.kinds = [kind for kind, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.source = source
+        self.batch_size = batch_size
+        self.hot = tickers[:max(1, hot_set)]
+        self._random = random.Random(seed)
+
+    def _ticker(self) -> str:
+        pool = self.alpha_vantage_tickers if self.source != 'yahoo' else self.tickers
+        return self._random.choice(pool)
+
+    def _request(self, kind: str):
+        valuation = f"{self.base_url}/api/v1/valuation"
+        params = {'preferred_source': self.source}
+        if kind == 'valuation':
+            return 'GET', f"{valuation}/{self._ticker()}", params, None
+        if kind == 'repeat':
+            return 'GET', f"{valuation}/{self._random.choice(self.hot)}", params, None
+        if kind == 'ai':
+            return 'GET', f"{valuation}/{self._random.choice(self.tickers)}", {'include_ai': 'true'}, None
+        if kind == 'history':
+            return 'GET', f"{valuation}/{self._random.choice(self.hot)}/history", {'limit': 10}, None
+        tickers = [self._ticker() for _ in range(self.batch_size)]
+        return 'POST', f"{valuation}/batch", None, {'tickers': tickers, 'preferred_source': self.source}
+
+    async def _one(self, session: aiohttp.ClientSession, kind: str, result: StepResult):
+        method, url, params, body = self._request(kind)
+        start = time.perf_counter()
+        ok = False
+        try:
+            async with session.request(method, url, params=params, json=body) as response:
+                await response.read()
+                ok = response.status < 400
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+        result.add(kind, time.perf_counter() - start, ok)
+
+    async def step(self, session: aiohttp.ClientSession, rps: float, duration: float,
+                   server_pid: int) -> StepResult:
+        result = StepResult(rps, duration)
+        tasks = set()
+        start = time.monotonic()
+        next_sample = start
+        i = 0
+        while True:
+            due = start + i / rps
+            if due - start >= duration:
+                break
+            now = time.monotonic()
+            if due > now:
+                await asyncio.sleep(due - now)
+            kind = self._random.choices(self.kinds, self.weights)[0]
+            task = asyncio.create_task(self._one(session, kind, result))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            result.sent += 1
+            i += 1
+            if time.monotonic() >= next_sample:
+                result.sample_rss(child_pids(server_pid) or [server_pid])
+                next_sample += 1.0
+        # Requisições ainda em andamento contam na latência da etapa
+        if tasks:
+            await asyncio.wait(tasks)
+        result.duration = time.monotonic() - start
+        result.sample_rss(child_pids(server_pid) or [server_pid])
+        return result
+
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value * 1000:,.0f}" if value is not None else "-"
+
+
+def print_step(result: StepResult):
+    table = Table(title=f"{result.target_rps:g} req/s alvo — {result.sent} enviadas em {result.duration:.1f}s")
+    table.add_column("Tipo")
+    table.add_column("Concluídas", justify="right")
+    table.add_column("req/s", justify="right")
+    table.add_column("p50 ms", justify="right")
+    table.add_column("p95 ms", justify="right")
+    table.add_column("p99 ms", justify="right")
+    table.add_column("Erros", justify="right")
+    for kind in sorted(result.latencies) + [None]:
+        summary = result.summary(kind)
+        style = "bold" if kind is None else ""
+        table.add_row(
+            kind or "total", str(summary['completed']), f"{summary['throughput']:.1f}",
+            _ms(summary['p50']), _ms(summary['p95']), _ms(summary['p99']),
+            f"{summary['error_rate']:.1%}", style=style
+        )
+    console.print(table)
+    if result.rss_peak:
+        memory = ", ".join(f"pid {pid}: {rss / 2**20:,.0f} MiB" for pid, rss in sorted(result.rss_peak.items()))
+        console.print(f"[dim]Memória (pico por worker): {memory}[/dim]")
+
+
+async def run_load(rps_steps: List[float], duration: float, workers: int, universe_size: int, mix, source: str,
+                   batch_size: int, hot_set: int, yahoo_latency: str, alpha_vantage_latency: str,
+                   openai_latency: str, error_rate: float, mongo_url: Optional[str], port: int, seed: Optional[int]):
+    scratch = tempfile.mkdtemp(prefix='intrinsic-loadtest-')
+    processes: List[subprocess.Popen] = []
+    try:
+        fixtures = load_fixtures()
+        archive = os.path.join(scratch, 'yahoo.jsonl.gz')
+        tickers = build_yahoo_archive(archive, universe_size, fixtures)
+        alpha_vantage_tickers = [t for t in tickers if t.startswith(('AAPL', 'MSFT'))]
+
+        stub_env = dict(os.environ)
+        processes.append(_spawn([
+            '-m', 'loadtest.stubs', '--alpha-vantage-port', str(port + 1), '--openai-port', str(port + 2),
+            '--alpha-vantage-latency-ms', alpha_vantage_latency, '--openai-latency-ms', openai_latency,
+        ] + (['--seed', str(seed)] if seed is not None else []), stub_env))
+
+        env = dict(os.environ)
+        env.update({
+            # Yahoo responde do arquivo gerado; Alpha Vantage e OpenAI vão aos stubs por HTTP
+            'UPSTREAM_MODE': 'replay',
+            'UPSTREAM_SERVICES': 'yahoo',
+            'UPSTREAM_ARCHIVE': archive,
+            'REPLAY_LATENCY_MS': yahoo_latency,
+            'REPLAY_ERROR_RATE': str(error_rate),
+            'ALPHA_VANTAGE_BASE_URL': f"http://127.0.0.1:{port + 1}/query",
+            'ALPHA_VANTAGE_API_KEY': 'loadtest',
+            'OPENAI_BASE_URL': f"http://127.0.0.1:{port + 2}/v1",
+            'OPENAI_API_KEY': 'loadtest',
+            'DCF_CACHE_DIR': os.path.join(scratch, 'dcf'),
+            'LLM_CACHE_DIR': os.path.join(scratch, 'llm'),
+            'API_RATE_LIMIT': str(10 ** 9),
+            'API_STORE_VALUATIONS': '1' if mongo_url else '0',
+            'INTRINSIC_DAEMON': '0',
+        })
+        if mongo_url:
+            env['MONGODB_URL'] = mongo_url
+        server = _spawn([
+            '-m', 'uvicorn', 'api:app', '--host', '127.0.0.1', '--port', str(port),
+            '--workers', str(workers), '--log-level', 'warning', '--no-access-log',
+        ], env)
+        processes.append(server)
+
+        base_url = f"http://127.0.0.1:{port}"
+        timeout = aiohttp.ClientTimeout(total=60)
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            await _wait_ready(session, f"http://127.0.0.1:{port + 1}/query", processes[0])
+            await _wait_ready(session, f"{base_url}/ping", server)
+
+            generator = LoadGenerator(base_url, tickers, alpha_vantage_tickers, mix, source,
+                                      batch_size, hot_set, seed)
+            for rps in rps_steps:
+                console.print(f"[cyan]Etapa de {rps:g} req/s por {duration:g}s...[/cyan]")
+                print_step(await generator.step(session, rps, duration, server.pid))
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+@app.command()
+def main(
+    rps: str = typer.Option("10,25,50,100", "--rps", help="Taxas alvo (req/s), uma etapa por valor"),
+    duration: float = typer.Option(30.0, "--duration", min=1, help="Segundos por etapa"),
+    workers: int = typer.Option(1, "--workers", min=1, help="Workers do uvicorn"),
+    universe_size: int = typer.Option(500, "--tickers", min=1, help="Tickers sintéticos disponíveis"),
+    mix: str = typer.Option(DEFAULT_MIX, "--mix", help="Pesos por tipo: valuation, repeat, history, batch, ai"),
+    source: str = typer.Option("yahoo", "--source", help="preferred_source das avaliações"),
+    batch_size: int = typer.Option(10, "--batch-size", min=1, max=50),
+    hot_set: int = typer.Option(20, "--hot-set", min=1, help="Tickers repetidos pelas requisições 'repeat'"),
+    yahoo_latency: str = typer.Option("50-300", "--yahoo-latency-ms", help="Latência injetada no Yahoo"),
+    alpha_vantage_latency: str = typer.Option("80-250", "--alpha-vantage-latency-ms"),
+    openai_latency: str = typer.Option("400-1500", "--openai-latency-ms"),
+    error_rate: float = typer.Option(0.0, "--yahoo-error-rate", min=0, max=1, help="Fração de respostas do Yahoo com erro"),
+    mongo_url: Optional[str] = typer.Option(None, "--mongo-url", help="MongoDB para gravação e histórico (sem ele, 'history' é removido)"),
+    port: int = typer.Option(8700, "--port", help="Porta da API; os stubs usam as duas seguintes"),
+    seed: Optional[int] = typer.Option(None, "--seed"),
+):
+    """Teste de carga da API HTTP com stubs locais de Yahoo, Alpha Vantage e OpenAI."""
+    try:
+        request_mix = parse_mix(mix)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="--mix")
+    if not mongo_url and any(kind == 'history' for kind, _ in request_mix):
+        console.print("[yellow]Sem --mongo-url: requisições de histórico removidas da mistura.[/yellow]")
+        request_mix = parse_mix(','.join(f"{k}={w}" for k, w in request_mix if k != 'history'))
+    if source not in ('yahoo', 'alpha_vantage', 'both'):
+        raise typer.BadParameter("Use yahoo, alpha_vantage ou both", param_hint="--source")
+
+    steps = [float(r) for r in rps.split(',') if r.strip()]
+    asyncio.run(run_load(
+        steps, duration, workers, universe_size, request_mix, source, batch_size, hot_set,
+        yahoo_latency, alpha_vantage_latency, openai_latency, error_rate, mongo_url, port, seed
+    ))
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Dict, Optional, Tuple
+
+import typer
+from aiohttp import web
+
+from benchmarks.fixtures import alpha_vantage_payloads, load_fixtures
+from transport import parse_latency
+
+STUB_ANALYSIS = (
+    "## Análise (stub de teste de carga)\n\n"
+    "Empresa com geração de caixa consistente e balanço saudável. "
+    "O preço atual embute expectativas moderadas de crescimento; "
+    "a margem de segurança depende da manutenção das margens. "
+) * 6
+
+
+class Latency:
+    def __init__(self, bounds: Tuple[float, float], seed: Optional[int] = None):
+        self.bounds = bounds
+        self._random = random.Random(seed)
+
+    async def wait(self):
+        delay = self._random.uniform(*self.bounds)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+def alpha_vantage_app(latency: Latency, fixtures: Dict[str, Dict]) -> web.Application:
+    """Imitates GET /query?function=...&symbol=... for the fixture tickers and their synthetic copies"""
+    bases = {ticker: fixture for ticker, fixture in fixtures.items() if fixture.get('alpha_vantage')}
+    pattern = re.compile(r'^([A-Z]+?)(\d{5})?$')
+
+    async def query(request: web.Request) -> web.Response:
+        await latency.wait()
+        function = request.query.get('function', '')
+        symbol = request.query.get('symbol', '').upper()
+        match = pattern.match(symbol)
+        fixture = bases.get(match.group(1)) if match else None
+        if fixture is None:
+            return web.json_response({'Error Message': f"Invalid API call for symbol {symbol}"})
+        # Mesma escala que benchmarks.fixtures.universe usa para as cópias sintéticas
+        index = int(match.group(2) or 0)
+        payloads = alpha_vantage_payloads(fixture, 1.0 + (index % 17) / 100)
+        if function not in payloads:
+            return web.json_response({'Error Message': f"Invalid API call for function {function}"})
+        return web.json_response(payloads[function])
+
+    app = web.Application()
+    app.router.add_get('/query', query)
+    return app
+
+
+def _chunk(model: str, content: Optional[str], finish_reason: Optional[str]) -> str:
+    delta = {'content': content} if content is not None else {}
+    return 'data: ' + json.dumps({
+        'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+        'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+    }) + '\n\n'
+
+
+def openai_app(latency: Latency) -> web.Application:
+    """Imitates POST /v1/chat/completions, streamed or not"""
+
+    async def completions(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        model = body.get('model', 'gpt-4o-mini')
+        await latency.wait()
+
+        user = next((m['content'] for m in body.get('messages', []) if m.get('role') == 'user'), '')
+        if 'ticker' in user.lower() and len(user) < 200:
+            content = "TICKER_PRINCIPAL: AAPL\nMERCADO: US\nNOTA: resposta do stub"
+        else:
+            content = STUB_ANALYSIS
+
+        if not body.get('stream'):
+            return web.json_response({
+                'id': 'chatcmpl-stub', 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': len(user) // 4, 'completion_tokens': len(content) // 4,
+                          'total_tokens': (len(user) + len(content)) // 4},
+            })
+
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+        for word in content.split(' '):
+            await response.write(_chunk(model, word + ' ', None).encode('utf-8'))
+        await response.write(_chunk(model, None, 'stop').encode('utf-8'))
+        await response.write(b'data: [DONE]\n\n')
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post('/v1/chat/completions', completions)
+    return app
+
+
+async def serve(host: str, alpha_vantage_port: int, openai_port: int,
+                alpha_vantage_latency: Latency, openai_latency: Latency):
+    runners = []
+    for app, port in ((alpha_vantage_app(alpha_vantage_latency, load_fixtures()), alpha_vantage_port),
+                      (openai_app(openai_latency), openai_port)):
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        runners.append(runner)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+def main(
+    host: str = typer.Option("127.0.0.1", "--host"),
+    alpha_vantage_port: int = typer.Option(8701, "--alpha-vantage-port"),
+    openai_port: int = typer.Option(8702, "--openai-port"),
+    alpha_vantage_latency_ms: str = typer.Option("80-250", "--alpha-vantage-latency-ms", help="\"50\" ou \"20-200\""),
+    openai_latency_ms: str = typer.Option("400-1500", "--openai-latency-ms", help="\"50\" ou \"20-200\""),
+    seed: Optional[int] = typer.Option(None, "--seed"),
+):
+    """Servidores locais que imitam Alpha Vantage e OpenAI para testes de carga."""
+    try:
+        asyncio.run(serve(
+            host, alpha_vantage_port, openai_port,
+            Latency(parse_latency(alpha_vantage_latency_ms), seed),
+            Latency(parse_latency(openai_latency_ms), seed),
+        ))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -1,7 +1,9 @@
 import asyncio
 import logging
-from yahoo_finance import YahooFinanceAPI
-from typing import Optional, Dict
+import os
+from pathlib import Path
+from datetime import datetime
+from typing import Optional, Dict, List, TYPE_CHECKING
 import typer
 from rich.console import Console
 from rich.table import Table
@@ -9,9 +11,15 @@ from rich.panel import Panel
 from rich.text import Text
 from rich.prompt import Prompt, Confirm, IntPrompt
 from rich.markdown import Markdown
+from rich.live import Live
 from rich import box
-from ai_analysis import AIAnalyst
-from ticker_finder import TickerFinder
+import ratings
+import quick_analysis
+import snapshot
+import tracing
+import transport
+from tracing import span
+from daemon_client import DaemonClient
 
 # Configure logging
 logging.basicConfig(
@@ -21,9 +29,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# yfinance, pandas, numpy e openai só são importados quando uma análise começa,
+# para que o menu e a tela "Sobre" abram instantaneamente
+if TYPE_CHECKING:
+    from ai_analysis import AIAnalyst
+
 app = typer.Typer()
 console = Console()
 
+# Exibe a análise da IA token a token (AI_STREAMING=0 aguarda a resposta completa)
+AI_STREAMING = os.environ.get("AI_STREAMING", "1") != "0"
+
+# Quando pedir a análise da IA após o resumo instantâneo: auto (sempre), ask (perguntar) ou off
+AI_ANALYSIS_MODE = os.environ.get("AI_ANALYSIS_MODE", "auto").lower()
+
+_ai_analyst: Optional["AIAnalyst"] = None
+
+def get_ai_analyst() -> "AIAnalyst":
+    """Return the AIAnalyst shared by every analysis in this process"""
+    global _ai_analyst
+    if _ai_analyst is None:
+        from ai_analysis import AIAnalyst
+        _ai_analyst = AIAnalyst()
+    return _ai_analyst
+
 def format_number(num: float, precision: int = 2) -> str:
     """Format a number with commas and specified precision"""
     try:
@@ -43,124 +72,163 @@ def format_percentage(num: float, precision: int = 1) -> str:
     except Exception:
         return "0.0%"
 
+GROWTH_STYLES = {
+    'Excellent': 'bold green',
+    'Very Good': 'green',
+    'Good': 'blue',
+    'Moderate': 'yellow',
+    'Low': 'red',
+}
+
+QUALITY_STYLES = {
+    'High Quality': 'bold green',
+    'Good Quality': 'green',
+    'Average Quality': 'yellow',
+    'Low Quality': 'red',
+}
+
+RECOMMENDATION_STYLES = {
+    'Strong Buy': ('green', 'Stock appears significantly undervalued'),
+    'Buy': ('green', 'Stock appears moderately undervalued'),
+    'Hold': ('yellow', 'Stock appears fairly valued'),
+    'Sell': ('red', 'Stock appears moderately overvalued'),
+    'Strong Sell': ('red', 'Stock appears significantly overvalued'),
+}
+
 def get_growth_rating(growth_rate: float) -> str:
     """Get a qualitative rating for growth rate"""
-    if growth_rate > 20:
-        return "[bold green]Excellent[/bold green]"
-    elif growth_rate > 15:
-        return "[green]Very Good[/green]"
-    elif growth_rate > 10:
-        return "[blue]Good[/blue]"
-    elif growth_rate > 5:
-        return "[yellow]Moderate[/yellow]"
-    else:
-        return "[red]Low[/red]"
+    label = ratings.growth_rating(growth_rate)
+    style = GROWTH_STYLES[label]
+    return f"[{style}]{label}[/{style}]"
 
 def get_fcf_quality_rating(metrics: dict) -> str:
     """Get a qualitative rating for FCF quality"""
-    score = 0
+    label = ratings.fcf_quality_rating(metrics)
+    style = QUALITY_STYLES[label]
+    return f"[{style}]{label}[/{style}]"
+
+class AIAnalysisPrefetch:
+    """Starts the AI request right away and buffers the answer until it is rendered"""
+
+    def __init__(self, ticker: str, data: Dict, stream: bool = True, analyst=None):
+        self.chunks = []
+        self.task = asyncio.create_task(self._run(ticker, data, stream, analyst))
+
+    async def _run(self, ticker: str, data: Dict, stream: bool, analyst):
+        ai_analyst = analyst or get_ai_analyst()
+        if stream:
+            async for token in ai_analyst.stream_analysis(ticker, data):
+                self.chunks.append(token)
+        else:
+            self.chunks.append(await ai_analyst.get_analysis(ticker, data))
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def _panel(self) -> Panel:
+        content = self.text or "[dim]Aguardando resposta da IA...[/dim]"
+        return Panel(content, title="Investment Recommendation", border_style="blue")
+
+    async def render(self) -> str:
+        """Render the analysis progressively until the request finishes"""
+        with Live(self._panel(), console=console, refresh_per_second=12, vertical_overflow="visible") as live:
+            while not self.task.done():
+                live.update(self._panel())
+                await asyncio.sleep(1 / 12)
+            await self.task
+            live.update(self._panel())
+        return self.text
+
+def render_metrics(ticker: str, data: Dict) -> None:
+    """Print the metrics table, the recommendation and the instant summary"""
+    # Extract data
+    current_price = data['market_data']['current_price']
+    shares = data['market_data']['shares_outstanding']
+    market_cap = current_price * shares
+
+    latest_fcf = data['cash_flow']['free_cashflow']['latest']
+    fcf_history = data['cash_flow']['free_cashflow']['history']
+    growth_rate = data['cash_flow']['free_cashflow']['growth_rate']
     
-    # FCF to Income ratio
-    if metrics['fcf_to_income'] > 90:
-        score += 2
-    elif metrics['fcf_to_income'] > 80:
-        score += 1
-    elif metrics['fcf_to_income'] < 70:
-        score -= 1
-        
-    # Debt to FCF ratio
-    if metrics['debt_to_fcf'] < 3:
-        score += 2
-    elif metrics['debt_to_fcf'] < 5:
-        score += 1
-    else:
-        score -= 1
-        
-    # Working capital changes
-    if abs(metrics['working_capital_change']) < 0.1 * metrics['fcf_to_income']:
-        score += 1
+    quality_metrics = data['cash_flow']['quality']
+    wacc = data['valuation'].get('wacc', 'N/A')
+    multiple = data['valuation']['suggested_multiple']
+    
+    # Calculate valuation
+    value = ratings.valuation(data)
+    fcf_per_share = value['fcf_per_share']
+    fair_value = value['fair_value']
+    upside = value['upside']
+
+    # Create table
+    table = Table(title=f"Stock Analysis for {ticker}", show_header=True)
+    
+    # Market Data
+    table.add_column("Metric", style="default")
+    table.add_column("Value", justify="right")
+    
+    table.add_row("Current Price", f"${current_price:,.2f}")
+    table.add_row("Market Cap", f"${market_cap/1e9:,.2f}B")
+    table.add_row("Shares Outstanding", f"{shares:,.0f}")
+    
+    # Cash Flow Analysis
+    table.add_section()
+    table.add_row("Latest FCF", f"${latest_fcf/1e9:,.2f}B")
+    table.add_row("FCF Growth Rate", f"{growth_rate:.1f}%")
+    table.add_row("FCF per Share", f"${fcf_per_share:.2f}")
+    
+    # Quality Metrics
+    table.add_section()
+    table.add_row("FCF/Net Income", f"{quality_metrics['fcf_to_income']:.1f}%")
+    table.add_row("Debt/FCF", f"{quality_metrics['debt_to_fcf']:.1f}x")
+    table.add_row("Working Capital Change", f"${quality_metrics['working_capital_change']/1e9:,.2f}B")
+    
+    # Valuation
+    table.add_section()
+    table.add_row("WACC", f"{wacc}%")
+    table.add_row("Suggested Multiple", f"{multiple:.1f}x")
+    table.add_row("Fair Value", f"${fair_value:.2f}")
+    table.add_row("Upside Potential", f"{upside:+.1f}%")
+    
+    # Print results
+    console.print(table)
     
-    if score >= 4:
-        return "[bold green]High Quality[/bold green]"
-    elif score >= 2:
-        return "[green]Good Quality[/green]"
-    elif score >= 0:
-        return "[yellow]Average Quality[/yellow]"
-    else:
-        return "[red]Low Quality[/red]"
-
-def display_analysis(ticker: str, data: Dict) -> None:
+    # Print recommendation
+    summary = quick_analysis.build_summary(ticker, data)
+    style, description = RECOMMENDATION_STYLES[summary['recommendation']]
+    console.print(f"\n[{style}]{summary['recommendation']}[/{style}]: {description}")
+    console.print(Panel(summary['narrative'], title="Resumo Instantâneo", border_style="cyan"))
+
+async def display_analysis(ticker: str, data: Dict, stream: bool = True, ai_mode: str = "auto", analyst=None) -> None:
     """Display stock analysis results"""
+    data = snapshot.as_dict(data)
     try:
-        # Extract data
-        current_price = data['market_data']['current_price']
-        shares = data['market_data']['shares_outstanding']
-        market_cap = current_price * shares
-        
-        latest_fcf = data['cash_flow']['free_cashflow']['latest']
-        fcf_history = data['cash_flow']['free_cashflow']['history']
-        growth_rate = data['cash_flow']['free_cashflow']['growth_rate']
-        
-        quality_metrics = data['cash_flow']['quality']
-        wacc = data['valuation'].get('wacc', 'N/A')
-        multiple = data['valuation']['suggested_multiple']
-        
-        # Calculate valuation
-        fcf_per_share = latest_fcf / shares
-        fair_value = fcf_per_share * multiple
-        upside = ((fair_value / current_price) - 1) * 100
+        # No modo auto a requisição da IA sai antes da tabela ser desenhada
+        prefetch = AIAnalysisPrefetch(ticker, data, stream, analyst) if ai_mode == "auto" else None
+        if prefetch:
+            # create_task só agenda: cede o loop uma vez para a requisição sair antes do render síncrono
+            await asyncio.sleep(0)
+
+        try:
+            with span('render', ticker=ticker):
+                render_metrics(ticker, data)
+        except Exception:
+            if prefetch:
+                prefetch.task.cancel()
+            raise
+
+        # Get AI Analysis (segundo nível, opcional)
+        if prefetch is None:
+            if ai_mode == "off":
+                return
+            if not Confirm.ask("\nGerar análise detalhada com IA?", default=True):
+                return
+            prefetch = AIAnalysisPrefetch(ticker, data, stream, analyst)
 
-        # Create table
-        table = Table(title=f"Stock Analysis for {ticker}", show_header=True)
-        
-        # Market Data
-        table.add_column("Metric", style="default")
-        table.add_column("Value", justify="right")
-        
-        table.add_row("Current Price", f"${current_price:,.2f}")
-        table.add_row("Market Cap", f"${market_cap/1e9:,.2f}B")
-        table.add_row("Shares Outstanding", f"{shares:,.0f}")
-        
-        # Cash Flow Analysis
-        table.add_section()
-        table.add_row("Latest FCF", f"${latest_fcf/1e9:,.2f}B")
-        table.add_row("FCF Growth Rate", f"{growth_rate:.1f}%")
-        table.add_row("FCF per Share", f"${fcf_per_share:.2f}")
-        
-        # Quality Metrics
-        table.add_section()
-        table.add_row("FCF/Net Income", f"{quality_metrics['fcf_to_income']:.1f}%")
-        table.add_row("Debt/FCF", f"{quality_metrics['debt_to_fcf']:.1f}x")
-        table.add_row("Working Capital Change", f"${quality_metrics['working_capital_change']/1e9:,.2f}B")
-        
-        # Valuation
-        table.add_section()
-        table.add_row("WACC", f"{wacc}%")
-        table.add_row("Suggested Multiple", f"{multiple:.1f}x")
-        table.add_row("Fair Value", f"${fair_value:.2f}")
-        table.add_row("Upside Potential", f"{upside:+.1f}%")
-        
-        # Print results
-        console.print(table)
-        
-        # Print recommendation
-        if upside > 20:
-            console.print("\n[green]Strong Buy[/green]: Stock appears significantly undervalued")
-        elif upside > 5:
-            console.print("\n[green]Buy[/green]: Stock appears moderately undervalued")
-        elif upside > -5:
-            console.print("\n[yellow]Hold[/yellow]: Stock appears fairly valued")
-        elif upside > -20:
-            console.print("\n[red]Sell[/red]: Stock appears moderately overvalued")
-        else:
-            console.print("\n[red]Strong Sell[/red]: Stock appears significantly overvalued")
-            
-        # Get AI Analysis
-        ai_analyst = AIAnalyst()
-        ai_analysis = asyncio.run(ai_analyst.get_analysis(ticker, data))
         console.print("\n[bold blue]AI Expert Analysis:[/bold blue]")
-        console.print(Panel(ai_analysis, title="Investment Recommendation", border_style="blue"))
-            
+        await prefetch.render()
+
     except Exception as e:
         console.print(f"\n[red]Error displaying analysis: {str(e)}[/red]")
 
@@ -228,64 +296,87 @@ def show_about():
     console.print("\nPressione Enter para voltar ao menu principal...", end="")
     input()
 
-def analyze(input_str: str, is_company_name: bool = False):
-    """Analisa uma ação pelo nome da empresa ou ticker"""
-    try:
-        # Inicializa as APIs
-        yahoo_api = YahooFinanceAPI()
-        ticker_finder = TickerFinder()
-        
-        # Se for nome da empresa, busca o ticker primeiro
-        if is_company_name:
-            with console.status("[bold green]Buscando ticker...") as status:
-                ticker_info = ticker_finder.get_company_ticker(input_str)
-            
-            if not ticker_info:
-                console.print(f"\n[red]Não foi possível encontrar o ticker para: {input_str}[/red]")
-                return
-            
-            # Exibe informações do ticker
-            ticker_finder.display_ticker_info(ticker_info)
-            
-            if not Confirm.ask("\nDeseja continuar com este ticker?"):
-                return
-            
-            ticker = ticker_info['ticker_principal']
-        else:
-            # Verifica se o input é um ticker válido
-            if ticker_finder.is_valid_ticker(input_str):
-                ticker = input_str.upper()
-                if not ticker.endswith('.SA'):  # Se não for BR, verifica se tem .SA no final
-                    # Pergunta se é ação brasileira
-                    if Confirm.ask(f"\nO ticker {ticker} é de uma empresa brasileira?"):
-                        ticker = f"{ticker}.SA"
-                console.print(f"\n[blue]Usando ticker:[/blue] {ticker}")
+class AnalysisSession:
+    """Clients shared by every analysis of an interactive session"""
+
+    def __init__(self, remote: Optional[DaemonClient] = None):
+        # Com um daemon ativo, dados, busca de tickers e IA são delegados a ele
+        self.remote = remote
+        self._yahoo_api = None
+        self._ticker_finder = None
+
+    @property
+    def yahoo_api(self):
+        if self._yahoo_api is None:
+            from yahoo_finance import YahooFinanceAPI
+            self._yahoo_api = YahooFinanceAPI()
+        return self._yahoo_api
+
+    @property
+    def ticker_finder(self):
+        if self._ticker_finder is None:
+            from ticker_finder import TickerFinder
+            self._ticker_finder = TickerFinder()
+        return self._ticker_finder
+
+    async def analyze(self, input_str: str, is_company_name: bool = False):
+        """Analisa uma ação pelo nome da empresa ou ticker"""
+        try:
+            # Formato do ticker e painel não precisam do TickerFinder (nem do cliente da IA)
+            from ticker_finder import display_ticker_info, is_valid_ticker
+
+            # Se for nome da empresa, busca o ticker primeiro
+            if is_company_name:
+                with console.status("[bold green]Buscando ticker...") as status:
+                    ticker_info = await (self.remote or self.ticker_finder).get_company_ticker(input_str)
+
+                if not ticker_info:
+                    console.print(f"\n[red]Não foi possível encontrar o ticker para: {input_str}[/red]")
+                    return
+
+                # Exibe informações do ticker
+                display_ticker_info(ticker_info, console)
+
+                if not Confirm.ask("\nDeseja continuar com este ticker?"):
+                    return
+
+                ticker = ticker_info['ticker_principal']
             else:
-                console.print(f"\n[red]Ticker inválido: {input_str}[/red]")
-                return
-        
-        # Análise dos dados
-        with console.status(f"[bold green]Analisando {ticker}...") as status:
+                # Verifica se o input é um ticker válido
+                if is_valid_ticker(input_str):
+                    ticker = input_str.upper()
+                    if not ticker.endswith('.SA'):  # Se não for BR, verifica se tem .SA no final
+                        # Pergunta se é ação brasileira
+                        if Confirm.ask(f"\nO ticker {ticker} é de uma empresa brasileira?"):
+                            ticker = f"{ticker}.SA"
+                    console.print(f"\n[blue]Usando ticker:[/blue] {ticker}")
+                else:
+                    console.print(f"\n[red]Ticker inválido: {input_str}[/red]")
+                    return
+
+            # Análise dos dados
             try:
                 # Obtém dados financeiros
-                data = asyncio.run(yahoo_api.get_financials(ticker))
-                
-                # Exibe resultados
-                display_analysis(ticker, data)
+                with console.status(f"[bold green]Analisando {ticker}...") as status:
+                    data = await (self.remote or self.yahoo_api).get_financials(ticker)
+
+                # Exibe resultados (fora do status, que não pode coexistir com o painel ao vivo da IA)
+                await display_analysis(ticker, data, stream=AI_STREAMING, ai_mode=AI_ANALYSIS_MODE, analyst=self.remote)
             except Exception as e:
                 if "Could not get basic stock information" in str(e):
                     console.print(f"\n[red]Não foi possível encontrar dados para o ticker {ticker}.[/red]")
                     console.print("[yellow]Verifique se o ticker está correto e tente novamente.[/yellow]")
                 else:
                     raise e
-        
-    except Exception as e:
-        console.print(f"\n[red]Erro ao analisar ação:[/red]")
-        console.print(f"[red]{str(e)}[/red]")
 
-def main_loop():
-    """Loop principal do programa"""
+        except Exception as e:
+            console.print(f"\n[red]Erro ao analisar ação:[/red]")
+            console.print(f"[red]{str(e)}[/red]")
+
+async def run_session():
+    """Loop principal do programa, executado em um único event loop"""
     show_welcome_message()
+    session = AnalysisSession(remote=await DaemonClient.connect())
     
     while True:
         console.clear()
@@ -293,7 +384,7 @@ def main_loop():
         
         if choice == 1:
             company_name = Prompt.ask("\n[cyan]Digite o nome da empresa[/cyan]")
-            analyze(company_name, is_company_name=True)  # Indica que é nome de empresa
+            await session.analyze(company_name, is_company_name=True)  # Indica que é nome de empresa
             console.print("\nPressione Enter para continuar...", end="")
             input()
             
@@ -302,7 +393,7 @@ def main_loop():
                 "\n[cyan]Digite o ticker[/cyan]",
                 help="Para ações brasileiras, adicione .SA (ex: PETR4.SA)"
             )
-            analyze(ticker, is_company_name=False)  # Indica que é ticker
+            await session.analyze(ticker, is_company_name=False)  # Indica que é ticker
             console.print("\nPressione Enter para continuar...", end="")
             input()
             
@@ -314,7 +405,42 @@ def main_loop():
             console.print("\n[green]Obrigado por usar o programa! Até a próxima! 👋[/green]")
             break
 
-if __name__ == "__main__":
+def main_loop():
+    """Loop principal do programa"""
+    async def run():
+        try:
+            await run_session()
+        finally:
+            # As conexões com a OpenAI pertencem a este loop: fecha antes que ele termine
+            from llm_client import close_llm_client
+            await close_llm_client()
+    asyncio.run(run())
+
+@app.callback(invoke_without_command=True)
+def cli(
+    ctx: typer.Context,
+    trace: Optional[str] = typer.Option(None, "--trace", help="Registra a duração de cada etapa: off, log, json ou chrome (padrão: TRACE_MODE)"),
+    trace_file: Optional[str] = typer.Option(None, "--trace-file", help="Arquivo do trace nos modos json/chrome (padrão: TRACE_FILE)"),
+    record: Optional[str] = typer.Option(None, "--record", help="Grava as respostas de Yahoo, Alpha Vantage e OpenAI neste arquivo"),
+    replay: Optional[str] = typer.Option(None, "--replay", help="Responde com as gravações deste arquivo, sem acessar a rede"),
+):
+    """Análise de valor intrínseco de ações. Sem subcomando, abre o menu interativo."""
+    if trace or trace_file:
+        try:
+            tracing.configure(trace, trace_file)
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="--trace")
+    if record and replay:
+        raise typer.BadParameter("Use --record ou --replay, não os dois")
+    if record or replay:
+        try:
+            transport.configure(transport.RECORD if record else transport.REPLAY, record or replay)
+        except (OSError, ValueError) as e:
+            raise typer.BadParameter(str(e), param_hint="--record/--replay")
+        # As chamadas precisam passar por este processo, não pelo daemon
+        os.environ["INTRINSIC_DAEMON"] = "0"
+    if ctx.invoked_subcommand is not None:
+        return
     try:
         main_loop()
     except KeyboardInterrupt:
@@ -322,3 +448,299 @@ if __name__ == "__main__":
     except Exception as e:
         console.print("\n[red]Erro inesperado:[/red]")
         console.print(f"[red]{str(e)}[/red]")
+
+@app.command()
+def batch(
+    tickers_file: Path = typer.Argument(..., exists=True, dir_okay=False, help="Arquivo com os tickers (um por linha)"),
+    output: Path = typer.Option(..., "--output", "-o", help="Arquivo de saída"),
+    output_format: Optional[str] = typer.Option(None, "--format", "-f", help="csv, jsonl ou parquet (padrão: pela extensão)"),
+    concurrency: int = typer.Option(8, "--concurrency", "-c", min=1, help="Análises simultâneas"),
+    ai: bool = typer.Option(False, "--ai/--no-ai", help="Incluir a análise da IA em cada ticker"),
+    processes: int = typer.Option(0, "--processes", "-p", min=0, help="Processos para parsing e métricas (0: threads; ex: número de núcleos)"),
+):
+    """Analisa uma lista de tickers sem interação e grava os resultados incrementalmente."""
+    from rich.progress import Progress, BarColumn, MofNCompleteColumn, TextColumn, TimeElapsedColumn
+    from batch import BatchRunner, open_writer, read_tickers
+
+    tickers = read_tickers(str(tickers_file))
+    if not tickers:
+        console.print(f"[red]Nenhum ticker encontrado em {tickers_file}[/red]")
+        raise typer.Exit(code=1)
+
+    try:
+        writer = open_writer(str(output), output_format)
+    except ValueError as e:
+        console.print(f"[red]{str(e)}[/red]")
+        raise typer.Exit(code=1)
+
+    remote = asyncio.run(DaemonClient.connect())
+    # Com --processes o cálculo fica neste processo (e nos seus workers), não no daemon
+    runner = BatchRunner(
+        concurrency=concurrency, include_ai=ai, yahoo=None if processes else remote, ai_analyst=remote,
+        processes=processes
+    )
+    progress = Progress(
+        TextColumn("[bold green]Analisando"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TextColumn("[red]{task.fields[errors]} erros"),
+        TimeElapsedColumn(),
+        console=console
+    )
+
+    with writer, progress:
+        task = progress.add_task("batch", total=len(tickers), errors=0)
+        errors = 0
+
+        def on_result(row: Dict):
+            nonlocal errors
+            if row['status'] != 'ok':
+                errors += 1
+            progress.update(task, advance=1, errors=errors)
+
+        try:
+            counts = asyncio.run(runner.run(tickers, writer, on_result=on_result))
+        finally:
+            runner.close()
+
+    console.print(f"\n[green]{counts['ok']} analisados[/green], [red]{counts['error']} com erro[/red] -> {output}")
+    if counts['ok'] == 0:
+        raise typer.Exit(code=1)
+
+@app.command()
+def watch(
+    tickers: Optional[List[str]] = typer.Argument(None, help="Tickers a acompanhar"),
+    tickers_file: Optional[Path] = typer.Option(None, "--file", exists=True, dir_okay=False, help="Arquivo com tickers"),
+    price_interval: float = typer.Option(30.0, "--price-interval", min=1, help="Segundos entre atualizações de preço"),
+    fundamentals_interval: float = typer.Option(3600.0, "--fundamentals-interval", min=60, help="Segundos entre atualizações dos fundamentos"),
+    concurrency: int = typer.Option(4, "--concurrency", "-c", min=1, help="Atualizações simultâneas"),
+):
+    """Acompanha uma watchlist em uma tabela atualizada ao vivo."""
+    from batch import read_tickers
+    from watch import Watcher
+
+    symbols = [t.upper() for t in (tickers or [])]
+    if tickers_file:
+        symbols += [t for t in read_tickers(str(tickers_file)) if t not in symbols]
+    if not symbols:
+        console.print("[red]Informe ao menos um ticker.[/red]")
+        raise typer.Exit(code=1)
+
+    async def run_watch():
+        source = await DaemonClient.connect()
+        if source is None:
+            from yahoo_finance import YahooFinanceAPI
+            source = YahooFinanceAPI(max_workers=concurrency)
+
+        watcher = Watcher(symbols, source, price_interval, fundamentals_interval, concurrency)
+        refresher = asyncio.create_task(watcher.run())
+        try:
+            with Live(watcher.build_table(), console=console, refresh_per_second=2) as live:
+                while True:
+                    try:
+                        # Redesenha a cada mudança, ou a cada segundo para atualizar as idades
+                        await asyncio.wait_for(watcher.changed.wait(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        pass
+                    watcher.changed.clear()
+                    live.update(watcher.build_table())
+        finally:
+            refresher.cancel()
+
+    try:
+        asyncio.run(run_watch())
+    except KeyboardInterrupt:
+        console.print("\n[yellow]Monitoramento encerrado.[/yellow]")
+
+@app.command()
+def fundamentals(
+    tickers_file: Path = typer.Argument(..., exists=True, dir_okay=False, help="Arquivo com os tickers (um por linha)"),
+    path: Optional[Path] = typer.Option(None, "--path", help="Diretório do store (padrão: cache/fundamentals ou FUNDAMENTALS_PATH)"),
+    concurrency: int = typer.Option(8, "--concurrency", "-c", min=1, help="Buscas simultâneas"),
+    prices: Optional[str] = typer.Option(None, "--prices", help="Também grava o histórico diário de preços no período (ex: 10y), usado pelo backtest"),
+):
+    """Busca as demonstrações dos tickers e grava no store colunar de fundamentos."""
+    from batch import read_tickers
+    from fundamentals_store import FundamentalsStore
+    from yahoo_finance import YahooFinanceAPI
+
+    tickers = read_tickers(str(tickers_file))
+    if not tickers:
+        console.print(f"[red]Nenhum ticker encontrado em {tickers_file}[/red]")
+        raise typer.Exit(code=1)
+
+    yahoo = YahooFinanceAPI(max_workers=concurrency)
+    errors: Dict[str, str] = {}
+
+    async def fetch_all() -> List[Dict]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(ticker: str) -> Optional[Dict]:
+            async with semaphore:
+                try:
+                    return await yahoo.get_fundamentals(ticker, prices)
+                except Exception as e:
+                    errors[ticker] = str(e)
+                    return None
+
+        results = await asyncio.gather(*(fetch(t) for t in tickers))
+        return [r for r in results if r is not None]
+
+    with console.status(f"[bold green]Buscando fundamentos de {len(tickers)} tickers..."):
+        records = asyncio.run(fetch_all())
+
+    store = FundamentalsStore(str(path) if path else None)
+    try:
+        store.write(records)
+    except ValueError as e:
+        console.print(f"[red]{str(e)}[/red]")
+        raise typer.Exit(code=1)
+
+    for ticker, error in errors.items():
+        console.print(f"[yellow]{ticker}: {error}[/yellow]")
+    console.print(f"\n[green]{len(records)} tickers gravados[/green], [red]{len(errors)} com erro[/red] -> {store.path}")
+    if not records:
+        raise typer.Exit(code=1)
+
+@app.command()
+def screen(
+    query: str = typer.Argument("", help="Ex: \"fcf_to_income > 90 and debt_to_fcf < 3 order by upside desc limit 20\""),
+    path: Optional[Path] = typer.Option(None, "--path", help="Diretório do store de fundamentos"),
+    limit: int = typer.Option(20, "--limit", "-n", min=1, help="Máximo de linhas quando a consulta não tem limit"),
+):
+    """Filtra e ordena todo o universo do store de fundamentos."""
+    import time
+    from fundamentals_store import FundamentalsStore
+    from screener import QueryError, Screener, parse
+
+    screener = Screener(FundamentalsStore(str(path) if path else None))
+    start = time.perf_counter()
+    try:
+        rows = screener.screen(query, limit=limit)
+    except (QueryError, ValueError) as e:
+        console.print(f"[red]{str(e)}[/red]")
+        raise typer.Exit(code=1)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    shown = ['ticker', 'price', 'fair_value', 'upside', 'recommendation']
+    shown += [c for c in parse(query).columns if c not in shown]
+    table = Table(title=f"Screener: {query or 'todos'}", show_header=True)
+    for name in shown:
+        table.add_column(name, justify="left" if name in ('ticker', 'recommendation') else "right")
+    for row in rows:
+        table.add_row(*[
+            f"{row[name]:,.2f}" if isinstance(row[name], float) else str(row[name] if row[name] is not None else "-")
+            for name in shown
+        ])
+    console.print(table)
+    console.print(f"[dim]{len(rows)} resultados em {elapsed:.1f} ms ({len(screener.table()['ticker'])} tickers)[/dim]")
+
+@app.command()
+def backtest(
+    start: datetime = typer.Option(..., "--start", formats=["%Y-%m-%d"], help="Primeira data de rebalanceamento"),
+    end: datetime = typer.Option(..., "--end", formats=["%Y-%m-%d"], help="Última data de rebalanceamento"),
+    every: int = typer.Option(3, "--every", min=1, help="Meses entre rebalanceamentos"),
+    horizon: int = typer.Option(12, "--horizon", min=1, help="Meses do retorno futuro"),
+    lag: int = typer.Option(90, "--lag", min=0, help="Dias entre o fim do período e a publicação das demonstrações"),
+    model: List[str] = typer.Option(["multiple", "dcf"], "--model", "-m", help="multiple e/ou dcf"),
+    path: Optional[Path] = typer.Option(None, "--path", help="Diretório do store de fundamentos"),
+    refresh: bool = typer.Option(False, "--refresh", help="Ignora resultados em cache"),
+):
+    """Backtest point-in-time dos modelos de avaliação sobre o store de fundamentos."""
+    from backtest import Backtest
+    from fundamentals_store import FundamentalsStore
+
+    runner = Backtest(FundamentalsStore(str(path) if path else None))
+    try:
+        with console.status("[bold green]Executando backtest..."):
+            results = runner.run(start.date(), end.date(), every, horizon, lag, model, refresh=refresh)
+    except ValueError as e:
+        console.print(f"[red]{str(e)}[/red]")
+        raise typer.Exit(code=1)
+
+    def pct(value) -> str:
+        return f"{value:.1%}" if value is not None else "-"
+
+    def number(value) -> str:
+        return f"{value:.3f}" if value is not None else "-"
+
+    summary = Table(title=f"Backtest {start.date()} a {end.date()} (a cada {every} meses, horizonte de {horizon})")
+    for name in ("Modelo", "Datas", "Observações", "IC médio", "t do IC", "Spread Q5-Q1", "Acerto Buy", "Sinais Buy"):
+        summary.add_column(name, justify="left" if name == "Modelo" else "right")
+    for name, result in results.items():
+        s = result['summary']
+        summary.add_row(name, str(s['dates']), str(s['observations']), number(s['mean_ic']), number(s['ic_t_stat']),
+                        pct(s['mean_spread']), pct(s['hit_rate']), str(s['buys']))
+    console.print(summary)
+
+    for name, result in results.items():
+        table = Table(title=f"{name} por data")
+        for column in ("Data", "N", "IC", "Q5", "Q1", "Spread", "Acerto Buy", "Universo"):
+            table.add_column(column, justify="left" if column == "Data" else "right")
+        for row in result['dates']:
+            table.add_row(row['date'], str(row['n']), number(row['ic']), pct(row['top_quintile']),
+                          pct(row['bottom_quintile']), pct(row['spread']), pct(row['hit_rate']),
+                          pct(row['universe_return']))
+        console.print(table)
+
+@app.command()
+def daemon(
+    socket: Optional[str] = typer.Option(None, "--socket", help="Caminho do socket Unix (padrão: INTRINSIC_SOCKET)"),
+    stop: bool = typer.Option(False, "--stop", help="Encerra o daemon em execução"),
+):
+    """Inicia o daemon de análise residente (em primeiro plano) ou o encerra com --stop."""
+    if stop:
+        remote = asyncio.run(DaemonClient.connect(socket))
+        if remote is None:
+            console.print("[yellow]Nenhum daemon em execução.[/yellow]")
+            raise typer.Exit(code=1)
+        asyncio.run(remote.shutdown())
+        console.print("[green]Daemon encerrado.[/green]")
+        return
+
+    from daemon import AnalysisDaemon
+
+    server = AnalysisDaemon(socket)
+    console.print(f"[green]Iniciando o daemon de análise em {server.socket_path}[/green] (Ctrl+C para encerrar)")
+    try:
+        asyncio.run(server.serve())
+    except ValueError as e:
+        console.print(f"[red]{str(e)}[/red]")
+        raise typer.Exit(code=1)
+    except KeyboardInterrupt:
+        console.print("\n[yellow]Daemon encerrado pelo usuário.[/yellow]")
+
+@app.command("startup-report")
+def startup_report(
+    budget_ms: float = typer.Option(None, "--budget-ms", help="Tempo máximo de importação (padrão: STARTUP_BUDGET_MS ou 300)"),
+    top: int = typer.Option(10, "--top", help="Quantidade de módulos listados"),
+):
+    """Mede o tempo de importação do CLI e verifica o orçamento de inicialização."""
+    from startup import DEFAULT_BUDGET_MS, measure_startup
+
+    if budget_ms is None:
+        budget_ms = float(os.environ.get("STARTUP_BUDGET_MS", DEFAULT_BUDGET_MS))
+
+    report = measure_startup("main")
+
+    table = Table(title="Tempo de importação (cumulativo)", box=box.SIMPLE)
+    table.add_column("Módulo")
+    table.add_column("ms", justify="right")
+    for module, cumulative_ms in report['top'][:top]:
+        table.add_row(module, f"{cumulative_ms:.1f}")
+    console.print(table)
+
+    if report['heavy_loaded']:
+        console.print(f"[yellow]Dependências pesadas carregadas na inicialização:[/yellow] {', '.join(report['heavy_loaded'])}")
+
+    within = report['import_ms'] <= budget_ms
+    style = "green" if within else "red"
+    console.print(
+        f"[{style}]import main: {report['import_ms']:.1f} ms (orçamento {budget_ms:.0f} ms)[/{style}]"
+        f" — processo completo: {report['process_ms']:.1f} ms"
+    )
+    if not within:
+        raise typer.Exit(code=1)
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,221 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+
+from transport import get_transport
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'data', 'market_params.json')
+DEFAULT_REFRESH_SECONDS = 6 * 3600
+WACC_TENOR = 10.0  # Prazo (anos) da curva usado como taxa livre de risco
+
+# Usado só se a fonte falhar antes da primeira leitura (as premissas históricas para os EUA)
+FALLBACK = {
+    'as_of': None,
+    'default_country': 'US',
+    'countries': {
+        'US': {'currency': 'USD', 'suffixes': [], 'curve': {'10': 0.0425},
+               'equity_risk_premium': 0.06, 'tax_rate': 0.21},
+    },
+    'fx': {'USD': 1.0},
+}
+
+
+@dataclass(frozen=True)
+class CountryParams:
+    country: str
+    currency: str
+    curve: Tuple[Tuple[float, float], ...]  # (prazo em anos, taxa), em ordem de prazo
+    equity_risk_premium: float
+    tax_rate: float
+
+    def rate(self, tenor: float) -> float:
+        """Curve rate at `tenor` years (linear between points, flat outside)"""
+        points = self.curve
+        if tenor <= points[0][0]:
+            return points[0][1]
+        for (t0, r0), (t1, r1) in zip(points, points[1:]):
+            if tenor <= t1:
+                return r0 + (r1 - r0) * (tenor - t0) / (t1 - t0)
+        return points[-1][1]
+
+    @property
+    def risk_free_rate(self) -> float:
+        return self.rate(WACC_TENOR)
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """One immutable set of WACC inputs, shared by every valuation that uses it"""
+    as_of: Optional[str]
+    countries: Dict[str, CountryParams]
+    suffixes: Dict[str, str]  # sufixo do ticker -> país
+    default_country: str
+    fx: Dict[str, float]  # USD por unidade da moeda
+    fetched_at: float
+
+    @classmethod
+    def from_dict(cls, data: Dict, fetched_at: Optional[float] = None) -> 'MarketSnapshot':
+        countries = {}
+        suffixes = {}
+        for code, params in data['countries'].items():
+            curve = tuple(sorted((float(tenor), float(rate)) for tenor, rate in params['curve'].items()))
+            if not curve:
+                raise ValueError(f"Curva de juros vazia para {code}")
+            countries[code] = CountryParams(
+                country=code, currency=params['currency'], curve=curve,
+                equity_risk_premium=float(params['equity_risk_premium']), tax_rate=float(params['tax_rate']),
+            )
+            for suffix in params.get('suffixes', []):
+                suffixes[suffix.upper()] = code
+        default_country = data.get('default_country', 'US')
+        if default_country not in countries:
+            raise ValueError(f"País padrão sem parâmetros: {default_country}")
+        return cls(
+            as_of=data.get('as_of'), countries=countries, suffixes=suffixes, default_country=default_country,
+            fx={currency: float(rate) for currency, rate in data.get('fx', {}).items()},
+            fetched_at=time.time() if fetched_at is None else fetched_at,
+        )
+
+    def country_of(self, ticker: str) -> str:
+        _, dot, suffix = ticker.upper().rpartition('.')
+        return self.suffixes.get(f".{suffix}", self.default_country) if dot else self.default_country
+
+    def for_ticker(self, ticker: str) -> CountryParams:
+        return self.countries[self.country_of(ticker)]
+
+    def fx_rate(self, source: str, target: str) -> Optional[float]:
+        """Units of `target` per unit of `source`, None if either is unknown"""
+        if source == target:
+            return 1.0
+        if source not in self.fx or target not in self.fx or not self.fx[target]:
+            return None
+        return self.fx[source] / self.fx[target]
+
+    def statement_fx(self, reporting: Optional[str], quote: Optional[str]) -> float:
+        """Factor from the statements' currency to the quote currency (1.0 when equal, missing or unknown)"""
+        if not reporting or not quote or reporting == quote:
+            return 1.0
+        rate = self.fx_rate(reporting, quote)
+        return 1.0 if rate is None else rate
+
+
+class FileSource:
+    """Local JSON file with the market parameters (stand-in for a market data feed)"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or DEFAULT_PATH
+
+    def fetch(self) -> Dict:
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def __repr__(self):
+        return f"FileSource({self.path!r})"
+
+
+class HttpSource:
+    """The same JSON layout served over HTTP (goes through the record/replay transport)"""
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+
+    def fetch(self) -> Dict:
+        def get():
+            with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        return get_transport().call_sync('market_params', {'url': self.url}, get)
+
+    def __repr__(self):
+        return f"HttpSource({self.url!r})"
+
+
+_pinned: contextvars.ContextVar = contextvars.ContextVar('market_snapshot', default=None)
+
+
+class MarketParams:
+    """
+    Process-wide market parameters: the source is read at most once per
+    refresh interval and every caller gets the same snapshot. A failed
+    refresh keeps serving the last snapshot.
+    """
+
+    def __init__(self, source=None, refresh_seconds: Optional[float] = None):
+        self.source = source or FileSource()
+        self.refresh_seconds = DEFAULT_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        self.fetches = 0
+        self._snapshot: Optional[MarketSnapshot] = None
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> MarketSnapshot:
+        """The pinned snapshot if inside pin(), otherwise the cached one (refreshed when stale)"""
+        pinned = _pinned.get()
+        if pinned is not None:
+            return pinned
+        snapshot = self._snapshot
+        if snapshot is not None and time.time() - snapshot.fetched_at < self.refresh_seconds:
+            return snapshot
+        with self._lock:
+            # Outra thread pode ter atualizado enquanto esta esperava
+            snapshot = self._snapshot
+            if snapshot is None or time.time() - snapshot.fetched_at >= self.refresh_seconds:
+                self._snapshot = self._refresh(snapshot)
+            return self._snapshot
+
+    def _refresh(self, previous: Optional[MarketSnapshot]) -> MarketSnapshot:
+        self.fetches += 1
+        try:
+            snapshot = MarketSnapshot.from_dict(self.source.fetch())
+            logger.debug(f"Parâmetros de mercado lidos de {self.source!r} (referência {snapshot.as_of})")
+            return snapshot
+        except Exception as e:
+            if previous is not None:
+                logger.warning(f"Falha ao atualizar parâmetros de mercado, mantendo os de {previous.as_of}: {str(e)}")
+                # Tenta de novo só no próximo intervalo
+                return replace(previous, fetched_at=time.time())
+            logger.warning(f"Falha ao ler parâmetros de mercado, usando premissas padrão dos EUA: {str(e)}")
+            return MarketSnapshot.from_dict(FALLBACK)
+
+    @contextmanager
+    def pin(self):
+        """Use one snapshot for everything run inside the block (e.g. a whole batch)"""
+        token = _pinned.set(self.snapshot())
+        try:
+            yield _pinned.get()
+        finally:
+            _pinned.reset(token)
+
+
+_market_params: Optional[MarketParams] = None
+
+
+def configure(source=None, refresh_seconds: Optional[float] = None) -> MarketParams:
+    """
+    Set the process-wide parameters. Defaults come from MARKET_PARAMS_URL
+    (HTTP source) or MARKET_PARAMS_PATH (local file, default
+    data/market_params.json) and MARKET_PARAMS_REFRESH (seconds).
+    """
+    global _market_params
+    if source is None:
+        url = os.environ.get('MARKET_PARAMS_URL')
+        source = HttpSource(url) if url else FileSource(os.environ.get('MARKET_PARAMS_PATH') or None)
+    if refresh_seconds is None and os.environ.get('MARKET_PARAMS_REFRESH'):
+        refresh_seconds = float(os.environ['MARKET_PARAMS_REFRESH'])
+    _market_params = MarketParams(source, refresh_seconds)
+    return _market_params
+
+
+def get_market_params() -> MarketParams:
+    if _market_params is None:
+        configure()
+    return _market_params
+
@@ -0,0 +1,291 @@
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Só usa a biblioteca padrão: importar este módulo não pode pesar no CLI
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Segundos; cobre desde uma leitura de cache até uma análise completa da IA
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+OK = 'ok'
+ERROR = 'error'
+THROTTLED = 'throttled'
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + '}'
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} espera os rótulos {list(self.labelnames)}, recebeu {list(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def items(self) -> List[Tuple[Dict[str, str], float]]:
+        with self._lock:
+            return [(self._labels(key), value) for key, value in self._values.items()]
+
+    def samples(self) -> List[Sample]:
+        return [(self.name + '_total', labels, value) for labels, value in self.items()]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, self._labels(key), value) for key, value in self._values.items()]
+
+
+class DerivedGauge(_Metric):
+    """Gauge computed at scrape time from other metrics"""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str],
+                 compute: Callable[[], List[Tuple[Dict[str, str], float]]]):
+        super().__init__(name, documentation, labelnames)
+        self._compute = compute
+
+    def samples(self) -> List[Sample]:
+        return [(self.name, labels, value) for labels, value in self._compute()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por série: contagem por bucket (não cumulativa), soma e total
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def samples(self) -> List[Sample]:
+        samples = []
+        with self._lock:
+            series_items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._series.items()]
+        for key, (counts, total, count) in series_items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                samples.append((self.name + '_bucket', dict(labels, le=_format_value(bound)), cumulative))
+            samples.append((self.name + '_sum', labels, total))
+            samples.append((self.name + '_count', labels, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica já registrada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    'intrinsic_http_request_duration_seconds',
+    'Latency of HTTP requests by route template, method and status',
+    ('endpoint', 'method', 'status')
+)
+HTTP_REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    'intrinsic_http_requests_in_flight',
+    'HTTP requests currently being served'
+)
+STAGE_DURATION = REGISTRY.histogram(
+    'intrinsic_stage_duration_seconds',
+    'Latency of pipeline stages (tracing spans) by stage name',
+    ('stage',)
+)
+UPSTREAM_REQUESTS = REGISTRY.counter(
+    'intrinsic_upstream_requests',
+    'Requests to external services by upstream and outcome (ok, error, throttled, circuit_open)',
+    ('upstream', 'outcome')
+)
+UPSTREAM_CONCURRENCY_LIMIT = REGISTRY.gauge(
+    'intrinsic_upstream_concurrency_limit',
+    'Current adaptive (AIMD) concurrency limit by upstream',
+    ('upstream',)
+)
+UPSTREAM_CIRCUIT_STATE = REGISTRY.gauge(
+    'intrinsic_upstream_circuit_state',
+    'Circuit breaker state by upstream (0 closed, 1 half open, 2 open)',
+    ('upstream',)
+)
+UPSTREAM_RETRIES = REGISTRY.counter(
+    'intrinsic_upstream_retries',
+    'Extra requests to external services by upstream and kind (retry, hedge)',
+    ('upstream', 'kind')
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    'intrinsic_cache_requests',
+    'Cache lookups by tier and result (hit, miss)',
+    ('tier', 'result')
+)
+RATE_LIMIT_REJECTIONS = REGISTRY.counter(
+    'intrinsic_rate_limit_rejections',
+    'Requests rejected by the API RateLimiter'
+)
+MONGO_PENDING_WRITES = REGISTRY.gauge(
+    'intrinsic_mongo_pending_writes',
+    'Valuation writes queued for or sent to MongoDB and not yet acknowledged'
+)
+
+
+def _cache_hit_ratios() -> List[Tuple[Dict[str, str], float]]:
+    totals: Dict[str, List[float]] = {}
+    for labels, value in CACHE_REQUESTS.items():
+        hits_and_total = totals.setdefault(labels['tier'], [0.0, 0.0])
+        if labels['result'] == 'hit':
+            hits_and_total[0] += value
+        hits_and_total[1] += value
+    return [({'tier': tier}, hits / total) for tier, (hits, total) in totals.items() if total]
+
+
+CACHE_HIT_RATIO = REGISTRY.register(DerivedGauge(
+    'intrinsic_cache_hit_ratio',
+    'Fraction of cache lookups served from the cache, by tier',
+    ('tier',),
+    _cache_hit_ratios
+))
+
+
+def classify_error(exc: BaseException) -> str:
+    """Tell throttling (HTTP 429 / rate limit answers) apart from other failures"""
+    if 'RateLimit' in type(exc).__name__:
+        return THROTTLED
+    status = getattr(exc, 'status_code', None) or getattr(exc, 'status', None)
+    if status == 429:
+        return THROTTLED
+    message = str(exc).lower()
+    if '429' in message or 'rate limit' in message or 'too many requests' in message:
+        return THROTTLED
+    return ERROR
+
+
+def record_upstream(upstream: str, error: Optional[BaseException] = None):
+    """Count one request to yahoo, alpha_vantage or openai"""
+    outcome = OK if error is None else classify_error(error)
+    UPSTREAM_REQUESTS.inc(upstream=upstream, outcome=outcome)
+
+
+def record_cache(tier: str, hit: bool):
+    CACHE_REQUESTS.inc(tier=tier, result='hit' if hit else 'miss')
+
+
+def observe_span(record: Dict):
+    """tracing listener: feeds every finished span into the stage histogram"""
+    STAGE_DURATION.observe(record['duration_us'] / 1e6, stage=record['name'])
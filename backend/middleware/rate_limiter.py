@@ -1,7 +1,10 @@
 from fastapi import Request, HTTPException
+from fastapi.responses import JSONResponse
+import os
 import time
 from typing import Dict, Tuple
 import logging
+import metrics
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
@@ -34,6 +37,7 @@ class RateLimiter:
         # Check rate limit
         if len(self.requests[client_id]) >= self.requests_per_minute:
             logger.warning(f"Rate limit exceeded for client {client_id}")
+            metrics.RATE_LIMIT_REJECTIONS.inc()
             reset_time = self.requests[client_id][0] + 60
             reset_seconds = int(reset_time - current_time)
             
@@ -50,8 +54,14 @@ class RateLimiter:
         self.requests[client_id].append(current_time)
         return True
 
+# Um único limitador por processo; criar um por requisição zerava a contagem
+rate_limiter = RateLimiter(int(os.environ.get('API_RATE_LIMIT', 60)))
+
 async def rate_limit_middleware(request: Request, call_next):
-    rate_limiter = RateLimiter()
-    await rate_limiter.check_rate_limit(request)
+    try:
+        await rate_limiter.check_rate_limit(request)
+    except HTTPException as e:
+        # Middlewares rodam fora dos exception handlers do FastAPI
+        return JSONResponse(status_code=e.status_code, content=e.detail)
     response = await call_next(request)
     return response
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkedProcessPool:
+    """
+    Runs a CPU-bound function in worker processes from the event loop.
+    Items submitted one at a time are grouped into chunks (up to
+    chunk_size, or whatever arrived within max_delay seconds) so each
+    round trip to a worker pickles one list instead of one call per item.
+
+    `fn` must be importable by the workers (a module-level function) and
+    take a list of items, returning one (result, error message) pair per
+    item; errors come back as ValueError to the caller of submit().
+    """
+
+    def __init__(self, fn: Callable[[List], List[Tuple[object, Optional[str]]]],
+                 processes: Optional[int] = None, chunk_size: int = 16, max_delay: float = 0.01):
+        self.fn = fn
+        self.chunk_size = chunk_size
+        self.max_delay = max_delay
+        # spawn: os processos não herdam as threads (e locks) dos executores do processo principal
+        self._executor = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+        self._pending: List[Tuple[object, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.chunks = 0  # Blocos enviados aos processos
+
+    async def submit(self, item):
+        """Queue one item for the next chunk and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.chunk_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        chunk, self._pending = self._pending, []
+        if not chunk:
+            return
+        self.chunks += 1
+        items = [item for item, _ in chunk]
+        futures = [future for _, future in chunk]
+        try:
+            done = asyncio.wrap_future(self._executor.submit(self.fn, items))
+        except Exception as e:
+            self._deliver(futures, e)
+            return
+        done.add_done_callback(lambda task: self._deliver(futures, task))
+
+    @staticmethod
+    def _deliver(futures: List[asyncio.Future], task):
+        if isinstance(task, Exception):
+            error, results = task, None
+        elif task.cancelled():
+            for future in futures:
+                future.cancel()
+            return
+        else:
+            error = task.exception()
+            results = task.result() if error is None else None
+        if error is not None:
+            logger.error(f"Falha em um bloco de {len(futures)} itens nos processos: {str(error)}")
+        for i, future in enumerate(futures):
+            if future.done():  # Quem esperava foi cancelado
+                continue
+            if error is not None:
+                future.set_exception(error)
+                continue
+            result, message = results[i]
+            if message is not None:
+                future.set_exception(ValueError(message))
+            else:
+                future.set_result(result)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
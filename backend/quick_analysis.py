@@ -0,0 +1,73 @@
+from typing import Dict, Union
+
+import ratings
+import snapshot
+from snapshot import FinancialSnapshot
+
+RECOMMENDATION_TEXT = {
+    'Strong Buy': 'a ação parece significativamente subavaliada',
+    'Buy': 'a ação parece moderadamente subavaliada',
+    'Hold': 'a ação parece estar com preço justo',
+    'Sell': 'a ação parece moderadamente sobreavaliada',
+    'Strong Sell': 'a ação parece significativamente sobreavaliada',
+}
+
+GROWTH_TEXT = {
+    'Excellent': 'excelente',
+    'Very Good': 'muito bom',
+    'Good': 'bom',
+    'Moderate': 'moderado',
+    'Low': 'baixo',
+}
+
+QUALITY_TEXT = {
+    'High Quality': 'alta',
+    'Good Quality': 'boa',
+    'Average Quality': 'média',
+    'Low Quality': 'baixa',
+}
+
+
+def build_summary(ticker: str, data: Union[FinancialSnapshot, Dict]) -> Dict:
+    """
+    Deterministic first-tier analysis built from the computed metrics.
+    Runs in microseconds and needs no LLM call.
+    """
+    data = snapshot.as_dict(data)
+    value = ratings.valuation(data)
+    quality = data['cash_flow']['quality']
+    growth_rate = data['cash_flow']['free_cashflow']['growth_rate']
+    multiple = data['valuation']['suggested_multiple']
+    wacc = data['valuation'].get('wacc')
+
+    growth = ratings.growth_rating(growth_rate)
+    quality_score = ratings.fcf_quality_score(quality)
+    quality_label = ratings.fcf_quality_rating(quality)
+    recommendation = ratings.recommendation(value['upside'])
+
+    lines = [
+        f"{ticker}: {recommendation} — {RECOMMENDATION_TEXT[recommendation]}.",
+        f"Valor justo estimado de ${value['fair_value']:.2f} contra preço atual de "
+        f"${data['market_data']['current_price']:,.2f} ({value['upside']:+.1f}%), "
+        f"usando múltiplo de {multiple:.1f}x o FCF por ação de ${value['fcf_per_share']:.2f}.",
+        f"Crescimento do FCF {GROWTH_TEXT[growth]} ({growth_rate:.1f}% a.a.) e "
+        f"qualidade do FCF {QUALITY_TEXT[quality_label]} (pontuação {quality_score}).",
+    ]
+    if quality['fcf_to_income'] < 70:
+        lines.append(f"Atenção: FCF representa apenas {quality['fcf_to_income']:.1f}% do lucro líquido.")
+    if quality['debt_to_fcf'] >= 5:
+        lines.append(f"Atenção: dívida equivale a {quality['debt_to_fcf']:.1f}x o FCF.")
+    if isinstance(wacc, (int, float)):
+        lines.append(f"WACC de {wacc:.1f}%.")
+
+    return {
+        'ticker': ticker,
+        'current_price': data['market_data']['current_price'],
+        'fair_value': value['fair_value'],
+        'upside': value['upside'],
+        'recommendation': recommendation,
+        'growth_rating': growth,
+        'quality_rating': quality_label,
+        'quality_score': quality_score,
+        'narrative': "\n".join(lines)
+    }
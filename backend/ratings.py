@@ -0,0 +1,175 @@
+from typing import Dict, List, Tuple, Union
+
+from snapshot import FinancialSnapshot
+
+# (limite, rótulo): o primeiro limite superado define o rótulo
+GROWTH_BANDS: List[Tuple[float, str]] = [
+    (20, 'Excellent'),
+    (15, 'Very Good'),
+    (10, 'Good'),
+    (5, 'Moderate'),
+]
+GROWTH_FLOOR = 'Low'
+
+QUALITY_BANDS: List[Tuple[int, str]] = [
+    (4, 'High Quality'),
+    (2, 'Good Quality'),
+    (0, 'Average Quality'),
+]
+QUALITY_FLOOR = 'Low Quality'
+
+RECOMMENDATION_BANDS: List[Tuple[float, str]] = [
+    (20, 'Strong Buy'),
+    (5, 'Buy'),
+    (-5, 'Hold'),
+    (-20, 'Sell'),
+]
+RECOMMENDATION_FLOOR = 'Strong Sell'
+
+# WACC quando faltam demonstrações; as taxas por país vêm de market_params
+DEFAULT_WACC = 8.0
+
+
+def cagr(values: List[float], years: int) -> float:
+    """Compound annual growth rate (%) from the newest (first) to the oldest (last) value"""
+    if len(values) < 2 or years < 1:
+        return 0.0
+    try:
+        start_value = values[-1]  # Oldest value
+        end_value = values[0]     # Newest value
+        if start_value <= 0:
+            return 0.0
+        return (pow(end_value / start_value, 1/years) - 1) * 100
+    except Exception:
+        return 0.0
+
+
+def growth_rating(growth_rate: float) -> str:
+    """Qualitative rating for the FCF growth rate"""
+    for threshold, label in GROWTH_BANDS:
+        if growth_rate > threshold:
+            return label
+    return GROWTH_FLOOR
+
+
+def fcf_quality_score(metrics: Dict) -> int:
+    """Score FCF quality from the quality metrics"""
+    score = 0
+
+    # FCF to Income ratio
+    if metrics['fcf_to_income'] > 90:
+        score += 2
+    elif metrics['fcf_to_income'] > 80:
+        score += 1
+    elif metrics['fcf_to_income'] < 70:
+        score -= 1
+
+    # Debt to FCF ratio
+    if metrics['debt_to_fcf'] < 3:
+        score += 2
+    elif metrics['debt_to_fcf'] < 5:
+        score += 1
+    else:
+        score -= 1
+
+    # Working capital changes
+    if abs(metrics['working_capital_change']) < 0.1 * metrics['fcf_to_income']:
+        score += 1
+
+    return score
+
+
+def fcf_quality_rating(metrics: Dict) -> str:
+    """Qualitative rating for FCF quality"""
+    score = fcf_quality_score(metrics)
+    for threshold, label in QUALITY_BANDS:
+        if score >= threshold:
+            return label
+    return QUALITY_FLOOR
+
+
+def quality_metrics(net_income: float, fcf: float, total_debt: float, working_capital_change: float) -> Dict:
+    """FCF quality metrics from the latest statements"""
+    return {
+        'fcf_to_income': (fcf / net_income * 100) if net_income != 0 else 0,
+        'debt_to_fcf': total_debt / fcf if fcf != 0 else float('inf'),
+        'working_capital_change': working_capital_change
+    }
+
+
+def wacc(beta: float, total_debt: float, interest_expense: float, market_cap: float,
+         risk_free_rate: float, market_premium: float, tax_rate: float) -> float:
+    """WACC in % (CAPM cost of equity, market-value capital structure)"""
+    cost_of_equity = risk_free_rate + (beta * market_premium)
+    cost_of_debt = (interest_expense / total_debt) if total_debt > 0 else 0
+    after_tax_cost_of_debt = cost_of_debt * (1 - tax_rate)
+
+    total_capital = market_cap + total_debt
+    equity_weight = market_cap / total_capital if total_capital > 0 else 1
+    debt_weight = 1 - equity_weight
+    return ((cost_of_equity * equity_weight) + (after_tax_cost_of_debt * debt_weight)) * 100
+
+
+def dynamic_multiple(growth_rate: float, quality_metrics: Dict, wacc: float) -> float:
+    """FCF multiple from growth, FCF quality and WACC"""
+    # Base multiple based on growth rate
+    if growth_rate > 15:
+        base_multiple = 15
+    elif growth_rate > 10:
+        base_multiple = 12
+    elif growth_rate > 5:
+        base_multiple = 10
+    else:
+        base_multiple = 8
+
+    # Adjust for FCF quality
+    quality_score = 1.0
+    if quality_metrics['fcf_to_income'] > 90:
+        quality_score += 0.2
+    elif quality_metrics['fcf_to_income'] < 70:
+        quality_score -= 0.2
+
+    if quality_metrics['debt_to_fcf'] < 3:
+        quality_score += 0.2
+    elif quality_metrics['debt_to_fcf'] > 5:
+        quality_score -= 0.2
+
+    # Adjust for WACC
+    wacc_adjustment = 1.0
+    if wacc < 8:
+        wacc_adjustment = 1.1
+    elif wacc > 12:
+        wacc_adjustment = 0.9
+
+    return base_multiple * quality_score * wacc_adjustment
+
+
+def recommendation(upside: float) -> str:
+    """Recommendation band for the upside potential (in %)"""
+    for threshold, label in RECOMMENDATION_BANDS:
+        if upside > threshold:
+            return label
+    return RECOMMENDATION_FLOOR
+
+
+def valuation(data: Union[FinancialSnapshot, Dict]) -> Dict:
+    """Fair value and upside from the FCF multiple"""
+    if isinstance(data, FinancialSnapshot):
+        current_price = data.current_price
+        shares = data.shares_outstanding
+        latest_fcf = data.latest_fcf
+        multiple = data.suggested_multiple
+    else:
+        current_price = data['market_data']['current_price']
+        shares = data['market_data']['shares_outstanding']
+        latest_fcf = data['cash_flow']['free_cashflow']['latest']
+        multiple = data['valuation']['suggested_multiple']
+
+    fcf_per_share = latest_fcf / shares
+    fair_value = fcf_per_share * multiple
+    return {
+        'market_cap': current_price * shares,
+        'fcf_per_share': fcf_per_share,
+        'fair_value': fair_value,
+        'upside': ((fair_value / current_price) - 1) * 100
+    }
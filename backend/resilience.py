@@ -0,0 +1,323 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}  # Valor do gauge de estado do circuito
+
+# Concorrência (inicial, máxima) por upstream; a máxima pode ser trocada por <UPSTREAM>_MAX_CONCURRENCY
+DEFAULT_LIMITS = {'yahoo': (8, 32), 'alpha_vantage': (2, 4)}
+FALLBACK_LIMITS = (4, 16)
+DECREASE_FACTOR = 0.5
+# Uma resposta conta como lenta acima de LATENCY_TOLERANCE x a latência típica (e nunca abaixo de SLOW_FLOOR s)
+LATENCY_TOLERANCE = 3.0
+SLOW_FLOOR = 0.05
+
+
+class CircuitOpenError(Exception):
+    """The upstream's circuit breaker is open: the request was not sent"""
+
+
+def is_overload(error: Optional[BaseException]) -> bool:
+    """Throttling or a timeout: the upstream is asking for less concurrency"""
+    if error is None:
+        return False
+    if metrics.classify_error(error) == metrics.THROTTLED:
+        return True
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    message = str(error).lower()
+    return 'timeout' in message or 'timed out' in message
+
+
+def is_failure(error: Optional[BaseException]) -> bool:
+    """
+    Errors that say the upstream is unhealthy (overload, connection
+    errors, HTTP 5xx). An unknown ticker is a healthy answer and does not
+    count towards opening the circuit.
+    """
+    if error is None:
+        return False
+    if is_overload(error) or isinstance(error, OSError):  # Inclui ConnectionError
+        return True
+    status = getattr(error, 'status_code', None) or getattr(error, 'status', None)
+    if isinstance(status, int):
+        return status >= 500
+    message = str(error).lower()
+    return any(f"status {code}" in message for code in (500, 502, 503, 504))
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit. Each fast success adds 1/limit (about +1 per
+    window of `limit` requests); throttling, timeouts or a response much
+    slower than usual halve it, at most once per typical response time
+    (capped by cooldown) so one burst of failures counts once. Usable
+    from threads (acquire_sync) and from the event loop (acquire).
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32, cooldown: float = 1.0):
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.latency: Optional[float] = None  # Média móvel das respostas normais
+        self._decreased_at = float('-inf')
+        self._lock = threading.Lock()
+        self._waiters: deque = deque()
+
+    def _try_acquire(self) -> bool:
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def acquire_sync(self):
+        while True:
+            with self._lock:
+                if self._try_acquire():
+                    return
+                event = threading.Event()
+                self._waiters.append(event.set)
+            event.wait()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._try_acquire():
+                    return
+                future = loop.create_future()
+                self._waiters.append(lambda: _wake(loop, future))
+            await future
+
+    def release(self, latency: Optional[float] = None, error: Optional[BaseException] = None):
+        """Free the slot and adapt the limit (latency None: the request was abandoned, no signal)"""
+        with self._lock:
+            self.in_flight -= 1
+            if latency is not None:
+                self._adapt(latency, error)
+            # Todos tentam de novo: quem foi cancelado enquanto esperava não segura a vaga
+            waiters, self._waiters = self._waiters, deque()
+        for wake in waiters:
+            wake()
+
+    def _adapt(self, latency: float, error: Optional[BaseException]):
+        slow = self.latency is not None and latency > max(self.latency * LATENCY_TOLERANCE, SLOW_FLOOR)
+        if is_overload(error) or (error is None and slow):
+            now = time.monotonic()
+            window = self.cooldown if self.latency is None else min(self.cooldown, self.latency)
+            if now - self._decreased_at >= window:
+                self.limit = max(float(self.minimum), self.limit * DECREASE_FACTOR)
+                self._decreased_at = now
+        elif error is None:
+            self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+        if error is None:
+            self.latency = latency if self.latency is None else 0.9 * self.latency + 0.1 * latency
+
+
+def _wake(loop: asyncio.AbstractEventLoop, future: asyncio.Future):
+    def set_result():
+        if not future.done():
+            future.set_result(None)
+    try:
+        loop.call_soon_threadsafe(set_result)
+    except RuntimeError:  # Loop já encerrado
+        pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures. While
+    open, requests fail fast; after reset_timeout one probe is let through
+    (half open): success closes the circuit, failure opens it again with
+    the timeout doubled (up to max_reset_timeout).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, max_reset_timeout: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._timeout = reset_timeout
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def retry_in(self) -> float:
+        """Seconds until the next probe (0 when requests are allowed)"""
+        if self.state == CLOSED:
+            return 0.0
+        return max(0.0, self._opened_at + self._timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self._timeout:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, error: Optional[BaseException]) -> Optional[str]:
+        """Account one finished request; returns the new state if it changed"""
+        with self._lock:
+            previous = self.state
+            if not is_failure(error):
+                self.failures = 0
+                self._probing = False
+                if self.state == HALF_OPEN:
+                    self.state = CLOSED
+                    self._timeout = self.reset_timeout
+            else:
+                self.failures += 1
+                if self.state == HALF_OPEN:
+                    self._open(min(self._timeout * 2, self.max_reset_timeout))
+                elif self.state == CLOSED and self.failures >= self.failure_threshold:
+                    self._open(self.reset_timeout)
+            return self.state if self.state != previous else None
+
+    def abandon(self):
+        """The request was cancelled before an answer: let another probe through"""
+        with self._lock:
+            self._probing = False
+
+    def _open(self, timeout: float):
+        self.state = OPEN
+        self._timeout = timeout
+        self._opened_at = time.monotonic()
+        self._probing = False
+
+
+class Upstream:
+    """Adaptive concurrency limit plus circuit breaker in front of one external service"""
+
+    def __init__(self, name: str, limiter: Optional[AdaptiveLimiter] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.limiter = limiter or AdaptiveLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self._publish()
+
+    def available(self) -> bool:
+        """False while the circuit is open (before the next probe is due)"""
+        return self.breaker.state == CLOSED or self.breaker.retry_in() == 0.0
+
+    def _admit(self):
+        if not self.breaker.allow():
+            metrics.UPSTREAM_REQUESTS.inc(upstream=self.name, outcome='circuit_open')
+            raise CircuitOpenError(
+                f"{self.name} indisponível após falhas seguidas; nova tentativa em {self.breaker.retry_in():.0f}s"
+            )
+
+    def _finish(self, start: float, error: Optional[BaseException]):
+        self.limiter.release(time.perf_counter() - start, error)
+        changed = self.breaker.record(error)
+        if changed == OPEN:
+            logger.warning(
+                f"Circuito de {self.name} aberto após {self.breaker.failures} falhas seguidas "
+                f"({str(error)}); servindo dados em cache por {self.breaker.retry_in():.0f}s"
+            )
+        elif changed == CLOSED:
+            logger.info(f"Circuito de {self.name} fechado: upstream respondendo de novo")
+        self._publish()
+
+    def _abandon(self):
+        self.limiter.release()
+        self.breaker.abandon()
+
+    def _publish(self):
+        metrics.UPSTREAM_CONCURRENCY_LIMIT.set(int(self.limiter.limit), upstream=self.name)
+        metrics.UPSTREAM_CIRCUIT_STATE.set(STATE_VALUES[self.breaker.state], upstream=self.name)
+
+    def call_sync(self, fetch: Callable[[], object]):
+        """Run a blocking request (executor threads) under the limit and the breaker"""
+        self._admit()
+        self.limiter.acquire_sync()
+        start = time.perf_counter()
+        try:
+            result = fetch()
+        except Exception as e:
+            self._finish(start, e)
+            raise
+        except BaseException:
+            self._abandon()
+            raise
+        self._finish(start, None)
+        return result
+
+    async def call(self, fetch: Callable[[], Awaitable[object]]):
+        """Same as call_sync() for async requests"""
+        self._admit()
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            self.breaker.abandon()
+            raise
+        start = time.perf_counter()
+        try:
+            result = await fetch()
+        except Exception as e:
+            self._finish(start, e)
+            raise
+        except BaseException:
+            self._abandon()
+            raise
+        self._finish(start, None)
+        return result
+
+
+_upstreams: Dict[str, Upstream] = {}
+_lock = threading.Lock()
+
+
+def _build(name: str, limiter: Optional[AdaptiveLimiter] = None,
+           breaker: Optional[CircuitBreaker] = None) -> Upstream:
+    if limiter is None:
+        initial, maximum = DEFAULT_LIMITS.get(name, FALLBACK_LIMITS)
+        maximum = int(os.environ.get(f"{name.upper()}_MAX_CONCURRENCY") or maximum)
+        limiter = AdaptiveLimiter(initial=min(initial, maximum), maximum=maximum)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            failure_threshold=int(os.environ.get('BREAKER_FAILURES') or 5),
+            reset_timeout=float(os.environ.get('BREAKER_RESET_SECONDS') or 30.0),
+        )
+    return Upstream(name, limiter, breaker)
+
+
+def configure(name: str, limiter: Optional[AdaptiveLimiter] = None,
+              breaker: Optional[CircuitBreaker] = None) -> Upstream:
+    """
+    Set the guard of one upstream. Defaults come from
+    <UPSTREAM>_MAX_CONCURRENCY (e.g. YAHOO_MAX_CONCURRENCY),
+    BREAKER_FAILURES and BREAKER_RESET_SECONDS.
+    """
+    upstream = _build(name, limiter, breaker)
+    with _lock:
+        _upstreams[name] = upstream
+    return upstream
+
+
+def get_upstream(name: str) -> Upstream:
+    upstream = _upstreams.get(name)
+    if upstream is None:
+        with _lock:
+            upstream = _upstreams.get(name)
+            if upstream is None:
+                upstream = _upstreams[name] = _build(name)
+    return upstream
@@ -0,0 +1,301 @@
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import metrics
+from resilience import CircuitOpenError, is_failure
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE = 'retryable'
+FATAL = 'fatal'
+
+# Tentativas por upstream (inclui a primeira); trocáveis por <UPSTREAM>_RETRY_ATTEMPTS
+DEFAULT_ATTEMPTS = {'yahoo': 3, 'alpha_vantage': 3}
+# Alpha Vantage limita por minuto/dia: repetir um 429 em segundos só gasta cota
+NO_THROTTLE_RETRY = ('alpha_vantage',)
+
+# Prazo absoluto (time.monotonic) da requisição em andamento; segue para as threads com copy_context
+_deadline: contextvars.ContextVar = contextvars.ContextVar('deadline', default=None)
+# Sinal de que ninguém espera mais o trabalho desta thread (ver run_in_thread)
+_abandoned: contextvars.ContextVar = contextvars.ContextVar('abandoned', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed (or is too close to start another attempt)"""
+
+
+class Abandoned(DeadlineExceeded):
+    """Whoever awaited this thread's work was cancelled (e.g. the losing copy of a hedge)"""
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """Everything run inside must finish within `seconds`; nested deadlines keep the earliest"""
+    if seconds is None:
+        yield
+        return
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(current, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline (None: no deadline)"""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def abandoned() -> bool:
+    event = _abandoned.get()
+    return event is not None and event.is_set()
+
+
+async def run_in_thread(executor, fn: Callable, *args):
+    """
+    Run fn(*args) on executor with a copy of the current context (deadline,
+    spans). A thread cannot be interrupted, so cancelling the caller only
+    flags the work as abandoned: the next policy attempt in it raises
+    Abandoned instead of querying the upstream again.
+    """
+    event = threading.Event()
+    context = contextvars.copy_context()
+    context.run(_abandoned.set, event)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, context.run, fn, *args)
+    except asyncio.CancelledError:
+        event.set()
+        raise
+
+
+def classify(error: BaseException) -> str:
+    """
+    Transient upstream trouble (throttling, timeouts, connection errors,
+    5xx) is worth retrying; everything else (unknown ticker, bad key,
+    invalid answer, open circuit, deadline) fails right away.
+    """
+    if isinstance(error, (CircuitOpenError, DeadlineExceeded)):
+        return FATAL
+    if is_failure(error) or 'Connection' in type(error).__name__:
+        return RETRYABLE
+    return FATAL
+
+
+class RetryPolicy:
+    """
+    Retries with full-jitter exponential backoff, bounded by the current
+    deadline: a retry only starts if the wait plus a typical attempt
+    (moving average of this policy's attempts) still fits in the time
+    left, and every async attempt is cut at the deadline.
+    """
+
+    def __init__(self, name: str, attempts: int = 3, base_delay: float = 0.25, max_delay: float = 4.0,
+                 retry_throttled: bool = True, rng: Optional[random.Random] = None):
+        self.name = name
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_throttled = retry_throttled
+        self.latency: Optional[float] = None
+        self._random = rng or random.Random()
+
+    def backoff(self, attempt: int) -> float:
+        """Wait before retry number attempt + 1: uniform in [0, min(max_delay, base * 2^attempt)]"""
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _observe(self, seconds: float):
+        self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+
+    def _next_delay(self, attempt: int, error: Exception) -> Optional[float]:
+        """Backoff before the next attempt, or None if the error or the deadline rule out a retry"""
+        if attempt + 1 >= self.attempts or classify(error) != RETRYABLE:
+            return None
+        if not self.retry_throttled and metrics.classify_error(error) == metrics.THROTTLED:
+            return None
+        delay = self.backoff(attempt)
+        left = remaining()
+        if left is not None and delay + (self.latency or 0.0) >= left:
+            logger.debug(f"{self.name}: sem tempo para outra tentativa ({left:.2f}s restantes)")
+            return None
+        metrics.UPSTREAM_RETRIES.inc(upstream=self.name, kind='retry')
+        logger.warning(
+            f"{self.name}: tentativa {attempt + 1} falhou ({str(error)}); nova tentativa em {delay:.2f}s"
+        )
+        return delay
+
+    def _check_deadline(self):
+        if abandoned():
+            raise Abandoned(f"Consulta a {self.name} abandonada por quem a esperava")
+        if expired():
+            raise DeadlineExceeded(f"Prazo esgotado antes de consultar {self.name}")
+
+    async def call(self, fetch: Callable[[], Awaitable], attempt_timeout: Optional[float] = None):
+        """Run an async request with retries; each attempt is limited to attempt_timeout and the deadline"""
+        for attempt in range(self.attempts):
+            self._check_deadline()
+            left = remaining()
+            timeout = attempt_timeout if left is None else min(attempt_timeout or left, left)
+            start = time.perf_counter()
+            try:
+                if timeout is None:
+                    result = await fetch()
+                else:
+                    result = await asyncio.wait_for(fetch(), timeout)
+            except Exception as e:
+                self._observe(time.perf_counter() - start)
+                if isinstance(e, asyncio.TimeoutError) and expired():
+                    raise DeadlineExceeded(f"Prazo esgotado consultando {self.name}") from e
+                delay = self._next_delay(attempt, e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._observe(time.perf_counter() - start)
+            return result
+
+    def call_sync(self, fetch: Callable[[], object]):
+        """Same as call() for blocking requests (executor threads); attempts cannot be cut short"""
+        for attempt in range(self.attempts):
+            self._check_deadline()
+            start = time.perf_counter()
+            try:
+                result = fetch()
+            except Exception as e:
+                self._observe(time.perf_counter() - start)
+                delay = self._next_delay(attempt, e)
+                if delay is None:
+                    raise
+                event = _abandoned.get()
+                if event is None:
+                    time.sleep(delay)
+                elif event.wait(delay):
+                    raise Abandoned(f"Consulta a {self.name} abandonada por quem a esperava") from e
+                continue
+            self._observe(time.perf_counter() - start)
+            return result
+
+
+async def hedged(fetch: Callable[[], Awaitable], after: Optional[float], name: str = 'hedge'):
+    """
+    Start fetch(); if it has not finished after `after` seconds (and the
+    deadline leaves room), start a duplicate and return whichever
+    succeeds first, cancelling the other. A failure of one copy waits for
+    the other before giving up. Copies still running on the way out (also
+    when the caller is cancelled) are cancelled and awaited; a copy running
+    in a thread (run_in_thread) stops at its next upstream attempt.
+    """
+    first = asyncio.ensure_future(fetch())
+    pending = {first}
+    try:
+        if not after:
+            return await first
+        done, _ = await asyncio.wait(pending, timeout=after)
+        left = remaining()
+        if done or (left is not None and left <= after):
+            return await first
+
+        metrics.UPSTREAM_RETRIES.inc(upstream=name, kind='hedge')
+        pending.add(asyncio.ensure_future(fetch()))
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        pending = {task for task in pending if not task.done()}
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def race(fetches: Dict[str, Callable[[], Awaitable]], validate: Optional[Callable[[object], bool]] = None,
+               grace: float = 0.0) -> Tuple[str, object, Dict[str, object]]:
+    """
+    Run the fetches concurrently and return (name, result, others) for the
+    first one that succeeds and passes validate. The ones still running get
+    up to `grace` seconds (never past the deadline) so their valid results
+    can be compared (others, by name); then they are cancelled and awaited.
+    If none succeeds, the error of the first fetch (in order) is raised.
+    """
+    tasks = {asyncio.ensure_future(fetch()): name for name, fetch in fetches.items()}
+    errors: Dict[str, BaseException] = {}
+    winner: Optional[Tuple[str, object]] = None
+    others: Dict[str, object] = {}
+    pending = set(tasks)
+
+    def collect(done):
+        nonlocal winner
+        for task in done:
+            name = tasks[task]
+            if task.exception() is not None:
+                errors[name] = task.exception()
+            elif validate is not None and not validate(task.result()):
+                errors[name] = ValueError(f"{name}: resultado incompleto ou inválido")
+            elif winner is None:
+                winner = (name, task.result())
+            else:
+                others[name] = task.result()
+
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            collect(done)
+        left = remaining()
+        wait = grace if left is None else min(grace, left)
+        if pending and winner is not None and wait > 0:
+            done, pending = await asyncio.wait(pending, timeout=wait)
+            collect(done)
+    finally:
+        for task in pending:
+            task.cancel()
+        # Espera o cancelamento terminar para não deixar requisições penduradas
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    if winner is None:
+        raise next(errors[name] for name in fetches if name in errors)
+    return winner[0], winner[1], others
+
+
+_policies: Dict[str, RetryPolicy] = {}
+_lock = threading.Lock()
+
+
+def _build(name: str) -> RetryPolicy:
+    attempts = int(os.environ.get(f"{name.upper()}_RETRY_ATTEMPTS") or DEFAULT_ATTEMPTS.get(name, 3))
+    return RetryPolicy(name, attempts=attempts, retry_throttled=name not in NO_THROTTLE_RETRY)
+
+
+def configure(name: str, policy: Optional[RetryPolicy] = None) -> RetryPolicy:
+    """Set the retry policy of one upstream (default from <UPSTREAM>_RETRY_ATTEMPTS)"""
+    policy = policy or _build(name)
+    with _lock:
+        _policies[name] = policy
+    return policy
+
+
+def get_policy(name: str) -> RetryPolicy:
+    policy = _policies.get(name)
+    if policy is None:
+        with _lock:
+            policy = _policies.get(name)
+            if policy is None:
+                policy = _policies[name] = _build(name)
+    return policy
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 
 class TerminalMethod(str, Enum):
@@ -27,6 +27,27 @@ class ValuationRequest(BaseModel):
             raise ValueError(f'Source must be one of {valid_sources}')
         return v.lower()
 
+class BatchValuationRequest(BaseModel):
+    tickers: List[str] = Field(..., min_items=1, max_items=50)
+    growth_rate: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+    discount_rate: float = Field(default=0.1, ge=0.0, le=1.0)
+    terminal_method: TerminalMethod = Field(default=TerminalMethod.GORDON)
+    margin_of_safety: float = Field(default=0.3, ge=0.0, le=1.0)
+    preferred_source: str = Field(default='yahoo')
+
+    @validator('tickers', each_item=True)
+    def validate_tickers(cls, v):
+        if not v.replace('.', '').isalnum() or len(v) > 12:
+            raise ValueError('Ticker must contain only letters, numbers and dots')
+        return v.upper()
+
+    @validator('preferred_source')
+    def validate_source(cls, v):
+        valid_sources = ['yahoo', 'alpha_vantage', 'both']
+        if v.lower() not in valid_sources:
+            raise ValueError(f'Source must be one of {valid_sources}')
+        return v.lower()
+
 class HistoricalDataRequest(BaseModel):
     ticker: str = Field(..., min_length=1, max_length=10)
     period: str = Field(default="5y")
@@ -0,0 +1,410 @@
+import logging
+import math
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+import ratings
+from fundamentals_store import MARKET_TEXT_FIELDS, STATEMENTS, FundamentalsStore
+from market_params import MarketSnapshot, get_market_params
+
+logger = logging.getLogger(__name__)
+
+# Incrementar ao mudar qualquer regra de score(): invalida os backtests em cache
+MODEL_VERSION = 3
+
+DEFAULT_WACC = ratings.DEFAULT_WACC
+
+NUMERIC_COLUMNS = [
+    'price', 'shares_outstanding', 'market_cap', 'beta', 'net_income', 'total_debt', 'free_cash_flow',
+    'fcf_growth_rate', 'fcf_to_income', 'debt_to_fcf', 'working_capital_change', 'wacc',
+    'suggested_multiple', 'fcf_per_share', 'fair_value', 'upside', 'quality_score',
+]
+TEXT_COLUMNS = ['ticker', 'recommendation', 'growth_rating', 'quality_rating']
+COLUMNS = TEXT_COLUMNS[:1] + NUMERIC_COLUMNS + TEXT_COLUMNS[1:]
+ALIASES = {'fcf': 'free_cash_flow', 'growth_rate': 'fcf_growth_rate', 'multiple': 'suggested_multiple'}
+
+
+class QueryError(ValueError):
+    """Invalid screen query"""
+
+
+def _bands(values: np.ndarray, bands: List[Tuple[float, str]], floor: str, inclusive: bool = False) -> np.ndarray:
+    """Vectorized version of the first-threshold-exceeded loops in ratings"""
+    conditions = [(values >= t) if inclusive else (values > t) for t, _ in bands]
+    return np.select(conditions, [label for _, label in bands], default=floor).astype(object)
+
+
+def country_rates(tickers: np.ndarray, market: MarketSnapshot) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Risk-free rate, equity risk premium and tax rate of each ticker's country"""
+    countries = np.array([market.country_of(ticker) for ticker in tickers], dtype=object)
+    rates = np.zeros((3, len(tickers)))
+    for country in set(countries):
+        params = market.countries[country]
+        rates[:, countries == country] = np.array(
+            [params.risk_free_rate, params.equity_risk_premium, params.tax_rate]
+        )[:, None]
+    return rates[0], rates[1], rates[2]
+
+
+def statement_fx(inputs: Dict[str, np.ndarray], market: MarketSnapshot) -> np.ndarray:
+    """Factor from each ticker's statement currency to its quote currency (1.0 without both currencies)"""
+    count = len(inputs['ticker'])
+    reporting = inputs.get('financial_currency')
+    quote = inputs.get('currency')
+    if reporting is None or quote is None:
+        return np.ones(count)
+    pairs = list(zip(reporting, quote))
+    rates = {pair: market.statement_fx(*pair) for pair in set(pairs)}
+    return np.array([rates[pair] for pair in pairs], dtype=float)
+
+
+def score(inputs: Dict[str, np.ndarray], market: Optional[MarketSnapshot] = None) -> Dict[str, np.ndarray]:
+    """
+    Apply the per-ticker rules (calculate_quality_metrics, calculate_wacc,
+    get_dynamic_multiple, ratings) to whole columns at once. `inputs` are the
+    columns of FundamentalsStore.valuation_inputs(); WACC rates and exchange
+    rates come from `market` (default: the process-wide market parameters).
+    FCF and debt are converted to the quote currency, as in the per-ticker
+    path; the quality ratios do not depend on the currency.
+    """
+    market = market or get_market_params().snapshot()
+    risk_free_rate, market_premium, tax_rate = country_rates(inputs['ticker'], market)
+    fx = statement_fx(inputs, market)
+    price = inputs['price']
+    shares = inputs['shares_outstanding']
+    fcf = inputs['free_cash_flow'] * fx
+    net_income = inputs['net_income']
+    debt = np.nan_to_num(inputs['total_debt'])
+    market_cap = np.nan_to_num(inputs['market_cap'])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Qualidade: FCF = fluxo operacional + capex do último período; sem lucro ou fluxo, os valores de erro
+        quality_fcf = inputs['operating_cash_flow'] + np.nan_to_num(inputs['capital_expenditure'])
+        has_quality = np.isfinite(net_income) & np.isfinite(quality_fcf)
+        fcf_to_income = np.where(has_quality & (net_income != 0), quality_fcf / net_income * 100, 0.0)
+        debt_to_fcf = np.where(has_quality & (quality_fcf != 0), debt / quality_fcf, np.inf)
+        working_capital_change = np.where(has_quality, np.nan_to_num(inputs['working_capital_change']), 0.0)
+
+        # WACC pelo CAPM com a estrutura de capital a valor de mercado
+        cost_of_equity = risk_free_rate + np.where(np.isfinite(inputs['beta']), inputs['beta'], 1.0) * market_premium
+        cost_of_debt = np.where(debt > 0, np.nan_to_num(inputs['interest_expense']) / debt, 0.0)
+        total_capital = market_cap + debt * fx
+        equity_weight = np.where(total_capital > 0, market_cap / total_capital, 1.0)
+        wacc = (cost_of_equity * equity_weight + cost_of_debt * (1 - tax_rate) * (1 - equity_weight)) * 100
+        has_statements = np.isfinite(inputs['total_debt']) & np.isfinite(inputs['interest_expense'])
+        wacc = np.where(has_statements & np.isfinite(wacc), wacc, DEFAULT_WACC)
+
+        growth = inputs['fcf_growth_rate']
+        base_multiple = np.select([growth > 15, growth > 10, growth > 5], [15.0, 12.0, 10.0], default=8.0)
+        quality_adjustment = (
+            1.0
+            + np.select([fcf_to_income > 90, fcf_to_income < 70], [0.2, -0.2], default=0.0)
+            + np.select([debt_to_fcf < 3, debt_to_fcf > 5], [0.2, -0.2], default=0.0)
+        )
+        wacc_adjustment = np.select([wacc < 8, wacc > 12], [1.1, 0.9], default=1.0)
+        multiple = base_multiple * quality_adjustment * wacc_adjustment
+
+        fcf_per_share = fcf / shares
+        fair_value = fcf_per_share * multiple
+        upside = (fair_value / price - 1) * 100
+
+    quality_score = (
+        np.select([fcf_to_income > 90, fcf_to_income > 80, fcf_to_income < 70], [2, 1, -1], default=0)
+        + np.select([debt_to_fcf < 3, debt_to_fcf < 5], [2, 1], default=-1)
+        + (np.abs(working_capital_change) < 0.1 * fcf_to_income)
+    )
+
+    return {
+        'ticker': inputs['ticker'],
+        'price': price,
+        'shares_outstanding': shares,
+        'market_cap': inputs['market_cap'],
+        'beta': inputs['beta'],
+        'net_income': net_income,
+        'total_debt': inputs['total_debt'],
+        'free_cash_flow': fcf,
+        'fcf_growth_rate': growth,
+        'fcf_to_income': fcf_to_income,
+        'debt_to_fcf': debt_to_fcf,
+        'working_capital_change': working_capital_change,
+        'wacc': wacc,
+        'suggested_multiple': multiple,
+        'fcf_per_share': fcf_per_share,
+        'fair_value': fair_value,
+        'upside': upside,
+        'quality_score': quality_score.astype(float),
+        'recommendation': _bands(upside, ratings.RECOMMENDATION_BANDS, ratings.RECOMMENDATION_FLOOR),
+        'growth_rating': _bands(growth, ratings.GROWTH_BANDS, ratings.GROWTH_FLOOR),
+        'quality_rating': _bands(quality_score, ratings.QUALITY_BANDS, ratings.QUALITY_FLOOR, inclusive=True),
+    }
+
+
+# Consultas: <condição> [order by <coluna> [asc|desc], ...] [limit <n>]
+_TOKEN = re.compile(
+    r"\s*(?:(?P<number>-?\d+(?:\.\d+)?(?:e[+-]?\d+)?)"
+    r"|(?P<string>'[^']*'|\"[^\"]*\")"
+    r"|(?P<op>>=|<=|!=|==|=|>|<|\(|\)|,)"
+    r"|(?P<word>[A-Za-z_][A-Za-z0-9_]*))",
+    re.IGNORECASE
+)
+_KEYWORDS = {'and', 'or', 'not', 'in', 'order', 'by', 'asc', 'desc', 'limit'}
+_COMPARISONS = {'>', '>=', '<', '<=', '=', '==', '!='}
+
+
+class Query(NamedTuple):
+    where: Optional[tuple]
+    order_by: List[Tuple[str, bool]]  # (coluna, decrescente)
+    limit: Optional[int]
+    columns: List[str]  # Colunas citadas, na ordem em que aparecem
+
+
+def _tokenize(text: str) -> List[Tuple[str, object]]:
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match or match.end() == position:
+            raise QueryError(f"Trecho inválido na posição {position}: {text[position:position + 20]!r}")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'number':
+            tokens.append(('literal', float(value)))
+        elif kind == 'string':
+            tokens.append(('literal', value[1:-1]))
+        elif kind == 'word' and value.lower() in _KEYWORDS:
+            tokens.append(('keyword', value.lower()))
+        else:
+            tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.position = 0
+        self.columns: List[str] = []
+
+    def peek(self, kind: str, value=None) -> bool:
+        if self.position >= len(self.tokens):
+            return False
+        token_kind, token_value = self.tokens[self.position]
+        return token_kind == kind and (value is None or token_value == value)
+
+    def take(self, kind: str, value=None):
+        if not self.peek(kind, value):
+            found = self.tokens[self.position][1] if self.position < len(self.tokens) else 'fim da consulta'
+            raise QueryError(f"Esperado {value or kind}, encontrado {found!r}")
+        self.position += 1
+        return self.tokens[self.position - 1][1]
+
+    def column(self) -> str:
+        name = self.take('word').lower()
+        name = ALIASES.get(name, name)
+        if name not in COLUMNS:
+            raise QueryError(f"Coluna desconhecida: {name}. Colunas: {', '.join(COLUMNS)}")
+        if name not in self.columns:
+            self.columns.append(name)
+        return name
+
+    def parse(self) -> Query:
+        where = None
+        if not (self.peek('keyword', 'order') or self.peek('keyword', 'limit') or self.position >= len(self.tokens)):
+            where = self.disjunction()
+
+        order_by = []
+        if self.peek('keyword', 'order'):
+            self.take('keyword', 'order')
+            self.take('keyword', 'by')
+            while True:
+                name = self.column()
+                descending = False
+                if self.peek('keyword', 'desc') or self.peek('keyword', 'asc'):
+                    descending = self.take('keyword') == 'desc'
+                order_by.append((name, descending))
+                if not self.peek('op', ','):
+                    break
+                self.take('op', ',')
+
+        limit = None
+        if self.peek('keyword', 'limit'):
+            self.take('keyword', 'limit')
+            value = self.take('literal')
+            if not isinstance(value, float) or value < 0 or value != int(value):
+                raise QueryError("limit deve ser um inteiro não negativo")
+            limit = int(value)
+
+        if self.position < len(self.tokens):
+            raise QueryError(f"Trecho inesperado: {self.tokens[self.position][1]!r}")
+        return Query(where, order_by, limit, self.columns)
+
+    def disjunction(self):
+        node = self.conjunction()
+        while self.peek('keyword', 'or'):
+            self.take('keyword', 'or')
+            node = ('or', node, self.conjunction())
+        return node
+
+    def conjunction(self):
+        node = self.negation()
+        while self.peek('keyword', 'and'):
+            self.take('keyword', 'and')
+            node = ('and', node, self.negation())
+        return node
+
+    def negation(self):
+        if self.peek('keyword', 'not'):
+            self.take('keyword', 'not')
+            return ('not', self.negation())
+        if self.peek('op', '('):
+            self.take('op', '(')
+            node = self.disjunction()
+            self.take('op', ')')
+            return node
+        return self.comparison()
+
+    def operand(self):
+        if self.peek('literal'):
+            return ('literal', self.take('literal'))
+        return ('column', self.column())
+
+    def comparison(self):
+        left = self.operand()
+        if self.peek('keyword', 'in') or self.peek('keyword', 'not'):
+            negated = self.peek('keyword', 'not')
+            if negated:
+                self.take('keyword', 'not')
+            self.take('keyword', 'in')
+            self.take('op', '(')
+            values = [self.take('literal')]
+            while self.peek('op', ','):
+                self.take('op', ',')
+                values.append(self.take('literal'))
+            self.take('op', ')')
+            node = ('in', left, values)
+            return ('not', node) if negated else node
+        if self.position >= len(self.tokens) or self.tokens[self.position][1] not in _COMPARISONS:
+            raise QueryError("Esperado um operador de comparação (>, >=, <, <=, =, !=)")
+        op = self.take('op')
+        return ('compare', '=' if op == '==' else op, left, self.operand())
+
+
+def parse(text: str) -> Query:
+    """Parse a screen query; only columns, literals and comparisons, nothing is evaluated as code"""
+    return _Parser(text).parse()
+
+
+def _value(operand, table: Dict[str, np.ndarray]):
+    kind, value = operand
+    return table[value] if kind == 'column' else value
+
+
+def _is_text(operand) -> bool:
+    kind, value = operand
+    return value in TEXT_COLUMNS if kind == 'column' else isinstance(value, str)
+
+
+def _evaluate(node, table: Dict[str, np.ndarray]) -> np.ndarray:
+    kind = node[0]
+    if kind == 'and':
+        return _evaluate(node[1], table) & _evaluate(node[2], table)
+    if kind == 'or':
+        return _evaluate(node[1], table) | _evaluate(node[2], table)
+    if kind == 'not':
+        return ~_evaluate(node[1], table)
+    if kind == 'in':
+        values = _value(node[1], table)
+        return np.isin(values, [v for v in node[2]])
+
+    _, op, left, right = node
+    if _is_text(left) != _is_text(right):
+        raise QueryError("Comparação entre texto e número")
+    if _is_text(left) and op not in ('=', '!='):
+        raise QueryError("Colunas de texto aceitam apenas = e !=")
+    a, b = _value(left, table), _value(right, table)
+    with np.errstate(invalid='ignore'):
+        if op == '>':
+            result = a > b
+        elif op == '>=':
+            result = a >= b
+        elif op == '<':
+            result = a < b
+        elif op == '<=':
+            result = a <= b
+        elif op == '=':
+            result = a == b
+        else:
+            result = a != b
+    return np.broadcast_to(np.asarray(result, dtype=bool), len(table['ticker']))
+
+
+def _sort_key(values: np.ndarray, descending: bool) -> List[np.ndarray]:
+    """lexsort keys for one column, missing values always last"""
+    if values.dtype == object:
+        _, ranks = np.unique(values.astype(str), return_inverse=True)
+        return [-ranks if descending else ranks]
+    missing = np.isnan(values)
+    key = np.where(missing, 0.0, -values if descending else values)
+    return [key, missing]
+
+
+def _row(table: Dict[str, np.ndarray], i: int) -> Dict:
+    row = {}
+    for name in COLUMNS:
+        value = table[name][i]
+        if isinstance(value, (float, np.floating)):
+            value = float(value) if math.isfinite(value) else None
+        elif isinstance(value, np.integer):
+            value = int(value)
+        row[name] = value
+    return row
+
+
+class Screener:
+    """Scores every ticker of the fundamentals store once and answers screen queries over the columns"""
+
+    def __init__(self, store: Optional[FundamentalsStore] = None):
+        self.store = store or FundamentalsStore()
+        self._table: Optional[Dict[str, np.ndarray]] = None
+        self._version: Optional[tuple] = None
+
+    def _store_version(self) -> float:
+        files = [os.path.join(self.store.path, f"{s}.arrow") for s in STATEMENTS]
+        return max((os.path.getmtime(f) for f in files if os.path.exists(f)), default=0.0)
+
+    def table(self) -> Dict[str, np.ndarray]:
+        """Scored columns of every valuable ticker; recomputed when the store or the market parameters change"""
+        market = get_market_params().snapshot()
+        version = (self._store_version(), market.countries, market.fx)
+        if self._table is None or version != self._version:
+            self.store.close()
+            inputs = self.store.valuation_inputs()
+            columns = {name: inputs.column(name).to_numpy() for name in inputs.column_names}
+            text = ['ticker'] + MARKET_TEXT_FIELDS
+            columns = {name: (values if name in text else values.astype(float)) for name, values in columns.items()}
+            # Sem preço, ações ou FCF não há avaliação (o caminho por ticker também falha nesses casos)
+            valid = (columns['price'] > 0) & (columns['shares_outstanding'] > 0) & np.isfinite(columns['free_cash_flow'])
+            self._table = score({name: values[valid] for name, values in columns.items()}, market)
+            self._version = version
+            logger.debug(f"Screener: {int(valid.sum())} tickers avaliados de {len(valid)}")
+        return self._table
+
+    def screen(self, query: str, limit: Optional[int] = None) -> List[Dict]:
+        parsed = parse(query)
+        table = self.table()
+        rows = np.arange(len(table['ticker']))
+        if parsed.where is not None:
+            rows = rows[_evaluate(parsed.where, table)]
+        if parsed.order_by:
+            keys = []
+            for name, descending in reversed(parsed.order_by):
+                keys.extend(_sort_key(table[name][rows], descending))
+            rows = rows[np.lexsort(keys)]
+        limit = parsed.limit if parsed.limit is not None else limit
+        if limit is not None:
+            rows = rows[:limit]
+        return [_row(table, i) for i in rows]
@@ -0,0 +1,94 @@
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, Union
+
+
+@dataclass
+class FinancialSnapshot:
+    """
+    Compact result of one Yahoo Finance fetch: plain floats in slots and the
+    FCF history (newest first) in a float64 array, with no reference to the
+    statement DataFrames. A few hundred bytes per ticker instead of the
+    nested dicts; as_dict() gives the historical dict layout.
+    """
+    __slots__ = (
+        'ticker', 'current_price', 'shares_outstanding', 'fcf_history', 'growth_rate',
+        'fcf_to_income', 'debt_to_fcf', 'working_capital_change', 'wacc', 'suggested_multiple'
+    )
+
+    ticker: str
+    current_price: float
+    shares_outstanding: float
+    fcf_history: array
+    growth_rate: float
+    fcf_to_income: float
+    debt_to_fcf: float
+    working_capital_change: float
+    wacc: float
+    suggested_multiple: float
+
+    @staticmethod
+    def history(values: Iterable[float]) -> array:
+        return array('d', values)
+
+    @property
+    def latest_fcf(self) -> float:
+        return self.fcf_history[0]
+
+    @property
+    def market_cap(self) -> float:
+        return self.current_price * self.shares_outstanding
+
+    @property
+    def quality(self) -> Dict[str, float]:
+        return {
+            'fcf_to_income': self.fcf_to_income,
+            'debt_to_fcf': self.debt_to_fcf,
+            'working_capital_change': self.working_capital_change
+        }
+
+    def as_dict(self) -> Dict:
+        """The nested dict returned by YahooFinanceAPI.get_financials"""
+        return {
+            'cash_flow': {
+                'free_cashflow': {
+                    'latest': self.latest_fcf,
+                    'history': self.fcf_history.tolist(),
+                    'growth_rate': self.growth_rate
+                },
+                'quality': self.quality
+            },
+            'market_data': {
+                'shares_outstanding': self.shares_outstanding,
+                'current_price': self.current_price
+            },
+            'valuation': {
+                'wacc': self.wacc,
+                'suggested_multiple': self.suggested_multiple
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, ticker: str, data: Dict) -> 'FinancialSnapshot':
+        """Inverse of as_dict (e.g. for results coming from the daemon)"""
+        fcf = data['cash_flow']['free_cashflow']
+        quality = data['cash_flow']['quality']
+        return cls(
+            ticker=ticker,
+            current_price=data['market_data']['current_price'],
+            shares_outstanding=data['market_data']['shares_outstanding'],
+            fcf_history=cls.history(fcf['history']),
+            growth_rate=fcf['growth_rate'],
+            fcf_to_income=quality['fcf_to_income'],
+            debt_to_fcf=quality['debt_to_fcf'],
+            working_capital_change=quality['working_capital_change'],
+            wacc=data['valuation'].get('wacc'),
+            suggested_multiple=data['valuation']['suggested_multiple'],
+        )
+
+
+def as_dict(data: Union[FinancialSnapshot, Dict]) -> Dict:
+    """Adapter for the dict consumers: accepts a snapshot or an already nested dict"""
+    if isinstance(data, FinancialSnapshot):
+        return data.as_dict()
+    return data
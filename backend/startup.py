@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+DEFAULT_BUDGET_MS = 300.0
+
+# Dependências que não devem ser carregadas antes da primeira análise
+HEAVY_MODULES = ('yfinance', 'pandas', 'numpy', 'openai', 'pyarrow', 'aiohttp', 'motor', 'httpx')
+
+
+def parse_importtime(output: str) -> List[Tuple[str, float]]:
+    """Parse `python -X importtime` output into (module, cumulative ms), slowest first"""
+    entries = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        try:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            entries.append((name.rstrip(), int(cumulative) / 1000.0))
+        except ValueError:
+            continue
+    # Mantém a indentação do nome: importações aninhadas vêm com espaços extras à esquerda
+    return sorted(entries, key=lambda entry: entry[1], reverse=True)
+
+
+def measure_startup(module: str = 'main') -> Dict:
+    """Import a module in a fresh interpreter and report where the time goes"""
+    code = (
+        f"import {module}, sys; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    process_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {module}: {result.stderr.strip().splitlines()[-1:]}")
+
+    entries = parse_importtime(result.stderr)
+    import_ms = next((ms for name, ms in entries if name.strip() == module), 0.0)
+    heavy = [m for m in result.stdout.strip().split(',') if m]
+    return {
+        'import_ms': import_ms,
+        'process_ms': process_ms,
+        'top': [(name.strip(), ms) for name, ms in entries if not name.startswith('  ')],
+        'heavy_loaded': heavy
+    }
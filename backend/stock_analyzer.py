@@ -1,4 +1,5 @@
 from yahoo_finance import YahooFinanceAPI
+import quick_analysis
 import logging
 
 logger = logging.getLogger(__name__)
@@ -6,20 +7,22 @@ logger = logging.getLogger(__name__)
 class StockAnalyzer:
     def __init__(self):
         self.yahoo = YahooFinanceAPI()
+        self._ai_analyst = None
         
-    async def analyze_stock(self, ticker: str) -> dict:
+    async def analyze_stock(self, ticker: str, include_ai: bool = False) -> dict:
         """
         Analyze if a stock is a good buy based on its intrinsic value.
-        Returns a simple recommendation with the analysis.
+        Returns a simple recommendation with the analysis and the instant
+        deterministic summary; the LLM analysis is only requested if include_ai is set.
         """
         try:
             # Get financial data
-            data = await self.yahoo.get_financials(ticker)
+            data = await self.yahoo.get_snapshot(ticker)
             
             # Get the most recent free cash flow
-            fcf = list(data['cash_flow']['free_cashflow'].values())[0]
-            shares = data['market_data']['shares_outstanding']
-            current_price = data['market_data']['current_price']
+            fcf = data.latest_fcf
+            shares = data.shares_outstanding
+            current_price = data.current_price
             
             # Calculate FCF per share
             fcf_per_share = fcf / shares
@@ -34,7 +37,7 @@ class StockAnalyzer:
             is_good_buy = current_price <= buy_price
             upside_potential = ((fair_value - current_price) / current_price) * 100
             
-            return {
+            result = {
                 'ticker': ticker,
                 'recommendation': 'BUY' if is_good_buy else 'HOLD',
                 'current_price': round(current_price, 2),
@@ -45,9 +48,22 @@ class StockAnalyzer:
                     'fcf_per_share': round(fcf_per_share, 2),
                     'shares_outstanding': shares,
                     'total_fcf': fcf
-                }
+                },
+                'summary': quick_analysis.build_summary(ticker, data)
             }
+
+            if include_ai:
+                result['ai_analysis'] = await self.get_ai_analysis(ticker, data)
+
+            return result
             
         except Exception as e:
             logger.error(f"Error analyzing stock {ticker}: {str(e)}")
             raise Exception(f"Failed to analyze stock: {str(e)}")
+
+    async def get_ai_analysis(self, ticker: str, data) -> str:
+        """Second-tier LLM analysis, requested on demand"""
+        if self._ai_analyst is None:
+            from ai_analysis import AIAnalyst
+            self._ai_analyst = AIAnalyst()
+        return await self._ai_analyst.get_analysis(ticker, data)
@@ -0,0 +1,178 @@
+import csv
+import os
+import re
+import unicodedata
+import logging
+from array import array
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'data', 'symbols.csv')
+DEFAULT_THRESHOLD = 0.6
+AMBIGUITY_MARGIN = 0.05  # Candidatos empatados ficam para a IA decidir
+
+# Termos societários que não ajudam a distinguir empresas
+STOPWORDS = {
+    'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'companies',
+    'ltd', 'limited', 'plc', 'sa', 's', 'a', 'nv', 'the', 'holding', 'holdings',
+    'group', 'grupo', 'cia', 'de', 'do', 'da', 'e', 'and', 'participacoes'
+}
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and punctuation, drop corporate suffixes"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    words = re.sub(r'[^a-z0-9&]+', ' ', text).split()
+    filtered = [w for w in words if w not in STOPWORDS]
+    return ' '.join(filtered or words)
+
+
+def trigrams(text: str) -> set:
+    """Character trigrams of a normalized string, padded at the word edges"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SymbolMatch:
+    __slots__ = ('ticker', 'name', 'market', 'score', 'alternatives')
+
+    def __init__(self, ticker: str, name: str, market: str, score: float, alternatives: List[str]):
+        self.ticker = ticker
+        self.name = name
+        self.market = market
+        self.score = score
+        self.alternatives = alternatives
+
+    def __repr__(self):
+        return f"SymbolMatch({self.ticker!r}, {self.name!r}, score={self.score:.2f})"
+
+
+class SymbolDirectory:
+    """Offline company name -> ticker index with trigram fuzzy search"""
+
+    def __init__(self, rows: List[Dict[str, str]]):
+        # Uma empresa pode ter várias classes de ações (ex: PETR4/PETR3); a primeira é a principal
+        self._companies: List[tuple] = []
+        company_ids: Dict[tuple, int] = {}
+        self._tickers: Dict[str, int] = {}
+
+        self._keys: List[str] = []
+        self._key_company = array('I')
+        self._key_size = array('H')
+        self._postings: Dict[str, array] = {}
+
+        for row in rows:
+            ticker = row['ticker'].strip().upper()
+            market = row.get('market', '').strip().upper()
+            name = row['name'].strip()
+            company_key = (name, market)
+
+            if company_key in company_ids:
+                company_id = company_ids[company_key]
+                self._companies[company_id][0].append(ticker)
+            else:
+                company_id = len(self._companies)
+                company_ids[company_key] = company_id
+                self._companies.append(([ticker], name, market))
+                aliases = [a for a in (row.get('aliases') or '').split('|') if a.strip()]
+                for key in {normalize(n) for n in [name] + aliases}:
+                    self._add_key(key, company_id)
+
+            self._tickers[ticker] = company_id
+            self._tickers.setdefault(ticker.split('.')[0], company_id)
+
+    def _add_key(self, key: str, company_id: int):
+        key_id = len(self._keys)
+        grams = trigrams(key)
+        self._keys.append(key)
+        self._key_company.append(company_id)
+        self._key_size.append(len(grams))
+        for gram in grams:
+            self._postings.setdefault(gram, array('I')).append(key_id)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> 'SymbolDirectory':
+        """Load the directory from a CSV file with ticker,market,name,aliases columns"""
+        path = path or os.environ.get('SYMBOL_DIRECTORY_PATH', DEFAULT_PATH)
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        logger.debug(f"Loaded {len(rows)} symbols from {path}")
+        return cls(rows)
+
+    def __len__(self) -> int:
+        return len(self._tickers)
+
+    def search(self, query: str, limit: int = 5) -> List[SymbolMatch]:
+        """Rank companies by similarity to the query (Dice coefficient on trigrams)"""
+        normalized = normalize(query)
+        if not normalized:
+            return []
+
+        scores: Dict[int, float] = {}
+
+        exact_ticker = self._tickers.get(query.strip().upper())
+        if exact_ticker is not None:
+            scores[exact_ticker] = 1.0
+
+        query_grams = trigrams(normalized)
+        shared: Dict[int, int] = {}
+        for gram in query_grams:
+            for key_id in self._postings.get(gram, ()):
+                shared[key_id] = shared.get(key_id, 0) + 1
+
+        for key_id, common in shared.items():
+            key = self._keys[key_id]
+            if key == normalized:
+                score = 1.0
+            else:
+                score = 2.0 * common / (len(query_grams) + self._key_size[key_id])
+                # "petro" deve encontrar "petrobras" mesmo com poucos trigramas em comum
+                if len(normalized) >= 3 and key.startswith(normalized):
+                    score = max(score, 0.8)
+            company_id = self._key_company[key_id]
+            if score > scores.get(company_id, 0.0):
+                scores[company_id] = score
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        matches = []
+        for company_id, score in ranked:
+            tickers, name, market = self._companies[company_id]
+            matches.append(SymbolMatch(tickers[0], name, market, score, tickers[1:]))
+        return matches
+
+    def lookup(self, company_name: str, threshold: Optional[float] = None) -> Optional[Dict[str, str]]:
+        """
+        Resolve a company name in the same format as TickerFinder.get_company_ticker.
+        Returns None if no candidate is confident enough.
+        """
+        if threshold is None:
+            threshold = float(os.environ.get('SYMBOL_MATCH_THRESHOLD', DEFAULT_THRESHOLD))
+
+        matches = self.search(company_name, limit=2)
+        if not matches or matches[0].score < threshold:
+            return None
+        if len(matches) > 1 and matches[0].score - matches[1].score < AMBIGUITY_MARGIN:
+            return None
+
+        best = matches[0]
+        nota = f"{best.name} (diretório local, confiança {best.score:.0%})"
+        if best.alternatives:
+            nota += f". Outras classes: {', '.join(best.alternatives)}"
+        return {
+            "ticker_principal": best.ticker,
+            "mercado": best.market,
+            "nota": nota
+        }
+
+
+_directory: Optional[SymbolDirectory] = None
+
+
+def get_symbol_directory() -> SymbolDirectory:
+    """Get the process-wide symbol directory, loading it on first use"""
+    global _directory
+    if _directory is None:
+        _directory = SymbolDirectory.load()
+    return _directory
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from ai_analysis import AIAnalyst
+
+FALLBACK = "AI analysis unavailable at the moment."
+
+
+def stock_data():
+    return {
+        'market_data': {'current_price': 100.0, 'shares_outstanding': 1e9},
+        'cash_flow': {
+            'free_cashflow': {'latest': 1e10, 'history': [1e10, 8e9], 'growth_rate': 16.0},
+            'quality': {'fcf_to_income': 95.0, 'debt_to_fcf': 1.5, 'working_capital_change': 0.0}
+        },
+        'valuation': {'wacc': 9.0, 'suggested_multiple': 15.0}
+    }
+
+
+class StubLLM:
+    """Streams `tokens`, then fails with `error` if given"""
+
+    def __init__(self, tokens, error=None):
+        self.tokens = tokens
+        self.error = error
+
+    async def chat_stream(self, **kwargs):
+        for token in self.tokens:
+            yield token
+        if self.error:
+            raise self.error
+
+
+@pytest.fixture
+def analyst(monkeypatch):
+    monkeypatch.setenv('LLM_CACHE_ENABLED', '0')
+
+    def build(tokens, error=None):
+        return AIAnalyst(llm=StubLLM(tokens, error))
+    return build
+
+
+def collect(analyst):
+    async def run():
+        return [token async for token in analyst.stream_analysis('AAPL', stock_data())]
+    return asyncio.run(run())
+
+
+def test_stream_falls_back_only_before_the_first_token(analyst):
+    assert collect(analyst(['Com', 'pra'])) == ['Com', 'pra']
+    assert collect(analyst([], ConnectionError("reset"))) == [FALLBACK]
+
+    # Depois de texto parcial, o erro sobe em vez de colar o aviso no fim da resposta
+    tokens = []
+
+    async def run():
+        async for token in analyst(['Com', 'pra'], ConnectionError("reset")).stream_analysis('AAPL', stock_data()):
+            tokens.append(token)
+    with pytest.raises(ConnectionError):
+        asyncio.run(run())
+    assert tokens == ['Com', 'pra']
+
+
+def test_stream_endpoint_sends_server_sent_events(analyst, monkeypatch):
+    pytest.importorskip('fastapi')
+    pytest.importorskip('motor')
+    import api
+
+    async def valuation(ticker):
+        return {'data': stock_data()}
+    monkeypatch.setattr(api, '_yahoo_valuation', valuation)
+
+    def events(ai_analyst):
+        monkeypatch.setattr(api, 'get_ai_analyst', lambda: ai_analyst)
+
+        async def run():
+            response = await api.stream_analysis('aapl')
+            assert response.media_type == 'text/event-stream'
+            return ''.join([chunk async for chunk in response.body_iterator])
+        return asyncio.run(run())
+
+    assert events(analyst(['Linha 1\n', 'fim'])) == (
+        'event: token\ndata: "Linha 1\\n"\n\n'
+        'event: token\ndata: "fim"\n\n'
+        'event: done\ndata: {}\n\n'
+    )
+    body = events(analyst(['Com'], ConnectionError("reset")))
+    assert body.startswith('event: token\ndata: "Com"\n\nevent: error\n')
+    assert '"details": "reset"' in body and 'event: done' not in body
+
+    with pytest.raises(api.APIError):
+        asyncio.run(api.stream_analysis('not a ticker'))
@@ -0,0 +1,125 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+pytest.importorskip('pyarrow')
+from backtest import Backtest, rebalance_dates
+from fundamentals_store import FundamentalsStore, fields
+
+
+def record(ticker, fcf, growth, years=range(2015, 2024)):
+    """Constant FCF per year; the price starts at 10 in 2016 and grows `growth` a year"""
+    blank = {statement: dict.fromkeys(fields(statement)) for statement in ('income', 'balance', 'cash_flow')}
+    periods = [date(year, 12, 31) for year in years]
+    days = [date(2016, 1, 1) + timedelta(days=i) for i in range(9 * 365)]
+    return {
+        'income': [dict(blank['income'], ticker=ticker, period=p, net_income=fcf) for p in periods],
+        'balance': [dict(blank['balance'], ticker=ticker, period=p, shares_outstanding=1e6) for p in periods],
+        'cash_flow': [dict(blank['cash_flow'], ticker=ticker, period=p, free_cash_flow=fcf) for p in periods],
+        'market': [{'ticker': ticker, 'period': date(2025, 1, 1), 'price': 10.0,
+                    'shares_outstanding': 1e6, 'market_cap': 1e7, 'beta': 1.0}],
+        'prices': [{'ticker': ticker, 'period': d, 'close': 10.0 * (1 + growth) ** ((d - days[0]).days / 365)}
+                   for d in days],
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FundamentalsStore(str(tmp_path / 'store'))
+    # Mais FCF por ação -> maior upside e maior retorno futuro
+    store.write([record(f"T{i:02d}", (i + 1) * 1e6, 0.01 * i) for i in range(10)])
+    return store
+
+
+def test_rebalance_dates():
+    dates = rebalance_dates(date(2020, 1, 15), date(2020, 12, 31), 3)
+    assert [str(d) for d in dates] == ['2020-01-31', '2020-04-30', '2020-07-31', '2020-10-31']
+
+
+def test_ranks_and_forward_returns(store, tmp_path):
+    results = Backtest(store, str(tmp_path / 'cache')).run(date(2018, 1, 1), date(2024, 6, 30), every_months=6)
+    for model in ('multiple', 'dcf'):
+        result = results[model]
+        scored = [row for row in result['dates'] if row['ic'] is not None]
+        # Sem preço 12 meses à frente, as últimas datas ficam sem observações
+        assert len(scored) == 12 and result['dates'][-1]['n'] == 0
+        assert all(row['n'] == 10 and row['ic'] == pytest.approx(1.0) for row in scored)
+        assert scored[0]['top_quintile'] == pytest.approx(0.085)  # T08 e T09
+        assert result['summary']['mean_spread'] == pytest.approx(0.08, abs=0.001)
+        assert result['params']['model'] == model
+
+
+def test_uses_only_published_statements(store, tmp_path):
+    backtest = Backtest(store, str(tmp_path / 'cache'))
+    before = backtest._multiple_upside(backtest._panel(date(2023, 1, 1), date(2023, 12, 31), 1, 1, 90))
+
+    # Um período de junho/2023 com FCF muito maior só conta a partir de setembro (30/06 + 90 dias)
+    updated = record('T00', 1e6, 0.0)
+    updated['cash_flow'].append(dict(updated['cash_flow'][0], period=date(2023, 6, 30), free_cash_flow=1e9))
+    store.write([{k: v for k, v in updated.items() if k != 'prices'}])
+    after = backtest._multiple_upside(backtest._panel(date(2023, 1, 1), date(2023, 12, 31), 1, 1, 90))
+
+    t00 = np.arange(12) * 10  # T00 é o primeiro ticker de cada data
+    np.testing.assert_allclose(after[t00[:8]], before[t00[:8]])
+    assert (before[t00[8:]] < 0).all() and (after[t00[8:]] > 1000).all()
+    np.testing.assert_allclose(np.delete(after, t00), np.delete(before, t00))
+
+
+def test_results_are_cached(store, tmp_path, monkeypatch):
+    backtest = Backtest(store, str(tmp_path / 'cache'))
+    first = backtest.run(date(2019, 1, 1), date(2020, 12, 31), models=['dcf'])
+
+    def fail(*args):
+        raise AssertionError("recalculado")
+    monkeypatch.setattr(backtest, '_panel', fail)
+    assert backtest.run(date(2019, 1, 1), date(2020, 12, 31), models=['dcf']) == first
+    with pytest.raises(AssertionError):
+        backtest.run(date(2019, 1, 1), date(2020, 12, 31), models=['dcf'], refresh=True)
+
+
+def test_statements_in_another_currency_are_converted(tmp_path):
+    """Same company twice: figures in USD, and in BRL (fx 0.18 in data/market_params.json) quoted in USD"""
+    brl = record('BRL', 5e6 / 0.18, 0.02)
+    brl['market'] = [dict(row, currency='USD', financial_currency='BRL') for row in brl['market']]
+    store = FundamentalsStore(str(tmp_path / 'store'))
+    store.write([record('USD', 5e6, 0.02), brl])
+
+    backtest = Backtest(store, str(tmp_path / 'cache'))
+    panel = backtest._panel(date(2019, 1, 1), date(2020, 12, 31), 6, 12, 90)
+    for upside in (backtest._multiple_upside(panel), backtest._dcf_upside(panel, 0.1)):
+        # Tickers em ordem: BRL e USD alternados por data
+        np.testing.assert_allclose(upside[0::2], upside[1::2])
+        assert np.isfinite(upside).all()
+
+
+def test_growth_skips_periods_without_fcf(tmp_path, monkeypatch):
+    import ratings
+    import screener
+    histories = {  # 2016 a 2019
+        'FULL': [100.0, 110.0, 121.0, 133.1],
+        'GAP': [None, 110.0, 121.0, 133.1],   # coluna mais antiga vazia, como o yfinance costuma devolver
+        'MID': [100.0, 110.0, None, 133.1],
+    }
+    records = []
+    for ticker, fcf in histories.items():
+        stored = record(ticker, 1e6, 0.0, years=range(2016, 2020))
+        stored['cash_flow'] = [dict(row, free_cash_flow=v) for row, v in zip(stored['cash_flow'], fcf)]
+        records.append(stored)
+    store = FundamentalsStore(str(tmp_path / 'store'))
+    store.write(records)
+
+    seen = {}
+    score = screener.score
+
+    def spy(inputs):
+        seen.update(zip(inputs['ticker'], inputs['fcf_growth_rate']))
+        return score(inputs)
+    monkeypatch.setattr(screener, 'score', spy)
+    backtest = Backtest(store, str(tmp_path / 'cache'))
+    backtest._multiple_upside(backtest._panel(date(2020, 6, 1), date(2020, 6, 30), 1, 1, 90))
+
+    for ticker, fcf in histories.items():
+        values = [v for v in reversed(fcf) if v is not None]
+        assert seen[ticker] == pytest.approx(ratings.cagr(values, len(values)))
+    assert seen['GAP'] == pytest.approx(6.56, abs=0.01) and seen['MID'] == pytest.approx(10.0)
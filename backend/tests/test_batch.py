@@ -0,0 +1,144 @@
+import asyncio
+import csv
+import json
+
+import pytest
+
+import market_params
+from batch import FIELD_NAMES, BatchRunner, build_row, open_writer, read_tickers
+from market_params import FileSource, MarketParams
+
+
+def stock_data(price=100.0):
+    return {
+        'market_data': {'current_price': price, 'shares_outstanding': 1e9},
+        'cash_flow': {
+            'free_cashflow': {'latest': 1e10, 'history': [1e10, 8e9], 'growth_rate': 16.0},
+            'quality': {'fcf_to_income': 95.0, 'debt_to_fcf': 1.5, 'working_capital_change': 0.0}
+        },
+        'valuation': {'wacc': 9.0, 'suggested_multiple': 15.0}
+    }
+
+
+class StubYahoo:
+    """Fetcher: UNKNOWN fails, BROKEN returns incomplete data, the rest return stock_data()"""
+
+    def __init__(self):
+        self.snapshots = []
+
+    async def get_financials(self, ticker):
+        self.snapshots.append(market_params.get_market_params().snapshot())
+        await asyncio.sleep(0)
+        if ticker == 'UNKNOWN':
+            raise ValueError(f"Could not fetch data for {ticker}")
+        if ticker == 'BROKEN':
+            return {'market_data': {'current_price': 10.0}}
+        return stock_data()
+
+
+class StubAnalyst:
+    async def get_analysis(self, ticker, data):
+        return f"análise de {ticker}"
+
+
+class MemoryWriter:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, row):
+        self.rows.append(row)
+
+
+def run(tickers, **kwargs):
+    runner = BatchRunner(concurrency=2, yahoo=StubYahoo(), **kwargs)
+    writer = MemoryWriter()
+    counts = asyncio.run(runner.run(tickers, writer))
+    return runner, counts, {row['ticker']: row for row in writer.rows}
+
+
+def test_rows_and_error_records():
+    _, counts, rows = run(['AAPL', 'UNKNOWN', 'BROKEN'])
+    assert counts == {'ok': 1, 'error': 2}
+    assert all(list(row) == FIELD_NAMES for row in rows.values())
+
+    ok = rows['AAPL']
+    assert ok['status'] == 'ok' and ok['error'] is None
+    assert ok['fair_value'] == pytest.approx(150.0) and ok['upside'] == pytest.approx(50.0)
+    assert ok['recommendation'] == 'Strong Buy' and ok['ai_analysis'] is None
+
+    # Erros viram linhas com o resto das colunas vazio
+    assert rows['UNKNOWN']['status'] == 'error'
+    assert rows['UNKNOWN']['error'] == "Could not fetch data for UNKNOWN"
+    assert rows['BROKEN']['error'].startswith("Invalid data:")
+    assert all(rows['UNKNOWN'][name] is None for name in FIELD_NAMES if name not in ('ticker', 'status', 'error'))
+
+
+def test_ai_analysis_is_included_when_requested():
+    _, _, rows = run(['AAPL', 'UNKNOWN'], include_ai=True, ai_analyst=StubAnalyst())
+    assert rows['AAPL']['ai_analysis'] == "análise de AAPL"
+    assert rows['UNKNOWN']['ai_analysis'] is None
+
+
+def test_market_params_are_pinned_for_the_whole_batch(monkeypatch):
+    params = MarketParams(FileSource(), refresh_seconds=0)
+    monkeypatch.setattr(market_params, '_market_params', params)
+    runner, _, _ = run([f"T{i}" for i in range(10)])
+    assert len(runner.yahoo.snapshots) == 10
+    assert all(s is runner.yahoo.snapshots[0] for s in runner.yahoo.snapshots)
+    assert params.fetches == 1
+    # Fora do lote o intervalo zero volta a valer
+    assert params.snapshot() is not runner.yahoo.snapshots[0]
+
+
+def test_csv_and_jsonl_writers(tmp_path):
+    rows = [build_row('AAPL', stock_data()), build_row('UNKNOWN', error="sem dados")]
+    for name in ('out.csv', 'out.jsonl'):
+        with open_writer(str(tmp_path / name)) as writer:
+            for row in rows:
+                writer.write(row)
+
+    with open(tmp_path / 'out.csv', newline='', encoding='utf-8') as f:
+        written = list(csv.DictReader(f))
+    assert [r['ticker'] for r in written] == ['AAPL', 'UNKNOWN']
+    assert float(written[0]['fair_value']) == pytest.approx(150.0)
+    assert written[1]['error'] == "sem dados" and written[1]['fair_value'] == ''
+
+    with open(tmp_path / 'out.jsonl', encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == rows
+
+
+def test_parquet_writer_flushes_partial_row_group_on_close(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    from batch import ParquetResultWriter
+
+    path = str(tmp_path / 'out.parquet')
+    rows = [build_row(f"T{i}", stock_data(100.0 + i)) for i in range(4)] + [build_row('UNKNOWN', error="sem dados")]
+    writer = ParquetResultWriter(path, row_group_size=2)
+    for row in rows:
+        writer.write(row)
+    # A última linha fica no buffer até o close
+    assert len(writer._buffer) == 1
+    writer.close()
+
+    metadata = pq.ParquetFile(path).metadata
+    assert metadata.num_row_groups == 3 and metadata.num_rows == 5
+    table = pq.read_table(path)
+    assert table.schema.names == FIELD_NAMES
+    assert table.to_pylist() == rows
+
+
+def test_open_writer_infers_format(tmp_path):
+    pytest.importorskip('pyarrow')
+    from batch import CSVResultWriter, JSONLinesResultWriter, ParquetResultWriter
+    for name, cls in (('a.csv', CSVResultWriter), ('a.ndjson', JSONLinesResultWriter),
+                      ('a.pq', ParquetResultWriter)):
+        with open_writer(str(tmp_path / name)) as writer:
+            assert isinstance(writer, cls)
+    with pytest.raises(ValueError):
+        open_writer(str(tmp_path / 'a.xlsx'))
+
+
+def test_read_tickers(tmp_path):
+    path = tmp_path / 'tickers.txt'
+    path.write_text("aapl, msft  # big tech\n\n# comentário\nPETR4.SA\nAAPL\n", encoding='utf-8')
+    assert read_tickers(str(path)) == ['AAPL', 'MSFT', 'PETR4.SA']
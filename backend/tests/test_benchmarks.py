@@ -0,0 +1,40 @@
+from benchmarks.history import baseline, compare, summarize
+
+
+def run(host, median, key='dcf.intrinsic_value@100'):
+    return {'host': host, 'results': {key: {'median_us': median}}}
+
+
+def test_summarize_per_item_microseconds():
+    result = summarize([0.2, 0.1, 0.3], size=100)
+    assert result['median_us'] == 2000.0
+    assert result['min_us'] == 1000.0
+    assert result['p95_us'] == 3000.0
+    assert result['runs'] == 3
+
+
+def test_baseline_uses_recent_runs_on_same_host():
+    history = [run('a', 100.0), run('a', 200.0), run('b', 900.0), run('a', 300.0), run('a', 400.0)]
+    assert baseline(history, 'a', runs=3) == {'dcf.intrinsic_value@100': 300.0}
+
+
+def test_compare_flags_regressions_and_budgets():
+    thresholds = {
+        'default': {'max_regression': 0.2},
+        'cases': {'yahoo.dynamic_multiple': {'max_us_per_item': 50}},
+    }
+    history = [run('a', 100.0)]
+    results = {
+        'dcf.intrinsic_value@100': {'median_us': 130.0},
+        'yahoo.dynamic_multiple@100': {'median_us': 60.0},
+        'yahoo.wacc@100': {'median_us': 10.0},
+    }
+    rows = {row['key']: row for row in compare(results, history, thresholds, 'a')}
+
+    assert rows['dcf.intrinsic_value@100']['status'] == 'regression'
+    assert abs(rows['dcf.intrinsic_value@100']['change'] - 0.3) < 1e-9
+    assert rows['yahoo.dynamic_multiple@100']['status'] == 'regression'
+    assert rows['yahoo.wacc@100']['status'] == 'new'
+
+    rows = compare({'dcf.intrinsic_value@100': {'median_us': 110.0}}, history, thresholds, 'a')
+    assert rows[0]['status'] == 'ok'
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import stat
+from datetime import date
+
+import pytest
+
+from daemon import AnalysisDaemon
+from daemon_client import DaemonClient
+
+
+class StubYahoo:
+    async def get_financials(self, ticker):
+        if ticker == 'UNKNOWN':
+            raise ValueError(f"Could not get basic stock information for {ticker}")
+        return {'market_data': {'current_price': 100.0, 'shares_outstanding': 1e9}}
+
+    async def get_fundamentals(self, ticker):
+        return {'cash_flow': [{'period': date(2023, 12, 31), 'free_cashflow': 1e10}]}
+
+    async def get_current_price(self, ticker):
+        return 101.5
+
+
+class StubAnalyst:
+    async def get_analysis(self, ticker, data):
+        return f"{ticker}: {data['market_data']['current_price']}"
+
+    async def stream_analysis(self, ticker, data):
+        for token in ('Com', 'pra ', ticker):
+            yield token
+
+
+class StubFinder:
+    async def get_company_ticker(self, company_name):
+        return {'ticker_principal': 'PETR4.SA', 'mercado': 'BR', 'nota': company_name}
+
+
+@pytest.fixture
+def socket_path(tmp_path, monkeypatch):
+    monkeypatch.delenv('INTRINSIC_DAEMON', raising=False)
+    return str(tmp_path / 'daemon.sock')
+
+
+def with_daemon(socket_path, client_code):
+    """Serve a daemon with stub clients on socket_path while client_code(client) runs"""
+    daemon = AnalysisDaemon(socket_path, yahoo=StubYahoo(), ai_analyst=StubAnalyst(), ticker_finder=StubFinder())
+
+    async def run():
+        server = asyncio.ensure_future(daemon.serve())
+        for _ in range(100):
+            client = await DaemonClient.connect(socket_path)
+            if client is not None:
+                break
+            await asyncio.sleep(0.01)
+        assert client is not None
+        try:
+            return await client_code(client)
+        finally:
+            await client.shutdown()
+            await asyncio.wait_for(server, 5)
+    return asyncio.run(run())
+
+
+def test_round_trip_over_the_socket(socket_path):
+    async def session(client):
+        mode = stat.S_IMODE(os.stat(socket_path).st_mode)
+        data = await client.get_financials('AAPL')
+        tokens = [token async for token in client.stream_analysis('AAPL', data)]
+        return {
+            'mode': mode,
+            'data': data,
+            'fundamentals': await client.get_fundamentals('AAPL'),
+            'price': await client.get_current_price('AAPL'),
+            'resolve': await client.get_company_ticker('Petrobras'),
+            'analysis': await client.get_analysis('AAPL', data),
+            'tokens': tokens,
+            'ping': await client.request('ping'),
+        }
+
+    result = with_daemon(socket_path, session)
+    assert result['mode'] == 0o600  # Só o dono conversa com o daemon
+    assert result['data']['market_data']['current_price'] == 100.0
+    assert result['fundamentals'] == {'cash_flow': [{'period': '2023-12-31', 'free_cashflow': 1e10}]}
+    assert result['price'] == 101.5
+    assert result['resolve']['ticker_principal'] == 'PETR4.SA'
+    assert result['analysis'] == "AAPL: 100.0"
+    assert result['tokens'] == ['Com', 'pra ', 'AAPL']
+    assert result['ping']['requests'] >= 7
+    # O daemon remove o socket ao encerrar
+    assert not os.path.exists(socket_path)
+
+
+def test_errors_travel_back_and_keep_the_daemon_up(socket_path):
+    async def session(client):
+        with pytest.raises(Exception, match="Could not get basic stock information"):
+            await client.get_financials('UNKNOWN')
+        with pytest.raises(Exception, match="Operação desconhecida"):
+            await client.request('nope')
+        return await client.get_current_price('AAPL')
+
+    assert with_daemon(socket_path, session) == 101.5
+
+
+def test_falls_back_to_in_process_without_a_daemon(socket_path, monkeypatch):
+    # Sem socket
+    assert asyncio.run(DaemonClient.connect(socket_path)) is None
+
+    # Socket abandonado por um daemon que morreu: ninguém escuta
+    import socket
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(socket_path)
+    sock.close()
+    assert os.path.exists(socket_path)
+    assert asyncio.run(DaemonClient.connect(socket_path)) is None
+
+    # Desligado por configuração
+    monkeypatch.setenv('INTRINSIC_DAEMON', '0')
+    assert asyncio.run(DaemonClient.connect(socket_path)) is None
+
+
+def test_refuses_to_take_over_a_live_socket(socket_path):
+    async def session(client):
+        second = AnalysisDaemon(socket_path, yahoo=StubYahoo(), ai_analyst=StubAnalyst(), ticker_finder=StubFinder())
+        with pytest.raises(ValueError, match="Já existe um daemon"):
+            await second.serve()
+        # O primeiro continua atendendo no mesmo socket
+        return await client.get_current_price('AAPL')
+
+    assert with_daemon(socket_path, session) == 101.5
+
+
+def test_replaces_a_stale_socket_but_not_other_files(socket_path):
+    import socket
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(socket_path)
+    sock.close()
+
+    async def session(client):
+        return stat.S_IMODE(os.stat(socket_path).st_mode), await client.get_current_price('AAPL')
+
+    assert with_daemon(socket_path, session) == (0o600, 101.5)
+
+    with open(socket_path, 'w') as f:
+        f.write('não é um socket')
+    daemon = AnalysisDaemon(socket_path, yahoo=StubYahoo(), ai_analyst=StubAnalyst(), ticker_finder=StubFinder())
+    with pytest.raises(ValueError, match="não é um socket"):
+        asyncio.run(daemon.serve())
+    with open(socket_path) as f:
+        assert f.read() == 'não é um socket'
@@ -0,0 +1,90 @@
+import os
+from datetime import date
+
+import pytest
+
+pytest.importorskip('pyarrow')
+from fundamentals_store import FundamentalsStore, fields
+
+
+def record(ticker, fcf, price=100.0):
+    periods = [date(2023 - i, 12, 31) for i in range(len(fcf))]
+    blank = {statement: dict.fromkeys(fields(statement)) for statement in ('income', 'balance', 'cash_flow')}
+    return {
+        'income': [dict(blank['income'], ticker=ticker, period=p, net_income=v * 1.2) for p, v in zip(periods, fcf)],
+        'balance': [dict(blank['balance'], ticker=ticker, period=p, total_debt=v * 2) for p, v in zip(periods, fcf)],
+        'cash_flow': [dict(blank['cash_flow'], ticker=ticker, period=p, free_cash_flow=v) for p, v in zip(periods, fcf)],
+        'market': [{'ticker': ticker, 'period': date(2024, 3, 1), 'price': price,
+                    'shares_outstanding': 1e6, 'market_cap': price * 1e6, 'beta': 1.1}],
+    }
+
+
+def test_write_and_scan(tmp_path):
+    store = FundamentalsStore(str(tmp_path))
+    store.write([record('MSFT', [160.0, 100.0]), record('AAPL', [121.0, 110.0, 100.0])])
+
+    reopened = FundamentalsStore(str(tmp_path))
+    assert reopened.tickers() == ['AAPL', 'MSFT']
+    assert reopened.history('AAPL', 'cash_flow').column('free_cash_flow').to_pylist() == [121.0, 110.0, 100.0]
+
+    inputs = reopened.valuation_inputs().to_pydict()
+    assert inputs['ticker'] == ['AAPL', 'MSFT']
+    assert inputs['free_cash_flow'] == [121.0, 160.0]
+    assert inputs['total_debt'] == [242.0, 320.0]
+    assert inputs['fcf_growth_rate'] == pytest.approx([(1.21 ** (1 / 3) - 1) * 100, (1.6 ** 0.5 - 1) * 100])
+
+
+def test_growth_skips_periods_without_fcf(tmp_path):
+    import ratings
+    histories = {
+        'AAA': [121.0, 110.0, 100.0, None],  # yfinance costuma trazer a coluna mais antiga vazia
+        'BBB': [None, 150.0, None, 100.0],
+        'CCC': [None, 90.0, None],
+    }
+    records = []
+    for ticker, fcf in histories.items():
+        stored = record(ticker, [1.0] * len(fcf))
+        stored['cash_flow'] = [dict(row, free_cash_flow=v) for row, v in zip(stored['cash_flow'], fcf)]
+        records.append(stored)
+    store = FundamentalsStore(str(tmp_path))
+    store.write(records)
+
+    inputs = store.valuation_inputs().to_pydict()
+    for ticker, growth in zip(inputs['ticker'], inputs['fcf_growth_rate']):
+        values = [v for v in histories[ticker] if v is not None]
+        assert growth == pytest.approx(ratings.cagr(values, len(values)))
+    assert inputs['fcf_growth_rate'][0] == pytest.approx(6.56, abs=0.01)
+    assert inputs['fcf_growth_rate'][2] == 0.0
+
+
+def test_currencies_are_stored_and_old_files_upgraded(tmp_path):
+    import pyarrow as pa
+
+    store = FundamentalsStore(str(tmp_path))
+    brl = record('PETR4.SA', [100.0])
+    brl['market'][0].update(currency='USD', financial_currency='BRL')
+    store.write([brl, record('MSFT', [160.0])])
+    inputs = FundamentalsStore(str(tmp_path)).valuation_inputs().to_pydict()
+    assert inputs['currency'] == [None, 'USD'] and inputs['financial_currency'] == [None, 'BRL']
+
+    # Arquivo de mercado gravado antes das colunas de moeda: lido com as colunas vazias e regravável
+    path = str(tmp_path / 'market.arrow')
+    old = store.table('market').drop(['currency', 'financial_currency'])
+    store.close()
+    with pa.OSFile(path + '.tmp', 'wb') as sink, pa.ipc.new_file(sink, old.schema) as writer:
+        writer.write_table(old)
+    os.replace(path + '.tmp', path)
+    reopened = FundamentalsStore(str(tmp_path))
+    assert reopened.latest('market', ['currency']).column('currency').to_pylist() == [None, None]
+    reopened.write([brl])
+    assert reopened.latest('market', ['financial_currency']).column('financial_currency').to_pylist() == [None, 'BRL']
+
+
+def test_write_replaces_existing_ticker(tmp_path):
+    store = FundamentalsStore(str(tmp_path))
+    store.write([record('AAPL', [121.0, 110.0]), record('MSFT', [160.0])])
+    store.write([record('AAPL', [130.0], price=200.0)])
+
+    assert store.tickers('cash_flow') == ['AAPL', 'MSFT']
+    assert store.history('AAPL', 'cash_flow').num_rows == 1
+    assert store.latest('market', ['price']).column('price').to_pylist() == [200.0, 100.0]
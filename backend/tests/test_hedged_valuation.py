@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('fastapi')
+pytest.importorskip('motor')
+import api
+
+QUOTE = 100.0
+
+
+class StubYahoo:
+    """FCF multiple source: fair value 150/10 * 10 = 150, snapshot price 101"""
+
+    def __init__(self, delay: float, quote=QUOTE):
+        self.delay = delay
+        self.quote = quote
+
+    async def get_financials(self, ticker):
+        await asyncio.sleep(self.delay)
+        return {
+            'market_data': {'current_price': 101.0, 'shares_outstanding': 10.0},
+            'cash_flow': {'free_cashflow': {'latest': 150.0, 'growth_rate': 8.0}},
+            'valuation': {'suggested_multiple': 10.0, 'wacc': 9.0},
+        }
+
+    async def get_current_price(self, ticker):
+        if self.quote is None:
+            raise ValueError(f"Could not get price for {ticker}")
+        return self.quote
+
+
+class StubDCF:
+    """DCF source: 200 per share; market_price is the 52-week high and must not be used as the price"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.cancelled = False
+
+    async def calculate_intrinsic_value(self, ticker, **kwargs):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return {'dcf_analysis': {'per_share_value': 200.0}, 'market_data': {'market_price': 300.0}}
+
+
+@pytest.fixture
+def sources(monkeypatch):
+    monkeypatch.setattr(api, 'STORE_VALUATIONS', False)
+    monkeypatch.setattr(api, 'RECONCILE_SECONDS', 0.0)
+
+    def install(yahoo, dcf):
+        monkeypatch.setattr(api, 'get_yahoo', lambda: yahoo)
+        monkeypatch.setattr(api, 'get_dcf_model', lambda: dcf)
+    return install
+
+
+def valuate(preferred_source):
+    return asyncio.run(api._valuate('AAPL', None, 0.1, 'gordon', 0.3, preferred_source))
+
+
+def test_both_alpha_vantage_wins(sources):
+    yahoo, dcf = StubYahoo(delay=5), StubDCF(delay=0.01)
+    sources(yahoo, dcf)
+    result = valuate('both')
+    assert result['source'] == 'alpha_vantage' and result['intrinsic_value'] == 200.0
+    assert result['current_price'] == QUOTE and result['upside'] == 100.0
+
+
+def test_both_yahoo_wins(sources):
+    yahoo, dcf = StubYahoo(delay=0.01), StubDCF(delay=5)
+    sources(yahoo, dcf)
+    result = valuate('both')
+    assert result['source'] == 'yahoo' and result['intrinsic_value'] == 150.0
+    # Mesma cotação qualquer que seja a fonte vencedora
+    assert result['current_price'] == QUOTE and result['upside'] == 50.0
+    assert dcf.cancelled
+
+
+def test_both_reconciles_within_budget(sources, monkeypatch):
+    monkeypatch.setattr(api, 'RECONCILE_SECONDS', 1.0)
+    sources(StubYahoo(delay=0.01), StubDCF(delay=0.05))
+    result = valuate('both')
+    assert result['source'] == 'yahoo'
+    assert result['details']['reconciliation'] == {'source': 'alpha_vantage', 'intrinsic_value': 200.0,
+                                                   'difference': pytest.approx(33.33)}
+
+
+def test_alpha_vantage_without_quote_has_no_upside(sources):
+    sources(StubYahoo(delay=0, quote=None), StubDCF(delay=0))
+    result = valuate('alpha_vantage')
+    assert result['current_price'] is None
+    assert result['upside'] is None and result['recommendation'] is None
@@ -0,0 +1,66 @@
+import pytest
+from llm_cache import LLMCache, quantize
+
+
+@pytest.fixture
+def analysis_data():
+    return {
+        'market_data': {'current_price': 410.25, 'shares_outstanding': 7.43e9},
+        'cash_flow': {
+            'free_cashflow': {'latest': 7.4e10, 'history': [7.4e10, 6.5e10], 'growth_rate': 12.3},
+            'quality': {'fcf_to_income': 95.0, 'debt_to_fcf': float('inf'), 'working_capital_change': 0}
+        },
+        'valuation': {'wacc': 9.1, 'suggested_multiple': 15.8}
+    }
+
+
+def test_quantize_groups_close_values():
+    assert quantize(100.0, 0.02) == quantize(100.4, 0.02)
+    assert quantize(100.0, 0.02) != quantize(110.0, 0.02)
+    assert quantize(0.0, 0.02) == 0.0
+
+
+def test_quantize_separates_reciprocals_and_signs():
+    for value in (0.5, 0.1, 0.02, 5.0):
+        assert quantize(value, 0.02) != quantize(1 / value, 0.02)
+        assert quantize(value, 0.02) != quantize(-value, 0.02)
+        assert quantize(-value, 0.02) != quantize(-1 / value, 0.02)
+
+
+def test_cache_key_differs_for_reciprocal_values(tmp_path, analysis_data):
+    cache = LLMCache(cache_dir=str(tmp_path), tolerance=0.02)
+    analysis_data['cash_flow']['quality']['debt_to_fcf'] = 0.1
+    key = cache.make_key('gpt-4o-mini', 'prompt', 0.17, 'MSFT', analysis_data)
+    analysis_data['cash_flow']['quality']['debt_to_fcf'] = 10.0
+    assert cache.make_key('gpt-4o-mini', 'prompt', 0.17, 'MSFT', analysis_data) != key
+    analysis_data['cash_flow']['quality']['debt_to_fcf'] = -0.1
+    assert cache.make_key('gpt-4o-mini', 'prompt', 0.17, 'MSFT', analysis_data) != key
+
+
+def test_cache_key_tolerates_small_price_moves(tmp_path, analysis_data):
+    cache = LLMCache(cache_dir=str(tmp_path), tolerance=0.02)
+    key = cache.make_key('gpt-4o-mini', 'prompt', 0.17, 'msft', analysis_data)
+
+    analysis_data['market_data']['current_price'] = 410.9
+    assert cache.make_key('gpt-4o-mini', 'prompt', 0.17, 'MSFT', analysis_data) == key
+
+    analysis_data['market_data']['current_price'] = 480.0
+    assert cache.make_key('gpt-4o-mini', 'prompt', 0.17, 'MSFT', analysis_data) != key
+    assert cache.make_key('gpt-4o', 'prompt', 0.17, 'MSFT', analysis_data) != key
+
+
+@pytest.mark.asyncio
+async def test_cache_roundtrip_and_size_cap(tmp_path):
+    cache = LLMCache(cache_dir=str(tmp_path), max_entries=2)
+    for key in ['a', 'b', 'c']:
+        await cache.set(key, f"analysis {key}")
+
+    assert await cache.get('c') == "analysis c"
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_ttl_expiry(tmp_path):
+    cache = LLMCache(cache_dir=str(tmp_path), ttl_hours=0)
+    await cache.set('a', "analysis")
+    assert await cache.get('a') is None
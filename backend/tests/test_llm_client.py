@@ -0,0 +1,124 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('openai')
+from llm_client import LLMClient
+
+COMPLETION = json.dumps({
+    'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': 0, 'model': 'gpt-4o-mini',
+    'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': 'ok'}}],
+}).encode('utf-8')
+
+
+class OpenAIStub(BaseHTTPRequestHandler):
+    """Answers every chat completion over keep-alive connections, counting the ones still open"""
+    protocol_version = 'HTTP/1.1'
+    open_connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with self.lock:
+            OpenAIStub.open_connections += 1
+
+    def finish(self):
+        super().finish()
+        with self.lock:
+            OpenAIStub.open_connections -= 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), OpenAIStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('OPENAI_BASE_URL', f"http://127.0.0.1:{server.server_port}/v1")
+    OpenAIStub.open_connections = 0
+    yield LLMClient(max_retries=0)
+    server.shutdown()
+    server.server_close()
+
+
+async def ask(llm):
+    response = await llm.chat(model='gpt-4o-mini', messages=[{'role': 'user', 'content': 'oi'}])
+    return response.choices[0].message.content
+
+
+def open_connections(expected, timeout=2.0):
+    """Wait for the server to see `expected` open connections"""
+    end = time.monotonic() + timeout
+    while OpenAIStub.open_connections != expected and time.monotonic() < end:
+        time.sleep(0.01)
+    return OpenAIStub.open_connections
+
+
+def test_close_releases_the_connections_of_the_running_loop(llm):
+    async def session():
+        assert await ask(llm) == 'ok'
+        assert open_connections(1) == 1  # Keep-alive
+        client = llm._bind()[0]
+        await llm.close()
+        return client
+
+    client = asyncio.run(session())
+    assert client.is_closed() and open_connections(0) == 0
+    assert len(llm._bound) == 0
+
+
+def test_each_loop_keeps_its_own_client_and_limit(llm):
+    """A loop in another thread keeps its client (and requests in flight) while other loops come and go"""
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever, daemon=True)
+    thread.start()
+
+    def on_other(coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, other).result(5)
+
+    async def bound():
+        return llm._bind()
+
+    try:
+        assert on_other(ask(llm)) == 'ok'
+        client, semaphore = on_other(bound())
+
+        async def main_thread():
+            assert await ask(llm) == 'ok'
+            mine = llm._bind()
+            await llm.close()
+            return mine
+        mine = asyncio.run(main_thread())
+        assert mine[0] is not client and mine[1] is not semaphore and mine[0].is_closed()
+
+        # O loop da outra thread continua com o mesmo cliente, aberto
+        assert on_other(bound()) == (client, semaphore) and not client.is_closed()
+        assert on_other(ask(llm)) == 'ok'
+        on_other(llm.close())
+        assert client.is_closed()
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join(5)
+        other.close()
+
+
+def test_explicit_concurrency_is_respected(monkeypatch):
+    monkeypatch.setenv('OPENAI_MAX_CONCURRENCY', '9')
+    assert LLMClient().max_concurrency == 9
+    assert LLMClient(max_concurrency=1).max_concurrency == 1
+    with pytest.raises(ValueError):
+        LLMClient(max_concurrency=0)
@@ -0,0 +1,36 @@
+import pytest
+from benchmarks.fixtures import load_fixtures
+from loadtest.archive import build_yahoo_archive
+from loadtest.report import StepResult, parse_mix, percentile
+from transport import REPLAY, Transport
+
+
+def test_parse_mix_normalizes_weights():
+    mix = dict(parse_mix("valuation=60,repeat=20,batch=20"))
+    assert mix == pytest.approx({'valuation': 0.6, 'repeat': 0.2, 'batch': 0.2})
+    with pytest.raises(ValueError):
+        parse_mix("valuation=1,unknown=1")
+
+
+def test_step_summary_percentiles():
+    assert percentile([], 0.5) is None
+    result = StepResult(target_rps=10, duration=2.0)
+    for ms in range(1, 101):
+        result.add('valuation', ms / 1000, ok=ms <= 95)
+    summary = result.summary('valuation')
+    assert summary['p50'] == pytest.approx(0.050)
+    assert summary['p99'] == pytest.approx(0.099)
+    assert summary['throughput'] == pytest.approx(50.0)
+    assert summary['error_rate'] == pytest.approx(0.05)
+
+
+def test_yahoo_archive_replays_every_synthetic_ticker(tmp_path):
+    path = str(tmp_path / 'yahoo.jsonl.gz')
+    tickers = build_yahoo_archive(path, 20, load_fixtures())
+    assert len(set(tickers)) == 20
+
+    transport = Transport(REPLAY, path, services=('yahoo',))
+    for ticker in tickers:
+        info = transport.replay_sync('yahoo', {'ticker': ticker, 'attribute': 'info'})
+        price = transport.replay_sync('yahoo', {'ticker': ticker, 'attribute': 'fast_info.last_price'})
+        assert info['value']['currentPrice'] == price
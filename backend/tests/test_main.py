@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('typer')
+import main
+
+
+def stock_data():
+    return {
+        'market_data': {'current_price': 100.0, 'shares_outstanding': 1e9},
+        'cash_flow': {
+            'free_cashflow': {'latest': 1e10, 'history': [1e10, 8e9], 'growth_rate': 16.0},
+            'quality': {'fcf_to_income': 95.0, 'debt_to_fcf': 1.5, 'working_capital_change': 0.0}
+        },
+        'valuation': {'wacc': 9.0, 'suggested_multiple': 15.0}
+    }
+
+
+class StubAnalyst:
+    def __init__(self):
+        self.started = False
+
+    async def stream_analysis(self, ticker, data):
+        self.started = True
+        await asyncio.sleep(0.01)
+        yield f"Análise de {ticker}"
+
+
+def test_ai_request_starts_before_the_metrics_are_rendered(monkeypatch):
+    analyst = StubAnalyst()
+    started_during_render = []
+    render_metrics = main.render_metrics
+
+    def render(ticker, data):
+        render_metrics(ticker, data)
+        started_during_render.append(analyst.started)
+    monkeypatch.setattr(main, 'render_metrics', render)
+
+    with main.console.capture() as capture:
+        asyncio.run(main.display_analysis('AAPL', stock_data(), stream=True, ai_mode='auto', analyst=analyst))
+    assert started_during_render == [True]
+    assert "Análise de AAPL" in capture.get()
+
+
+def test_no_ai_request_when_off(monkeypatch):
+    analyst = StubAnalyst()
+    with main.console.capture():
+        asyncio.run(main.display_analysis('AAPL', stock_data(), ai_mode='off', analyst=analyst))
+    assert not analyst.started
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+import ratings
+from batch import BatchRunner
+from benchmarks.fixtures import FixtureTicker, load_fixtures
+from market_params import FileSource, MarketParams
+
+
+class CountingSource(FileSource):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self.fail = False
+
+    def fetch(self):
+        self.calls += 1
+        if self.fail:
+            raise OSError("fonte indisponível")
+        return super().fetch()
+
+
+def test_country_params_from_the_local_file():
+    snapshot = MarketParams(FileSource()).snapshot()
+    us, br = snapshot.for_ticker('AAPL'), snapshot.for_ticker('petr4.sa')
+    assert (us.country, br.country) == ('US', 'BR')
+    assert us.risk_free_rate == pytest.approx(0.0425)
+    assert br.risk_free_rate > us.risk_free_rate and br.tax_rate == 0.34
+    assert us.rate(7.5) == pytest.approx((us.rate(5) + us.rate(10)) / 2)
+    assert snapshot.fx_rate('BRL', 'USD') == pytest.approx(0.18)
+    assert snapshot.fx_rate('BRL', 'XYZ') is None
+
+
+def test_fetched_once_per_interval_and_stale_on_failure(monkeypatch):
+    source = CountingSource()
+    params = MarketParams(source, refresh_seconds=60)
+    first = params.snapshot()
+    assert all(params.snapshot() is first for _ in range(100))
+    assert source.calls == 1
+
+    # Falha na atualização: mantém o último snapshot e não tenta de novo até o próximo intervalo
+    source.fail = True
+    monkeypatch.setattr('market_params.time.time', lambda: first.fetched_at + 61)
+    stale = params.snapshot()
+    assert stale.countries == first.countries and source.calls == 2
+    assert params.snapshot() is stale and source.calls == 2
+
+    assert MarketParams(source).snapshot().for_ticker('PETR4.SA').country == 'US'  # sem dados: premissas dos EUA
+
+
+def test_brazilian_wacc_uses_brazilian_rates():
+    from yahoo_finance import YahooFinanceAPI
+    market = MarketParams(FileSource()).snapshot()
+    stock = FixtureTicker('PETR4.SA', load_fixtures()['PETR4.SA'])
+    api = YahooFinanceAPI(max_workers=1)
+
+    br = api.calculate_wacc(stock, market)
+    stock.ticker = 'PETR4'
+    us = api.calculate_wacc(stock, market)
+    assert br > us
+    params = market.for_ticker('PETR4.SA')
+    assert br == pytest.approx(ratings.wacc(
+        1.18, *debt_and_interest(stock), stock.info['marketCap'],
+        params.risk_free_rate, params.equity_risk_premium, params.tax_rate
+    ))
+
+
+def debt_and_interest(stock):
+    balance = stock.balance_sheet
+    income = stock.income_stmt if not stock.income_stmt.empty else stock.financials
+    debt = sum(float(balance.loc[f].iloc[0]) for f in
+               ('Total Debt', 'Long Term Debt', 'Short Long Term Debt', 'Current Debt') if f in balance.index)
+    interest = sum(abs(float(income.loc[f].iloc[0])) for f in
+                   ('Interest Expense', 'Interest Expense Non Operating', 'Interest Expense Net') if f in income.index)
+    return debt, interest
+
+
+def test_batch_shares_one_snapshot(monkeypatch):
+    import market_params
+    source = CountingSource()
+    monkeypatch.setattr(market_params, '_market_params', MarketParams(source, refresh_seconds=0))
+    seen = []
+
+    class Source:
+        async def get_financials(self, ticker):
+            seen.append(market_params.get_market_params().snapshot())
+            await asyncio.sleep(0)
+            raise ValueError("sem dados")
+
+    class Writer:
+        def write(self, row):
+            pass
+
+    asyncio.run(BatchRunner(concurrency=4, yahoo=Source()).run([f"T{i}" for i in range(20)], Writer()))
+    assert len(seen) == 20 and all(s is seen[0] for s in seen)
+    assert source.calls == 1  # Mesmo com intervalo zero: o lote fixa um snapshot
@@ -0,0 +1,88 @@
+import pytest
+from metrics import Registry, DerivedGauge, classify_error
+
+
+def test_counter_and_gauge_render():
+    registry = Registry()
+    requests = registry.counter('app_requests', 'Requests', ('upstream', 'outcome'))
+    in_flight = registry.gauge('app_in_flight', 'In flight')
+    requests.inc(upstream='yahoo', outcome='ok')
+    requests.inc(2, upstream='yahoo', outcome='ok')
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+
+    text = registry.render()
+    assert '# TYPE app_requests counter' in text
+    assert 'app_requests_total{upstream="yahoo",outcome="ok"} 3' in text
+    assert 'app_in_flight 1' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram('app_latency_seconds', 'Latency', ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        latency.observe(value, stage='wacc')
+
+    text = registry.render()
+    assert 'app_latency_seconds_bucket{stage="wacc",le="0.1"} 1' in text
+    assert 'app_latency_seconds_bucket{stage="wacc",le="1"} 3' in text
+    assert 'app_latency_seconds_bucket{stage="wacc",le="+Inf"} 4' in text
+    assert 'app_latency_seconds_count{stage="wacc"} 4' in text
+    assert 'app_latency_seconds_sum{stage="wacc"} 4.25' in text
+
+
+def test_label_values_are_escaped_and_checked():
+    registry = Registry()
+    counter = registry.counter('app_errors', 'Errors', ('reason',))
+    counter.inc(reason='bad "quote"\n')
+    assert 'reason="bad \\"quote\\"\\n"' in registry.render()
+
+    with pytest.raises(ValueError):
+        counter.inc(other='x')
+    with pytest.raises(ValueError):
+        registry.counter('app_errors', 'Duplicate')
+
+
+def test_derived_gauge():
+    registry = Registry()
+    registry.register(DerivedGauge('app_ratio', 'Ratio', ('tier',), lambda: [({'tier': 'llm'}, 0.75)]))
+    assert 'app_ratio{tier="llm"} 0.75' in registry.render()
+
+
+def test_classify_error():
+    class RateLimitError(Exception):
+        pass
+
+    assert classify_error(RateLimitError('slow down')) == 'throttled'
+    assert classify_error(ValueError('API rate limit exceeded')) == 'throttled'
+    assert classify_error(ValueError('API request failed with status 429')) == 'throttled'
+    assert classify_error(ValueError('No cash flow data available')) == 'error'
+
+
+def test_background_writes_count_as_pending_until_done(monkeypatch):
+    pytest.importorskip('fastapi')
+    pytest.importorskip('motor')
+    import asyncio
+    import api
+    import metrics
+
+    async def run():
+        acknowledged = asyncio.Event()
+
+        async def store_valuation(valuation):
+            await acknowledged.wait()
+            return True
+        monkeypatch.setattr(api.Database, 'store_valuation', store_valuation)
+
+        before = metrics.MONGO_PENDING_WRITES.value()
+        api._store_in_background({'ticker': 'AAPL'})
+        api._store_in_background({'ticker': 'MSFT'})
+        # Contadas assim que enfileiradas, antes de a tarefa rodar
+        queued = metrics.MONGO_PENDING_WRITES.value() - before
+        acknowledged.set()
+        await asyncio.gather(*api._pending_writes)
+        await asyncio.sleep(0)
+        return queued, metrics.MONGO_PENDING_WRITES.value() - before, len(api._pending_writes)
+
+    assert asyncio.run(run()) == (2, 0, 0)
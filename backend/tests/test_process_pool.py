@@ -0,0 +1,52 @@
+import asyncio
+from unittest import mock
+
+import pytest
+
+pytest.importorskip('yfinance')
+from benchmarks.fixtures import FixtureTicker, load_fixtures, universe
+from yahoo_finance import YahooFinanceAPI, _pack_frame, _unpack_frame
+
+
+def stocks(size):
+    fixtures = load_fixtures()
+    return {name: FixtureTicker(name, fixture, scale) for name, fixture, scale in universe(size, fixtures)}
+
+
+async def fetch_all(api, tickers):
+    return await asyncio.gather(*(api.get_snapshot(t) for t in tickers), return_exceptions=True)
+
+
+def test_packed_statement_keeps_labels_and_period_order():
+    frame = next(iter(stocks(1).values())).cashflow
+    labels, values = _pack_frame(frame)
+    assert values.dtype == 'float64' and values.shape == frame.shape
+    unpacked = _unpack_frame((labels, values))
+    assert list(unpacked.index) == list(frame.index)
+    assert unpacked.iloc[:, 0].tolist() == pytest.approx(frame.iloc[:, 0].tolist(), nan_ok=True)
+
+
+def test_processes_match_threads():
+    universe_stocks = stocks(12)
+    broken = FixtureTicker('BROKEN', load_fixtures()['AAPL'])
+    broken.cashflow = broken.quarterly_cashflow = broken.cashflow.iloc[0:0]
+    universe_stocks['BROKEN'] = broken
+    tickers = list(universe_stocks)
+
+    threads = YahooFinanceAPI(max_workers=2)
+    processes = YahooFinanceAPI(max_workers=2, processes=2, chunk_size=5)
+    try:
+        with mock.patch('yahoo_finance.yf.Ticker', side_effect=lambda ticker: universe_stocks[ticker]):
+            expected = asyncio.run(fetch_all(threads, tickers))
+            results = asyncio.run(fetch_all(processes, tickers))
+    finally:
+        processes.close()
+
+    for ticker, want, got in zip(tickers, expected, results):
+        if ticker == 'BROKEN':
+            assert isinstance(want, Exception) and isinstance(got, Exception)
+            assert 'No cash flow data available' in str(got)
+        else:
+            assert got == want
+    # Vários tickers por ida e volta aos processos
+    assert processes._pool.chunks < len(tickers)
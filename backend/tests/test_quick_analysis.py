@@ -0,0 +1,42 @@
+import pytest
+import ratings
+from quick_analysis import build_summary
+
+
+@pytest.fixture
+def stock_data():
+    return {
+        'market_data': {'current_price': 100.0, 'shares_outstanding': 1e9},
+        'cash_flow': {
+            'free_cashflow': {'latest': 1e10, 'history': [1e10, 8e9], 'growth_rate': 16.0},
+            'quality': {'fcf_to_income': 95.0, 'debt_to_fcf': 1.5, 'working_capital_change': 0.0}
+        },
+        'valuation': {'wacc': 9.0, 'suggested_multiple': 15.0}
+    }
+
+
+def test_rating_bands():
+    assert ratings.growth_rating(25) == 'Excellent'
+    assert ratings.growth_rating(5) == 'Low'
+    assert ratings.recommendation(21) == 'Strong Buy'
+    assert ratings.recommendation(0) == 'Hold'
+    assert ratings.recommendation(-20) == 'Strong Sell'
+
+
+def test_summary_is_deterministic(stock_data):
+    summary = build_summary('TEST', stock_data)
+
+    assert summary['fair_value'] == pytest.approx(150.0)
+    assert summary['upside'] == pytest.approx(50.0)
+    assert summary['recommendation'] == 'Strong Buy'
+    assert summary['growth_rating'] == 'Very Good'
+    assert summary['quality_score'] == 5
+    assert summary['quality_rating'] == 'High Quality'
+    assert summary == build_summary('TEST', stock_data)
+
+
+def test_summary_flags_weak_quality(stock_data):
+    stock_data['cash_flow']['quality'].update(fcf_to_income=50.0, debt_to_fcf=8.0)
+    summary = build_summary('TEST', stock_data)
+    assert summary['quality_rating'] == 'Low Quality'
+    assert 'Atenção' in summary['narrative']
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytest
+
+import resilience
+from resilience import AdaptiveLimiter, CircuitBreaker, CircuitOpenError, Upstream
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+def test_aimd_grows_on_success_and_halves_once_per_burst():
+    limiter = AdaptiveLimiter(initial=4, maximum=8, cooldown=60)
+    for _ in range(4):
+        limiter.acquire_sync()
+        limiter.release(0.01)
+    assert limiter.limit == pytest.approx(5.0, abs=0.1)  # ~+1 por janela de `limit` respostas
+
+    for _ in range(3):
+        limiter.acquire_sync()
+        limiter.release(0.01, Throttled())
+    assert limiter.limit == pytest.approx(2.5, abs=0.1)  # Uma rajada de 429 reduz uma vez só
+
+    # Muito mais lento que o normal também conta como sobrecarga (passado o cooldown)
+    limiter.cooldown = 0
+    limiter.acquire_sync()
+    limiter.release(1.0)
+    assert limiter.limit == pytest.approx(1.25, abs=0.1)
+
+
+def test_breaker_opens_probes_and_closes(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, 'monotonic', lambda: now[0])
+    upstream = Upstream('test', AdaptiveLimiter(initial=4), CircuitBreaker(failure_threshold=3, reset_timeout=30))
+
+    def fail():
+        raise ConnectionError("connection reset")
+
+    # Ticker inexistente é uma resposta válida: não abre o circuito
+    for _ in range(5):
+        with pytest.raises(KeyError):
+            upstream.call_sync(lambda: {}['AAAA'])
+    assert upstream.breaker.state == resilience.CLOSED
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            upstream.call_sync(fail)
+    assert upstream.breaker.state == resilience.OPEN and not upstream.available()
+    with pytest.raises(CircuitOpenError):
+        upstream.call_sync(lambda: 'não deveria ser chamado')
+
+    # Passado o timeout, uma sonda; se falhar, o circuito reabre com o dobro do tempo
+    now[0] += 31
+    with pytest.raises(ConnectionError):
+        upstream.call_sync(fail)
+    assert upstream.breaker.state == resilience.OPEN and upstream.breaker.retry_in() == pytest.approx(60)
+
+    now[0] += 61
+    assert upstream.call_sync(lambda: 'ok') == 'ok'
+    assert upstream.breaker.state == resilience.CLOSED and upstream.limiter.in_flight == 0
+
+
+def test_throughput_tracks_upstream_capacity():
+    """20 callers against an upstream that answers 429 above 6 concurrent requests"""
+    capacity = 6
+    state = {'in_flight': 0, 'peak': 0, 'ok': 0, 'throttled': 0}
+    upstream = Upstream('sim', AdaptiveLimiter(initial=2, maximum=32, cooldown=0.02),
+                        CircuitBreaker(failure_threshold=1000))
+
+    async def request():
+        state['in_flight'] += 1
+        state['peak'] = max(state['peak'], state['in_flight'])
+        try:
+            if state['in_flight'] > capacity:
+                raise Throttled("429 Too Many Requests")
+            await asyncio.sleep(0.002)
+        finally:
+            state['in_flight'] -= 1
+
+    async def caller():
+        for _ in range(25):
+            try:
+                await upstream.call(request)
+                state['ok'] += 1
+            except Throttled:
+                state['throttled'] += 1
+
+    async def run():
+        await asyncio.wait_for(asyncio.gather(*(caller() for _ in range(20))), 30)
+
+    asyncio.run(run())
+    assert state['ok'] + state['throttled'] == 500
+    assert state['throttled'] < 0.1 * 500  # Sem tempestade de 429
+    assert state['peak'] <= 2 * capacity
+    assert 1 <= upstream.limiter.limit <= 2 * capacity
+
+
+def test_yahoo_serves_last_good_snapshot_while_open(monkeypatch):
+    pytest.importorskip('yfinance')
+    from benchmarks.fixtures import FixtureTicker, load_fixtures
+    from yahoo_finance import YahooFinanceAPI
+
+    stock = FixtureTicker('AAPL', load_fixtures()['AAPL'])
+    upstream = resilience.configure('yahoo', breaker=CircuitBreaker(failure_threshold=1, reset_timeout=60))
+    api = YahooFinanceAPI(max_workers=1)
+    try:
+        with mock.patch('yahoo_finance.yf.Ticker', return_value=stock):
+            fresh = asyncio.run(api.get_snapshot('AAPL'))
+            upstream.breaker.record(ConnectionError("down"))
+            assert asyncio.run(api.get_snapshot('AAPL')) is fresh
+            with pytest.raises(Exception, match='indisponível'):
+                asyncio.run(api.get_snapshot('MSFT'))
+    finally:
+        resilience.configure('yahoo')
+
+
+def test_alpha_vantage_serves_expired_cache_when_throttled(tmp_path):
+    pytest.importorskip('aiohttp')
+    from dcf_model import DCFModel
+
+    model = DCFModel(api_key='test')
+    model.cache_dir = str(tmp_path)
+    cached = {'market_data': {'shares_outstanding': 1.0}}
+    with open(os.path.join(str(tmp_path), 'aapl.json'), 'w') as f:
+        json.dump({'cache_timestamp': (datetime.now() - timedelta(days=3)).isoformat(), 'data': cached}, f)
+
+    async def throttled(params):
+        raise ValueError("API rate limit exceeded")
+    model._request = throttled
+    resilience.configure('alpha_vantage')
+    try:
+        assert asyncio.run(model.fetch_financials('AAPL')) == cached
+        with pytest.raises(ValueError):
+            asyncio.run(model.fetch_financials('MSFT'))
+    finally:
+        resilience.configure('alpha_vantage')
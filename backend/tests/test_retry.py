@@ -0,0 +1,287 @@
+import asyncio
+import contextvars
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import retry
+from resilience import CircuitOpenError
+from retry import DeadlineExceeded, RetryPolicy
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+def flaky(failures, error=ConnectionError("connection reset"), result='ok'):
+    calls = []
+
+    def fetch():
+        calls.append(time.monotonic())
+        if len(calls) <= failures:
+            raise error
+        return result
+    return fetch, calls
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = RetryPolicy('test', base_delay=0.1, max_delay=1.0, rng=random.Random(7))
+    delays = [[policy.backoff(attempt) for _ in range(200)] for attempt in range(6)]
+    for attempt, values in enumerate(delays):
+        assert all(0 <= d <= min(1.0, 0.1 * 2 ** attempt) for d in values)
+        assert len(set(values)) > 100  # Jitter: sem rajadas sincronizadas
+    assert max(delays[5]) > 0.9
+
+
+def test_retries_only_transient_errors():
+    policy = RetryPolicy('test', attempts=3, base_delay=0.001)
+    fetch, calls = flaky(2)
+    assert policy.call_sync(fetch) == 'ok' and len(calls) == 3
+
+    for error in (ValueError("Invalid API call"), CircuitOpenError("aberto")):
+        fetch, calls = flaky(5, error)
+        with pytest.raises(type(error)):
+            policy.call_sync(fetch)
+        assert len(calls) == 1
+
+    fetch, calls = flaky(5)
+    with pytest.raises(ConnectionError):
+        policy.call_sync(fetch)
+    assert len(calls) == 3
+
+    # Alpha Vantage: 429 não é repetido (a cota é por minuto)
+    fetch, calls = flaky(5, Throttled("API rate limit exceeded"))
+    with pytest.raises(Throttled):
+        RetryPolicy('test', base_delay=0.001, retry_throttled=False).call_sync(fetch)
+    assert len(calls) == 1
+
+
+def test_no_retry_starts_that_cannot_finish_before_the_deadline():
+    policy = RetryPolicy('test', attempts=10, base_delay=0.05, max_delay=0.05)
+
+    def slow_failure():
+        time.sleep(0.04)
+        raise TimeoutError("timed out")
+
+    start = time.monotonic()
+    with retry.deadline(0.2):
+        with pytest.raises(TimeoutError):
+            policy.call_sync(slow_failure)
+    # Cada tentativa leva 0.04s: parar antes do prazo em vez de começar uma que o estoura
+    assert time.monotonic() - start < 0.25
+
+    async def hangs():
+        await asyncio.sleep(5)
+
+    async def run():
+        with retry.deadline(0.05):
+            await policy.call(hangs)
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run())
+    assert time.monotonic() - start < 0.5
+
+
+def test_deadline_nests_and_follows_into_threads():
+    assert retry.remaining() is None
+    with retry.deadline(10):
+        with retry.deadline(60):
+            assert retry.remaining() <= 10  # O prazo mais curto vale
+        with ThreadPoolExecutor(1) as executor:
+            left = executor.submit(contextvars.copy_context().run, retry.remaining).result()
+        assert 0 < left <= 10
+    assert retry.remaining() is None
+
+
+def test_hedge_returns_the_first_copy_and_cancels_the_other():
+    started = []
+
+    async def fetch():
+        started.append(len(started))
+        # Só a primeira cópia fica presa na cauda lenta
+        await asyncio.sleep(5 if len(started) == 1 else 0.01)
+        return len(started)
+
+    async def run():
+        start = time.monotonic()
+        result = await retry.hedged(fetch, 0.05)
+        return result, time.monotonic() - start
+
+    result, elapsed = asyncio.run(run())
+    assert len(started) == 2 and elapsed < 1
+
+    # Sem lentidão, nenhuma cópia extra
+    started.clear()
+
+    async def fast():
+        started.append(1)
+        return 'ok'
+    assert asyncio.run(retry.hedged(fast, 0.05)) == 'ok' and len(started) == 1
+
+
+def test_hedge_cancels_every_copy_when_the_caller_is_cancelled():
+    started, cancelled = [], []
+
+    async def fetch():
+        started.append(1)
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def cancel_after(delay, after):
+        task = asyncio.ensure_future(retry.hedged(fetch, after))
+        await asyncio.sleep(delay)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Nada fica pendurado depois que o chamador desiste
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    # Ainda esperando a primeira cópia
+    assert asyncio.run(cancel_after(0.01, 0.05)) == []
+    assert (len(started), len(cancelled)) == (1, 1)
+
+    # Com as duas cópias em andamento
+    started.clear()
+    cancelled.clear()
+    assert asyncio.run(cancel_after(0.1, 0.05)) == []
+    assert (len(started), len(cancelled)) == (2, 2)
+
+
+def test_abandoned_thread_stops_before_the_next_attempt():
+    calls = []
+    policy = RetryPolicy('yahoo', attempts=5, base_delay=60, max_delay=60)
+
+    def work():
+        # Cada consulta falha e a política esperaria 60 s antes de repetir
+        return policy.call_sync(lambda: calls.append(1) or (_ for _ in ()).throw(ConnectionError("reset")))
+
+    async def run(executor):
+        task = asyncio.ensure_future(retry.run_in_thread(executor, work))
+        while not calls:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    with ThreadPoolExecutor(1) as executor:
+        asyncio.run(run(executor))
+        future = executor.submit(lambda: None)
+        start = time.monotonic()
+        future.result(5)  # A thread foi liberada sem esperar o backoff
+    assert time.monotonic() - start < 1 and calls == [1]
+
+
+def test_losing_yahoo_copy_skips_the_remaining_statements():
+    pytest.importorskip('yfinance')
+    import threading
+    from unittest import mock
+    from benchmarks.fixtures import FixtureTicker, load_fixtures
+    from yahoo_finance import YahooFinanceAPI
+
+    release = threading.Event()
+    accessed = []
+
+    class SlowTicker(FixtureTicker):
+        """The first copy hangs on info until released; every attribute read is recorded by copy"""
+        copies = 0
+
+        def __init__(self, *args):
+            self.copy = None
+            super().__init__(*args)
+            SlowTicker.copies += 1
+            self.copy = SlowTicker.copies
+
+        def __getattribute__(self, name):
+            if name in ('info', 'income_stmt', 'balance_sheet', 'cashflow') and self.copy is not None:
+                accessed.append((self.copy, name))
+                if name == 'info' and self.copy == 1:
+                    release.wait(5)
+            return super().__getattribute__(name)
+
+    fixture = load_fixtures()['AAPL']
+    api = YahooFinanceAPI(max_workers=2, hedge_after=0.05)
+    with mock.patch('yahoo_finance.yf.Ticker', side_effect=lambda ticker: SlowTicker(ticker, fixture)):
+        snapshot = asyncio.run(api.get_snapshot('AAPL'))
+        release.set()
+        api._executor.shutdown(wait=True)
+
+    assert snapshot.ticker == 'AAPL'
+    assert {name for copy, name in accessed if copy == 2} == {'info', 'income_stmt', 'balance_sheet', 'cashflow'}
+    # A cópia perdedora termina a consulta em andamento e não faz mais nenhuma
+    assert [name for copy, name in accessed if copy == 1] == ['info']
+
+
+def test_alpha_vantage_retries_each_endpoint_with_backoff(tmp_path):
+    pytest.importorskip('aiohttp')
+    import resilience
+    from benchmarks.fixtures import alpha_vantage_payloads, load_fixtures
+    from dcf_model import DCFModel
+
+    fixture = next(f for f in load_fixtures().values() if f.get('alpha_vantage'))
+    payloads = alpha_vantage_payloads(fixture)
+    model = DCFModel(api_key='test')
+    model.cache_dir = str(tmp_path)
+    calls = []
+
+    async def request(params):
+        calls.append(params['function'])
+        if calls.count(params['function']) == 1:
+            raise asyncio.TimeoutError()
+        return payloads[params['function']]
+    model._request = request
+
+    resilience.configure('alpha_vantage')
+    retry.configure('alpha_vantage', RetryPolicy('alpha_vantage', base_delay=0.001, retry_throttled=False))
+    try:
+        result = asyncio.run(model.fetch_financials('AAPL'))
+    finally:
+        retry.configure('alpha_vantage')
+        resilience.configure('alpha_vantage')
+    assert result['market_data']['shares_outstanding'] > 0
+    assert sorted(calls) == sorted(['CASH_FLOW', 'INCOME_STATEMENT', 'OVERVIEW'] * 2)
+
+
+def test_race_returns_first_valid_source_and_cancels_the_rest():
+    cancelled = []
+
+    def source(value, delay, error=None):
+        async def fetch():
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(value)
+                raise
+            if error:
+                raise error
+            return {'intrinsic_value': value}
+        return fetch
+
+    def valid(result):
+        return result['intrinsic_value'] > 0
+
+    async def run(grace=0.0, **sources):
+        start = time.monotonic()
+        result = await retry.race(sources, validate=valid, grace=grace)
+        return result, time.monotonic() - start
+
+    # O provedor lento (ou limitado) não segura a resposta e sai cancelado
+    (name, result, others), elapsed = asyncio.run(run(alpha_vantage=source(100, 5), yahoo=source(90, 0.01)))
+    assert (name, result, others) == ('yahoo', {'intrinsic_value': 90}, {}) and elapsed < 1
+    assert cancelled == [100]
+
+    # Resultado inválido não vence: espera a outra fonte
+    (name, result, _), _ = asyncio.run(run(alpha_vantage=source(100, 0.05), yahoo=source(-3, 0.01)))
+    assert name == 'alpha_vantage'
+
+    # Com folga, a fonte mais lenta ainda chega para reconciliar
+    (name, _, others), _ = asyncio.run(run(0.5, alpha_vantage=source(100, 0.05), yahoo=source(90, 0.01)))
+    assert name == 'yahoo' and others == {'alpha_vantage': {'intrinsic_value': 100}}
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(run(alpha_vantage=source(1, 0.02, ConnectionError("down")),
+                        yahoo=source(1, 0.01, ValueError("Invalid ticker"))))
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+import ratings
+from market_params import MarketSnapshot
+from screener import QueryError, Screener, parse, score
+from snapshot import FinancialSnapshot
+
+
+def inputs(**columns):
+    base = dict(
+        ticker=np.array(['AAA', 'BBB', 'CCC'], dtype=object),
+        price=np.array([50.0, 20.0, 10.0]),
+        shares_outstanding=np.array([1e6, 1e6, 1e6]),
+        market_cap=np.array([5e7, 2e7, 1e7]),
+        beta=np.array([1.0, 1.3, np.nan]),
+        net_income=np.array([5e6, 2e6, 1e6]),
+        interest_expense=np.array([1e5, 4e5, 0.0]),
+        total_debt=np.array([2e6, 1.5e7, 0.0]),
+        free_cash_flow=np.array([5e6, 1.2e6, -1e5]),
+        operating_cash_flow=np.array([6e6, 2e6, 1e5]),
+        capital_expenditure=np.array([-1e6, -8e5, -2e5]),
+        working_capital_change=np.array([1.0, -5.0, np.nan]),
+        fcf_growth_rate=np.array([18.0, 7.0, 0.0]),
+    )
+    base.update(columns)
+    return base
+
+
+def test_score_matches_per_ticker_rules():
+    table = score(inputs())
+    for i in range(3):
+        quality = {name: float(table[name][i]) for name in ('fcf_to_income', 'debt_to_fcf', 'working_capital_change')}
+        assert table['quality_score'][i] == ratings.fcf_quality_score(quality)
+        assert table['quality_rating'][i] == ratings.fcf_quality_rating(quality)
+        assert table['growth_rating'][i] == ratings.growth_rating(table['fcf_growth_rate'][i])
+        snap = FinancialSnapshot(
+            ticker=table['ticker'][i], current_price=table['price'][i], shares_outstanding=1e6,
+            fcf_history=FinancialSnapshot.history([table['free_cash_flow'][i]]), growth_rate=0.0,
+            wacc=0.0, suggested_multiple=table['suggested_multiple'][i], **quality,
+        )
+        assert table['upside'][i] == pytest.approx(ratings.valuation(snap)['upside'])
+        assert table['recommendation'][i] == ratings.recommendation(table['upside'][i])
+    equity_weight = 5e7 / (5e7 + 2e6)
+    assert table['wacc'][0] == pytest.approx((0.1025 * equity_weight + 0.05 * 0.79 * (1 - equity_weight)) * 100)
+    assert table['wacc'][2] == pytest.approx(10.25)  # Sem beta: 1.0; sem dívida: só capital próprio
+
+
+def test_parse_query():
+    query = parse("fcf_to_income > 90 and (debt_to_fcf < 3 or recommendation = 'Buy') order by upside desc, ticker limit 5")
+    assert query.order_by == [('upside', True), ('ticker', False)]
+    assert query.limit == 5
+    assert query.columns == ['fcf_to_income', 'debt_to_fcf', 'recommendation', 'upside', 'ticker']
+    assert parse('').where is None
+
+    for bad in ("price >", "__import__('os') > 1", "price > 1 limit -2", "unknown > 1", "price > 1; drop"):
+        with pytest.raises(QueryError):
+            parse(bad)
+
+
+def test_screen_filters_and_ranks(monkeypatch):
+    screener = Screener()
+    monkeypatch.setattr(screener, 'table', lambda: score(inputs()))
+    rows = screener.screen("upside > -100 order by upside desc")
+    assert [r['ticker'] for r in rows] == ['AAA', 'BBB', 'CCC'][:len(rows)]
+    assert all(a['upside'] >= b['upside'] for a, b in zip(rows, rows[1:]))
+
+    assert [r['ticker'] for r in screener.screen("ticker in ('CCC', 'AAA') order by ticker desc")] == ['CCC', 'AAA']
+    assert [r['ticker'] for r in screener.screen("not ticker in ('AAA')", limit=1)] == ['BBB']
+
+    # Sem lucro, as métricas de qualidade caem nos valores de erro; inf vira None no resultado
+    monkeypatch.setattr(screener, 'table', lambda: score(inputs(net_income=np.array([5e6, np.nan, 1e6]))))
+    row = screener.screen("ticker = 'BBB'")[0]
+    assert row['fcf_to_income'] == 0.0 and row['debt_to_fcf'] is None
+    with pytest.raises(QueryError):
+        screener.screen("recommendation > 'Buy'")
+
+
+def test_statements_in_another_currency_are_converted():
+    """AAA reports in BRL and is quoted in USD: same valuation as the USD figures"""
+    market = MarketSnapshot.from_dict({'countries': {
+        'US': {'currency': 'USD', 'curve': {'10': 0.0425}, 'equity_risk_premium': 0.06, 'tax_rate': 0.21},
+    }, 'fx': {'USD': 1.0, 'BRL': 0.2}})
+    base = inputs()
+    in_brl = np.array([1 / 0.2, 1.0, 1.0])
+    reported = inputs(**{
+        name: base[name] * in_brl for name in (
+            'net_income', 'interest_expense', 'total_debt', 'free_cash_flow', 'operating_cash_flow',
+            'capital_expenditure',
+        )
+    }, currency=np.array(['USD', 'USD', 'USD'], dtype=object),
+        financial_currency=np.array(['BRL', 'USD', None], dtype=object))
+
+    expected, converted = score(base, market), score(reported, market)
+    for name in ('wacc', 'fcf_per_share', 'fair_value', 'upside', 'fcf_to_income', 'debt_to_fcf'):
+        np.testing.assert_allclose(converted[name], expected[name])
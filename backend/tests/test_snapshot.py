@@ -0,0 +1,43 @@
+import sys
+from array import array
+
+import pytest
+import quick_analysis
+import ratings
+from snapshot import FinancialSnapshot, as_dict
+
+
+def make_snapshot(**overrides):
+    values = dict(
+        ticker='MSFT', current_price=410.0, shares_outstanding=7.43e9,
+        fcf_history=FinancialSnapshot.history([74.1e9, 59.5e9, 65.1e9, 56.1e9]),
+        growth_rate=9.7, fcf_to_income=102.5, debt_to_fcf=1.3, working_capital_change=-1.2e9,
+        wacc=9.1, suggested_multiple=12.0,
+    )
+    values.update(overrides)
+    return FinancialSnapshot(**values)
+
+
+def test_round_trip_through_dict_layout():
+    snap = make_snapshot()
+    data = snap.as_dict()
+    assert data['cash_flow']['free_cashflow']['latest'] == 74.1e9
+    assert data['cash_flow']['free_cashflow']['history'] == [74.1e9, 59.5e9, 65.1e9, 56.1e9]
+    assert data['valuation'] == {'wacc': 9.1, 'suggested_multiple': 12.0}
+    assert FinancialSnapshot.from_dict('MSFT', data) == snap
+    assert as_dict(data) is data
+
+
+def test_consumers_accept_snapshots():
+    snap = make_snapshot()
+    assert ratings.valuation(snap) == pytest.approx(ratings.valuation(snap.as_dict()))
+    assert quick_analysis.build_summary('MSFT', snap) == quick_analysis.build_summary('MSFT', snap.as_dict())
+
+
+def test_snapshot_is_compact():
+    snap = make_snapshot()
+    assert not hasattr(snap, '__dict__')
+    assert isinstance(snap.fcf_history, array)
+    size = sys.getsizeof(snap) + sys.getsizeof(snap.fcf_history)
+    # Milhares de tickers cabem em poucos megabytes
+    assert size < 400
@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import startup
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Saída de `python -X importtime -c "import main"` (recortada)
+IMPORTTIME_SAMPLE = """\
+import time: self [us] | cumulative | imported package
+import time:       257 |        257 |   _io
+import time:       535 |       1428 | _frozen_importlib_external
+import time:      1012 |       1012 |     typing
+import time:       780 |      40064 | site
+import time:
+import time:      2210 |       3222 |   daemon_client
+import time:      4190 |     179882 | main
+Traceback (most recent call last):
+"""
+
+
+def test_parse_importtime_sorts_by_cumulative_time():
+    entries = startup.parse_importtime(IMPORTTIME_SAMPLE)
+    assert [name.strip() for name, _ in entries] == [
+        'main', 'site', 'daemon_client', '_frozen_importlib_external', 'typing', '_io'
+    ]
+    assert entries[0] == (' main', 179.882)
+    # A indentação fica: só os módulos de primeiro nível começam com um espaço
+    assert dict(entries)['   daemon_client'] == 3.222
+    assert startup.parse_importtime('') == []
+
+
+def test_cli_import_leaves_heavy_dependencies_unloaded():
+    pytest.importorskip('typer')
+    code = "import main, sys; print(','.join(m for m in ('pandas', 'yfinance', 'openai') if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=BACKEND)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ''
+
+
+def test_measure_startup_reports_the_main_import():
+    pytest.importorskip('typer')
+    report = startup.measure_startup('main')
+    assert report['heavy_loaded'] == []
+    assert 0 < report['import_ms'] <= report['process_ms']
+    assert 'main' in [name for name, _ in report['top']]
+    assert all(not name.startswith(' ') for name, _ in report['top'])
+
+    with pytest.raises(RuntimeError, match="Falha ao importar"):
+        startup.measure_startup('modulo_que_nao_existe')
@@ -0,0 +1,32 @@
+from symbol_directory import SymbolDirectory, normalize
+
+ROWS = [
+    {'ticker': 'PETR4.SA', 'market': 'BR', 'name': 'Petróleo Brasileiro S.A. - Petrobras', 'aliases': 'Petrobras'},
+    {'ticker': 'PETR3.SA', 'market': 'BR', 'name': 'Petróleo Brasileiro S.A. - Petrobras', 'aliases': 'Petrobras'},
+    {'ticker': 'PRIO3.SA', 'market': 'BR', 'name': 'PRIO S.A.', 'aliases': 'PetroRio'},
+    {'ticker': 'MSFT', 'market': 'US', 'name': 'Microsoft Corporation', 'aliases': 'Microsoft'},
+    {'ticker': 'MU', 'market': 'US', 'name': 'Micron Technology Inc.', 'aliases': 'Micron'},
+]
+
+
+def test_normalize_strips_accents_and_suffixes():
+    assert normalize('Petróleo Brasileiro S.A.') == 'petroleo brasileiro'
+    assert normalize('The Coca-Cola Company') == 'coca cola'
+
+
+def test_exact_and_fuzzy_names_resolve_locally():
+    directory = SymbolDirectory(ROWS)
+
+    info = directory.lookup('Petrobras')
+    assert info['ticker_principal'] == 'PETR4.SA'
+    assert info['mercado'] == 'BR'
+    assert 'PETR3.SA' in info['nota']
+
+    assert directory.lookup('microsof')['ticker_principal'] == 'MSFT'
+    assert directory.search('MSFT')[0].ticker == 'MSFT'
+
+
+def test_low_confidence_or_ambiguous_queries_fall_back():
+    directory = SymbolDirectory(ROWS)
+    assert directory.lookup('xyz holdings') is None
+    assert directory.lookup('petro') is None
@@ -0,0 +1,120 @@
+import asyncio
+import contextvars
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import tracing
+from tracing import NULL_SPAN, span
+
+
+@pytest.fixture
+def records(monkeypatch):
+    """Tracing on, with every finished span collected; global state restored afterwards"""
+    monkeypatch.setattr(tracing, '_listeners', [])
+    monkeypatch.setattr(tracing, '_enabled', False)
+    monkeypatch.setattr(tracing, '_sink', None)
+    collected = []
+    tracing.add_listener(collected.append)
+    yield collected
+    tracing.configure('off')
+
+
+def test_null_span_when_tracing_is_off(monkeypatch):
+    monkeypatch.setattr(tracing, '_listeners', [])
+    monkeypatch.setattr(tracing, '_sink', None)
+    tracing.configure('off')
+    assert not tracing.enabled()
+
+    # Sempre o mesmo objeto: nada é alocado nem registrado
+    assert span('fetch', ticker='AAPL') is NULL_SPAN
+    with span('fetch') as current:
+        current.set(rows=3)
+        assert tracing._current_span.get() is None
+    with pytest.raises(ValueError):
+        with span('fetch'):
+            raise ValueError("não engolido")
+
+
+def test_spans_nest_and_record_errors(records):
+    with span('analysis', ticker='AAPL') as outer:
+        with span('wacc'):
+            pass
+        outer.set(source='yahoo')
+    with pytest.raises(KeyError):
+        with span('broken'):
+            raise KeyError('beta')
+
+    wacc, analysis, broken = records
+    assert (wacc['name'], wacc['parent']) == ('wacc', 'analysis')
+    assert analysis['parent'] is None and analysis['attrs'] == {'ticker': 'AAPL', 'source': 'yahoo'}
+    assert analysis['start_us'] <= wacc['start_us']
+    assert analysis['duration_us'] >= wacc['duration_us']
+    assert broken['attrs']['error'] == "KeyError: 'beta'"
+    assert tracing._current_span.get() is None
+
+
+def test_spans_follow_copy_context_into_executor_threads(records):
+    def work(name):
+        with span(name):
+            return threading.get_ident()
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(2) as executor:
+            with span('get_financials'):
+                tids = await asyncio.gather(*[
+                    loop.run_in_executor(executor, contextvars.copy_context().run, work, f"statement.{i}")
+                    for i in range(4)
+                ])
+                # Sem copiar o contexto a thread não vê o span aberto
+                await loop.run_in_executor(executor, work, 'orphan')
+        return tids
+
+    tids = asyncio.run(run())
+    by_name = {record['name']: record for record in records}
+    assert all(by_name[f"statement.{i}"]['parent'] == 'get_financials' for i in range(4))
+    assert by_name['orphan']['parent'] is None
+    assert threading.get_ident() not in tids
+    assert {by_name[f"statement.{i}"]['tid'] for i in range(4)} == set(tids)
+
+
+def test_json_sink_writes_one_object_per_span(records, tmp_path):
+    path = tmp_path / 'trace.jsonl'
+    tracing.configure('json', str(path))
+    with span('fetch', ticker='PETR4.SA'):
+        with span('parse', rows=object()):
+            pass
+    tracing.configure('off')
+
+    lines = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [line['name'] for line in lines] == ['parse', 'fetch']
+    assert set(lines[1]) == {'name', 'parent', 'start_us', 'duration_us', 'pid', 'tid', 'attrs'}
+    assert lines[0]['parent'] == 'fetch' and lines[1]['attrs'] == {'ticker': 'PETR4.SA'}
+    assert isinstance(lines[0]['attrs']['rows'], str)  # Valores não serializáveis viram texto
+    # Os listeners continuam recebendo os spans com o sink ativo
+    assert [record['name'] for record in records] == ['parse', 'fetch']
+
+
+def test_chrome_sink_writes_trace_event_file_on_close(records, tmp_path):
+    path = tmp_path / 'trace.json'
+    tracing.configure('chrome', str(path))
+    with span('valuation', ticker='AAPL'):
+        pass
+    assert not path.exists()  # Só escrito ao fechar
+    tracing.configure('off')
+
+    trace = json.loads(path.read_text(encoding='utf-8'))
+    assert trace['displayTimeUnit'] == 'ms'
+    event, = trace['traceEvents']
+    assert event['ph'] == 'X' and event['name'] == 'valuation'
+    assert event['args'] == {'ticker': 'AAPL'}
+    assert (event['ts'], event['dur']) == (records[0]['start_us'], records[0]['duration_us'])
+    assert {'pid', 'tid'} <= set(event)
+
+
+def test_invalid_mode(records):
+    with pytest.raises(ValueError):
+        tracing.configure('xml')
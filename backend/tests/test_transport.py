@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from transport import RECORD, REPLAY, ReplayMiss, Transport, UpstreamReplayError, parse_latency
+
+
+def record_archive(path):
+    transport = Transport(RECORD, str(path))
+
+    async def fetch():
+        return {'annualReports': [{'fiscalDateEnding': '2023-12-31'}]}
+
+    async def failing():
+        raise ValueError('API rate limit exceeded')
+
+    result = asyncio.run(transport.call('alpha_vantage', {'function': 'CASH_FLOW', 'symbol': 'AAPL'}, fetch))
+    with pytest.raises(ValueError):
+        asyncio.run(transport.call('alpha_vantage', {'function': 'OVERVIEW', 'symbol': 'AAPL'}, failing))
+    transport.call_sync('yahoo', {'ticker': 'AAPL', 'attribute': 'info'}, lambda: {'currentPrice': 190.0})
+    transport.close()
+    return result
+
+
+def test_record_then_replay(tmp_path):
+    path = tmp_path / 'upstream.jsonl.gz'
+    recorded = record_archive(path)
+
+    def never():
+        raise AssertionError('replay must not call the upstream')
+
+    transport = Transport(REPLAY, str(path))
+    replayed = asyncio.run(transport.call('alpha_vantage', {'symbol': 'AAPL', 'function': 'CASH_FLOW'}, never))
+    assert replayed == recorded
+    assert transport.call_sync('yahoo', {'ticker': 'AAPL', 'attribute': 'info'}, never) == {'currentPrice': 190.0}
+
+    with pytest.raises(UpstreamReplayError, match='rate limit'):
+        asyncio.run(transport.call('alpha_vantage', {'function': 'OVERVIEW', 'symbol': 'AAPL'}, never))
+    with pytest.raises(ReplayMiss):
+        transport.call_sync('yahoo', {'ticker': 'MSFT', 'attribute': 'info'}, never)
+
+
+def test_replay_injects_errors_and_latency(tmp_path):
+    path = tmp_path / 'upstream.jsonl.gz'
+    record_archive(path)
+
+    transport = Transport(REPLAY, str(path), error_rate=1.0)
+    with pytest.raises(UpstreamReplayError, match='InjectedError'):
+        transport.call_sync('yahoo', {'ticker': 'AAPL', 'attribute': 'info'}, None)
+
+    transport = Transport(REPLAY, str(path), latency=parse_latency('20-40'), seed=1)
+    delay, _ = transport._replay('yahoo', {'ticker': 'AAPL', 'attribute': 'info'})
+    assert 0.02 <= delay <= 0.04
+
+
+def test_parse_latency():
+    assert parse_latency('50') == (0.05, 0.05)
+    assert parse_latency('0') == (0.0, 0.0)
+    with pytest.raises(ValueError):
+        parse_latency('200-20')
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+import ratings
+from market_params import MarketSnapshot
+from valuation_graph import OUTPUTS, ValuationGraph
+from watch import FUNDAMENTALS, PRICE, Watcher
+
+
+def record(ticker, price=50.0, fcf=(5e6, 4e6, 3e6), beta=1.2):
+    periods = [date(2023 - i, 12, 31) for i in range(len(fcf))]
+    return {
+        'income': [{'ticker': ticker, 'period': p, 'net_income': 4e6, 'interest_expense': 2e5} for p in periods],
+        'balance': [{'ticker': ticker, 'period': p, 'total_debt': 1e7} for p in periods],
+        'cash_flow': [{'ticker': ticker, 'period': p, 'free_cash_flow': v, 'operating_cash_flow': v + 1e6,
+                       'capital_expenditure': -1e6, 'working_capital_change': 2e5} for p, v in zip(periods, fcf)],
+        'market': [{'ticker': ticker, 'period': date(2024, 3, 1), 'price': price,
+                    'shares_outstanding': 1e6, 'market_cap': price * 1e6, 'beta': beta}],
+    }
+
+
+def market(us_rate=0.0425, br_rate=0.13):
+    return MarketSnapshot.from_dict({'countries': {
+        'US': {'currency': 'USD', 'curve': {'10': us_rate}, 'equity_risk_premium': 0.06, 'tax_rate': 0.21},
+        'BR': {'currency': 'BRL', 'suffixes': ['.SA'], 'curve': {'10': br_rate},
+               'equity_risk_premium': 0.085, 'tax_rate': 0.34},
+    }})
+
+
+def test_outputs_follow_the_per_ticker_rules():
+    graph = ValuationGraph(market())
+    graph.update('AAA', record('AAA'))
+    graph.recompute()
+    values = graph.values('AAA')
+
+    quality = ratings.quality_metrics(4e6, 5e6, 1e7, 2e5)
+    wacc = ratings.wacc(1.2, 1e7, 2e5, 5e7, 0.0425, 0.06, 0.21)
+    growth = ratings.cagr([5e6, 4e6, 3e6], 3)
+    multiple = ratings.dynamic_multiple(growth, quality, wacc)
+    assert values['quality'] == quality
+    assert values['wacc'] == pytest.approx(wacc)
+    assert values['multiple'] == pytest.approx(multiple)
+    assert values['fair_value'] == pytest.approx(5.0 * multiple)
+    assert values['recommendation'] == ratings.recommendation(values['upside'])
+
+
+def test_statements_in_another_currency_are_converted():
+    snapshot = MarketSnapshot.from_dict({'countries': {
+        'US': {'currency': 'USD', 'curve': {'10': 0.0425}, 'equity_risk_premium': 0.06, 'tax_rate': 0.21},
+    }, 'fx': {'USD': 1.0, 'BRL': 0.2}})
+    reported = record('BRL', fcf=(2.5e7, 2e7, 1.5e7))
+    reported['income'] = [dict(row, net_income=2e7, interest_expense=1e6) for row in reported['income']]
+    reported['balance'] = [dict(row, total_debt=5e7) for row in reported['balance']]
+    reported['cash_flow'] = [dict(row, operating_cash_flow=row['free_cash_flow'] + 5e6, capital_expenditure=-5e6,
+                                  working_capital_change=1e6) for row in reported['cash_flow']]
+    reported['market'] = [dict(row, currency='USD', financial_currency='BRL') for row in reported['market']]
+
+    graph = ValuationGraph(snapshot)
+    graph.update('USD', record('USD'))
+    graph.update('BRL', reported)
+    graph.recompute()
+    expected, converted = graph.values('USD'), graph.values('BRL')
+    for name in ('wacc', 'multiple', 'fcf_per_share', 'fair_value', 'upside'):
+        assert converted[name] == pytest.approx(expected[name])
+    assert converted['recommendation'] == expected['recommendation']
+
+
+def test_only_affected_nodes_are_recomputed():
+    graph = ValuationGraph(market())
+    for ticker in ('AAA', 'BBB', 'CCC.SA'):
+        graph.update(ticker, record(ticker))
+    graph.recompute()
+
+    # Nada mudou: nenhum trabalho
+    graph.update('AAA', record('AAA'))
+    computed = graph.computed
+    assert graph.recompute() == [] and graph.computed == computed
+
+    # Um preço: market_cap, wacc, multiple, upside e recommendation de um único ticker
+    graph.set('BBB', price=20.0)
+    events = graph.recompute()
+    assert graph.computed - computed == 5
+    assert {e.ticker for e in events} == {'BBB'}
+    assert {e.node for e in events} <= {'market_cap', 'wacc', 'multiple', 'upside', 'recommendation'}
+    assert graph.value('BBB', 'upside') > graph.value('AAA', 'upside')
+
+    # Juros novos nos EUA reavaliam o WACC e o que depende dele só nos tickers americanos
+    computed = graph.computed
+    graph.set_global(market=market(us_rate=0.06))
+    events = graph.recompute()
+    assert {e.ticker for e in events if e.node == 'wacc'} == {'AAA', 'BBB'}
+    assert not {e.node for e in events} & {'growth_rate', 'quality', 'fcf_per_share'}
+    assert graph.computed - computed <= 3 + 2 * 5
+
+
+def test_watcher_applies_graph_events():
+    class Source:
+        price = 500.0
+
+        async def get_fundamentals(self, ticker):
+            return record(ticker, price=500.0)
+
+        async def get_current_price(self, ticker):
+            return self.price
+
+    source = Source()
+    watcher = Watcher(['AAA'], source)
+    entry = watcher.entries['AAA']
+
+    asyncio.run(watcher.refresh('AAA', FUNDAMENTALS))
+    assert entry.error is None
+    assert entry.fair_value == pytest.approx(watcher.graph.value('AAA', 'fair_value'))
+    assert entry.recommendation == 'Strong Sell'
+
+    source.price = 1.0
+    asyncio.run(watcher.refresh('AAA', PRICE))
+    assert entry.price == 1.0 and entry.recommendation == 'Strong Buy'
+    assert entry.previous_recommendation == 'Strong Sell' and entry.changed_at is not None
+    assert set(watcher.graph.values('AAA')) == set(OUTPUTS)
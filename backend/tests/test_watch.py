@@ -0,0 +1,168 @@
+import asyncio
+from datetime import date
+
+import pytest
+from rich.console import Console
+
+import watch
+from valuation_graph import ValuationEvent
+from watch import FUNDAMENTALS, PRICE, StaggeredScheduler, Watcher
+
+
+def fundamentals(ticker, cash_flow=True):
+    period = date(2023, 12, 31)
+    return {
+        'income': [{'ticker': ticker, 'period': period, 'net_income': 4e6, 'interest_expense': 2e5}],
+        'balance': [{'ticker': ticker, 'period': period, 'total_debt': 1e7}],
+        'cash_flow': [{'ticker': ticker, 'period': period, 'free_cash_flow': 5e6, 'operating_cash_flow': 6e6,
+                       'capital_expenditure': -1e6, 'working_capital_change': 2e5}] if cash_flow else [],
+        'market': [{'ticker': ticker, 'period': date(2024, 3, 1), 'price': 50.0,
+                    'shares_outstanding': 1e6, 'market_cap': 5e7, 'beta': 1.2}],
+    }
+
+
+class Clock:
+    """Fake monotonic clock; asyncio.sleep advances it instead of waiting"""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += max(seconds, 0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(watch.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(watch.asyncio, 'sleep', clock.sleep)
+    return clock
+
+
+def take(scheduler, clock, count):
+    async def run():
+        jobs = []
+        for _ in range(count):
+            key, kind = await scheduler.next_job()
+            jobs.append((clock.now, key, kind))
+        return jobs
+    return asyncio.run(run())
+
+
+def render(watcher) -> str:
+    console = Console(record=True, width=200)
+    console.print(watcher.build_table())
+    return console.export_text()
+
+
+def test_jobs_are_spread_evenly_and_keep_their_cadence(clock):
+    scheduler = StaggeredScheduler(jitter=0)
+    scheduler.add_jobs(['A', 'B', 'C', 'D'], PRICE, 60, start=0)
+    jobs = take(scheduler, clock, 12)
+    assert [at for at, _, _ in jobs] == [15 * i for i in range(12)]
+    assert [key for _, key, _ in jobs] == list('ABCD') * 3
+
+
+def test_two_cadences_interleave(clock):
+    scheduler = StaggeredScheduler(jitter=0)
+    scheduler.add_jobs(['A', 'B'], FUNDAMENTALS, 3600, start=0)
+    scheduler.add_jobs(['A', 'B'], PRICE, 30, start=30)
+    jobs = take(scheduler, clock, 2 + 2 * 60)
+    fundamentals = [at for at, _, kind in jobs if kind == FUNDAMENTALS]
+    assert fundamentals == [0, 1800]
+    prices = [at for at, key, kind in jobs if kind == PRICE and key == 'A']
+    assert all(b - a == 30 for a, b in zip(prices, prices[1:]))
+
+
+def test_jitter_only_delays_and_late_jobs_do_not_burst(clock):
+    scheduler = StaggeredScheduler(jitter=0.1)
+    scheduler.add_jobs(['A'], PRICE, 100, start=0)
+    times = [at for at, _, _ in take(scheduler, clock, 20)]
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert all(100 <= gap <= 110 for gap in gaps)
+
+    # Atraso longo (o loop ficou ocupado): no máximo uma rodada de recuperação, sem rajada das perdidas
+    clock.now = 0
+    scheduler = StaggeredScheduler(jitter=0)
+    scheduler.add_jobs(['A'], PRICE, 10, start=0)
+    take(scheduler, clock, 1)
+    clock.now += 35
+    assert [at for at, _, _ in take(scheduler, clock, 4)] == [35, 35, 45, 55]
+
+
+def test_remove_drops_every_job_of_a_ticker(clock):
+    scheduler = StaggeredScheduler(jitter=0)
+    scheduler.add_jobs(['A', 'B'], FUNDAMENTALS, 60, start=0)
+    scheduler.add_jobs(['A', 'B'], PRICE, 10, start=0)
+    scheduler.remove('A')
+    assert {key for _, key, _ in take(scheduler, clock, 10)} == {'B'}
+
+
+def test_recommendation_change_is_highlighted(monkeypatch):
+    watcher = Watcher(['AAA'], source=None)
+    entry = watcher.entries['AAA']
+    entry.price, entry.price_updated_at = 10.0, watch.time.time()
+    watcher.apply([
+        ValuationEvent('AAA', 'fair_value', None, 12.0),
+        ValuationEvent('AAA', 'upside', None, 20.0),
+        ValuationEvent('AAA', 'recommendation', None, 'Buy'),
+    ])
+    # A primeira avaliação não é uma mudança
+    assert entry.changed_at is None and entry.previous_recommendation is None
+    assert 'Buy' in render(watcher) and '→' not in render(watcher)
+
+    watcher.apply([ValuationEvent('AAA', 'recommendation', 'Buy', 'Strong Buy')])
+    assert entry.recommendation == 'Strong Buy' and entry.previous_recommendation == 'Buy'
+    assert 'Buy → Strong Buy' in render(watcher)
+
+    # O destaque expira depois de CHANGE_HIGHLIGHT_SECONDS
+    later = entry.changed_at + watch.CHANGE_HIGHLIGHT_SECONDS + 1
+    monkeypatch.setattr(watch.time, 'time', lambda: later)
+    entry.price_updated_at = later
+    assert '→' not in render(watcher) and 'Strong Buy' in render(watcher)
+
+    # Eventos de tickers fora da lista são ignorados
+    watcher.apply([ValuationEvent('ZZZ', 'recommendation', 'Buy', 'Sell')])
+    assert 'ZZZ' not in watcher.entries
+
+
+def test_missing_fundamentals_show_an_error():
+    class Source:
+        def __init__(self):
+            self.prices = 0
+
+        async def get_fundamentals(self, ticker):
+            if ticker == 'DOWN':
+                raise ValueError("Yahoo indisponível")
+            return fundamentals(ticker, cash_flow=ticker != 'EMPTY')
+
+        async def get_current_price(self, ticker):
+            self.prices += 1
+            return 50.0
+
+    source = Source()
+    watcher = Watcher(['DOWN', 'EMPTY', 'WAIT'], source)
+
+    async def run():
+        # Preço antes dos fundamentos: nada a reavaliar nem a buscar
+        await watcher.refresh('WAIT', PRICE)
+        await watcher.refresh('DOWN', FUNDAMENTALS)
+        await watcher.refresh('EMPTY', FUNDAMENTALS)
+        await watcher.refresh('EMPTY', PRICE)
+    asyncio.run(run())
+
+    entries = watcher.entries
+    assert source.prices == 1
+    assert entries['WAIT'].error is None and entries['WAIT'].recommendation is None
+    assert entries['DOWN'].error == "Yahoo indisponível"
+    assert entries['EMPTY'].error == "Dados insuficientes para avaliar"
+    assert entries['EMPTY'].recommendation is None
+
+    table = render(watcher)
+    assert 'Yahoo indisponível' in table
+    assert 'Dados insuficientes para avaliar' in table
+    assert 'carregando...' in table
+    assert watcher.changed.is_set()
@@ -1,12 +1,61 @@
-import os
 from typing import Optional, Dict
-from openai import OpenAI
 from rich.console import Console
 from rich.panel import Panel
+from llm_client import LLMClient, get_llm_client
+from symbol_directory import SymbolDirectory, get_symbol_directory
+import metrics
+from tracing import span
+
+# Não dependem do cliente da IA nem do diretório: usadas também com o daemon ativo
+def display_ticker_info(info: Dict[str, str], console: Console) -> None:
+    """Exibe as informações do ticker de forma formatada"""
+    if not info:
+        return
+
+    panel_content = [
+        f"[bold blue]Ticker:[/bold blue] {info['ticker_principal']}",
+        f"[bold green]Mercado:[/bold green] {'Brasil' if info['mercado'] == 'BR' else 'Estados Unidos'}",
+        f"[bold white]Nota:[/bold white] {info['nota']}"
+    ]
+
+    console.print(Panel(
+        "\n".join(panel_content),
+        title="Informações do Ticker",
+        border_style="blue"
+    ))
+
+
+def is_valid_ticker(input_str: str) -> bool:
+    """Verifica se o input parece ser um ticker válido"""
+    if not input_str:
+        return False
+
+    # Remove espaços e converte para maiúsculo
+    input_str = input_str.strip().upper()
+
+    # Verifica se é ticker BR (.SA)
+    if input_str.endswith('.SA'):
+        base = input_str[:-3]  # Remove o .SA
+        return (
+            len(base) >= 4 and
+            len(base) <= 6 and
+            base[-1].isdigit() and  # Último caractere deve ser número
+            all(c.isalpha() for c in base[:-1])  # Resto deve ser letras
+        )
+
+    # Verifica se é ticker US
+    return (
+        len(input_str) >= 1 and
+        len(input_str) <= 5 and
+        ' ' not in input_str and
+        all(c.isalpha() for c in input_str)  # Deve ser apenas letras
+    )
+
 
 class TickerFinder:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    def __init__(self, llm: Optional[LLMClient] = None, directory: Optional[SymbolDirectory] = None):
+        self.llm = llm or get_llm_client()
+        self.directory = directory
         self.console = Console()
         self.system_prompt = """Você é um especialista em mercado financeiro. Forneça APENAS as informações solicitadas no formato especificado.
 
@@ -23,23 +72,31 @@ TICKER_PRINCIPAL: <ticker>
 MERCADO: <BR/US>
 NOTA: <explicação_curta>"""
 
-    def get_company_ticker(self, company_name: str) -> Optional[Dict[str, str]]:
+    async def get_company_ticker(self, company_name: str) -> Optional[Dict[str, str]]:
         """
-        Busca o ticker de uma empresa usando IA.
+        Busca o ticker de uma empresa no diretório local e, se não houver
+        um candidato confiável, usando IA.
         Retorna um dicionário com ticker principal, mercado e explicação.
         """
         try:
+            with span('resolve_ticker.local', query=company_name):
+                local = self.find_local_ticker(company_name)
+            metrics.record_cache('symbols', hit=bool(local))
+            if local:
+                return local
+
             messages = [
                 {"role": "system", "content": self.system_prompt},
                 {"role": "user", "content": f"Qual o ticker para: {company_name}?"}
             ]
             
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=messages,
-                temperature=0.1,
-                max_tokens=100  # Reduzido para respostas mais rápidas
-            )
+            with span('resolve_ticker.llm', query=company_name):
+                response = await self.llm.chat(
+                    model="gpt-4o",
+                    messages=messages,
+                    temperature=0.1,
+                    max_tokens=100  # Reduzido para respostas mais rápidas
+                )
             
             result = response.choices[0].message.content.strip()
             
@@ -67,45 +124,20 @@ NOTA: <explicação_curta>"""
             self.console.print(f"[red]Erro ao buscar ticker: {str(e)}[/red]")
             return None
 
+    def find_local_ticker(self, company_name: str) -> Optional[Dict[str, str]]:
+        """Busca o ticker no diretório offline de símbolos"""
+        try:
+            if self.directory is None:
+                self.directory = get_symbol_directory()
+            return self.directory.lookup(company_name)
+        except Exception as e:
+            self.console.print(f"[yellow]Diretório local de tickers indisponível: {str(e)}[/yellow]")
+            return None
+
     def display_ticker_info(self, info: Dict[str, str]) -> None:
         """Exibe as informações do ticker de forma formatada"""
-        if not info:
-            return
-            
-        panel_content = [
-            f"[bold blue]Ticker:[/bold blue] {info['ticker_principal']}",
-            f"[bold green]Mercado:[/bold green] {'Brasil' if info['mercado'] == 'BR' else 'Estados Unidos'}",
-            f"[bold white]Nota:[/bold white] {info['nota']}"
-        ]
-        
-        self.console.print(Panel(
-            "\n".join(panel_content),
-            title="Informações do Ticker",
-            border_style="blue"
-        ))
+        display_ticker_info(info, self.console)
 
     def is_valid_ticker(self, input_str: str) -> bool:
         """Verifica se o input parece ser um ticker válido"""
-        if not input_str:
-            return False
-        
-        # Remove espaços e converte para maiúsculo
-        input_str = input_str.strip().upper()
-        
-        # Verifica se é ticker BR (.SA)
-        if input_str.endswith('.SA'):
-            base = input_str[:-3]  # Remove o .SA
-            return (
-                len(base) >= 4 and
-                len(base) <= 6 and
-                base[-1].isdigit() and  # Último caractere deve ser número
-                all(c.isalpha() for c in base[:-1])  # Resto deve ser letras
-            )
-        
-        # Verifica se é ticker US
-        return (
-            len(input_str) >= 1 and
-            len(input_str) <= 5 and
-            ' ' not in input_str and
-            all(c.isalpha() for c in input_str)  # Deve ser apenas letras
-        )
+        return is_valid_ticker(input_str)
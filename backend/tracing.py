@@ -0,0 +1,186 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ('off', 'log', 'json', 'chrome')
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+
+class _NullSpan:
+    """Returned when tracing is off: entering and leaving it costs almost nothing"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    __slots__ = ('name', 'attrs', 'start_ns', 'parent', '_token')
+
+    def __init__(self, name: str, attrs: Dict):
+        self.name = name
+        self.attrs = attrs
+        self.start_ns = 0
+        self.parent = None
+        self._token = None
+
+    def set(self, **attrs):
+        """Attach attributes discovered while the span is open"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self._token = _current_span.set(self)
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end_ns = time.perf_counter_ns()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attrs['error'] = f"{exc_type.__name__}: {exc}"
+        record = {
+            'name': self.name,
+            'parent': self.parent.name if self.parent else None,
+            'start_us': self.start_ns // 1000,
+            'duration_us': (end_ns - self.start_ns) // 1000,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'attrs': self.attrs,
+        }
+        if _sink is not None:
+            _sink.emit(record)
+        for listener in _listeners:
+            listener(record)
+        return False
+
+
+class LogSink:
+    def emit(self, record: Dict):
+        attrs = ' '.join(f"{k}={v}" for k, v in record['attrs'].items())
+        logger.info(f"[trace] {record['name']} {record['duration_us'] / 1000:.2f}ms {attrs}".rstrip())
+
+    def close(self):
+        pass
+
+
+class JSONSink:
+    """One JSON object per finished span"""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def emit(self, record: Dict):
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ChromeSink:
+    """Collects complete ('X') events and writes a chrome://tracing / Perfetto file on close"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._events: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def emit(self, record: Dict):
+        event = {
+            'name': record['name'],
+            'ph': 'X',
+            'ts': record['start_us'],
+            'dur': record['duration_us'],
+            'pid': record['pid'],
+            'tid': record['tid'],
+            'args': record['attrs'],
+        }
+        with self._lock:
+            self._events.append(event)
+
+    def close(self):
+        with self._lock:
+            events, self._events = self._events, []
+        if events:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+
+
+_sink = None
+_listeners: List[Callable[[Dict], None]] = []
+_enabled = False
+
+
+def configure(mode: Optional[str] = None, path: Optional[str] = None):
+    """
+    Enable tracing. mode is off, log, json (JSON lines) or chrome (trace event format);
+    defaults come from TRACE_MODE and TRACE_FILE.
+    """
+    global _sink, _enabled
+    mode = (mode or os.environ.get('TRACE_MODE', 'off')).lower()
+    if mode not in MODES:
+        raise ValueError(f"Modo de trace inválido: {mode}. Use um de {list(MODES)}")
+
+    if _sink is not None:
+        _sink.close()
+
+    if mode == 'off':
+        _sink, _enabled = None, bool(_listeners)
+        return
+
+    if mode == 'log':
+        _sink = LogSink()
+    else:
+        default = 'trace.jsonl' if mode == 'json' else 'trace.json'
+        path = path or os.environ.get('TRACE_FILE', default)
+        _sink = JSONSink(path) if mode == 'json' else ChromeSink(path)
+    _enabled = True
+
+
+def add_listener(listener: Callable[[Dict], None]):
+    """Receive every finished span record (e.g. for metrics), even with TRACE_MODE=off"""
+    global _enabled
+    if listener not in _listeners:
+        _listeners.append(listener)
+    _enabled = True
+
+
+def span(name: str, **attrs):
+    """Time a pipeline stage: `with span('wacc', ticker=ticker): ...`"""
+    if not _enabled:
+        return NULL_SPAN
+    return Span(name, attrs)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+@atexit.register
+def _close_sink():
+    if _sink is not None:
+        _sink.close()
+
+
+configure()
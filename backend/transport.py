@@ -0,0 +1,218 @@
+import asyncio
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+LIVE = 'live'
+RECORD = 'record'
+REPLAY = 'replay'
+MODES = (LIVE, RECORD, REPLAY)
+
+DEFAULT_ARCHIVE = os.path.join(os.path.dirname(__file__), 'cache', 'upstream.jsonl.gz')
+
+
+class ReplayMiss(Exception):
+    """The archive has no response for this request"""
+
+
+class UpstreamReplayError(Exception):
+    """An error recorded from the upstream, or one injected in replay mode"""
+
+
+def request_key(service: str, request: Dict) -> str:
+    encoded = json.dumps({'service': service, 'request': request}, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:32]
+
+
+def parse_latency(value: str) -> Tuple[float, float]:
+    """'50' or '20-200' (milliseconds) -> (min_s, max_s)"""
+    low, _, high = str(value).partition('-')
+    low_ms = float(low or 0)
+    high_ms = float(high) if high else low_ms
+    if low_ms < 0 or high_ms < low_ms:
+        raise ValueError(f"Latência inválida: {value}")
+    return low_ms / 1000, high_ms / 1000
+
+
+class Transport:
+    """
+    Sits between the clients and Yahoo, Alpha Vantage and OpenAI. In record
+    mode every request -> response pair (or error) is appended to a gzip JSON
+    lines archive; in replay mode the archive answers instead of the network,
+    optionally with injected latency and errors.
+    """
+
+    def __init__(self, mode: str = LIVE, archive_path: Optional[str] = None,
+                 latency: Tuple[float, float] = (0.0, 0.0), error_rate: float = 0.0,
+                 seed: Optional[int] = None, services: Optional[Tuple[str, ...]] = None):
+        if mode not in MODES:
+            raise ValueError(f"Modo de transporte inválido: {mode}. Use um de {list(MODES)}")
+        if not 0.0 <= error_rate <= 1.0:
+            raise ValueError("A taxa de erros deve estar entre 0 e 1")
+        self.mode = mode
+        self.archive_path = archive_path or DEFAULT_ARCHIVE
+        self.latency = latency
+        self.error_rate = error_rate
+        # None: todos os serviços; senão só estes são gravados/respondidos do arquivo
+        self.services = tuple(services) if services else None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._file = None
+
+        if mode == REPLAY:
+            self._entries = self.load(self.archive_path)
+            logger.info(f"Replay de {len(self._entries)} respostas de {self.archive_path}")
+        elif mode == RECORD:
+            os.makedirs(os.path.dirname(os.path.abspath(self.archive_path)), exist_ok=True)
+            # Cada execução acrescenta um membro gzip; gzip.open lê todos em sequência
+            self._file = gzip.open(self.archive_path, 'at', encoding='utf-8')
+
+    def mode_for(self, service: str) -> str:
+        """Effective mode for one service ('openai.stream' follows 'openai')"""
+        if self.services is None or service.split('.', 1)[0] in self.services:
+            return self.mode
+        return LIVE
+
+    @staticmethod
+    def load(path: str) -> Dict[str, Dict]:
+        entries = {}
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    entries[entry['key']] = entry  # A gravação mais recente vence
+        return entries
+
+    def record(self, service: str, request: Dict, response: Any = None, error: Optional[BaseException] = None):
+        entry = {'key': request_key(service, request), 'service': service, 'request': request}
+        if error is not None:
+            entry['error'] = {'type': type(error).__name__, 'message': str(error)}
+        else:
+            entry['response'] = response
+        line = json.dumps(entry, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def _replay(self, service: str, request: Dict) -> Tuple[float, Dict]:
+        """Pick the delay and the recorded entry (or raise an injected error)"""
+        entry = self._entries.get(request_key(service, request))
+        if entry is None:
+            raise ReplayMiss(f"Nenhuma resposta gravada para {service} {json.dumps(request, default=str)}")
+        with self._lock:
+            delay = self._random.uniform(*self.latency)
+            failed = self._random.random() < self.error_rate
+        if failed:
+            entry = {'error': {'type': 'InjectedError', 'message': f"Erro injetado no replay de {service}"}}
+        return delay, entry
+
+    @staticmethod
+    def _result(entry: Dict, decode: Optional[Callable[[Any], Any]]):
+        if 'error' in entry:
+            error = entry['error']
+            raise UpstreamReplayError(f"{error['type']}: {error['message']}")
+        return decode(entry['response']) if decode else entry['response']
+
+    async def replay(self, service: str, request: Dict, decode: Optional[Callable[[Any], Any]] = None) -> Any:
+        """Answer from the archive after the injected latency"""
+        delay, entry = self._replay(service, request)
+        if delay:
+            await asyncio.sleep(delay)
+        return self._result(entry, decode)
+
+    def replay_sync(self, service: str, request: Dict, decode: Optional[Callable[[Any], Any]] = None) -> Any:
+        delay, entry = self._replay(service, request)
+        if delay:
+            time.sleep(delay)
+        return self._result(entry, decode)
+
+    async def call(self, service: str, request: Dict, fetch: Callable[[], Awaitable[Any]],
+                   encode: Optional[Callable[[Any], Any]] = None,
+                   decode: Optional[Callable[[Any], Any]] = None) -> Any:
+        """Run an async upstream request through the transport"""
+        mode = self.mode_for(service)
+        if mode == REPLAY:
+            return await self.replay(service, request, decode)
+
+        if mode == LIVE:
+            return await fetch()
+
+        try:
+            response = await fetch()
+        except Exception as e:
+            self.record(service, request, error=e)
+            raise
+        self.record(service, request, encode(response) if encode else response)
+        return response
+
+    def call_sync(self, service: str, request: Dict, fetch: Callable[[], Any],
+                  encode: Optional[Callable[[Any], Any]] = None,
+                  decode: Optional[Callable[[Any], Any]] = None) -> Any:
+        """Same as call() for blocking clients (yfinance runs in executor threads)"""
+        mode = self.mode_for(service)
+        if mode == REPLAY:
+            return self.replay_sync(service, request, decode)
+
+        if mode == LIVE:
+            return fetch()
+
+        try:
+            response = fetch()
+        except Exception as e:
+            self.record(service, request, error=e)
+            raise
+        self.record(service, request, encode(response) if encode else response)
+        return response
+
+    def close(self):
+        if self._file is not None:
+            with self._lock:
+                self._file.close()
+                self._file = None
+
+
+_transport: Optional[Transport] = None
+
+
+def configure(mode: Optional[str] = None, archive_path: Optional[str] = None) -> Transport:
+    """
+    Set the process-wide transport. Defaults come from UPSTREAM_MODE,
+    UPSTREAM_ARCHIVE, UPSTREAM_SERVICES (comma separated, default all),
+    REPLAY_LATENCY_MS, REPLAY_ERROR_RATE and REPLAY_SEED.
+    """
+    global _transport
+    if _transport is not None:
+        _transport.close()
+    seed = os.environ.get('REPLAY_SEED')
+    services = [s.strip() for s in os.environ.get('UPSTREAM_SERVICES', '').split(',') if s.strip()]
+    _transport = Transport(
+        mode=(mode or os.environ.get('UPSTREAM_MODE', LIVE)).lower(),
+        archive_path=archive_path or os.environ.get('UPSTREAM_ARCHIVE'),
+        latency=parse_latency(os.environ.get('REPLAY_LATENCY_MS', '0')),
+        error_rate=float(os.environ.get('REPLAY_ERROR_RATE', 0)),
+        seed=int(seed) if seed else None,
+        services=tuple(services) or None,
+    )
+    return _transport
+
+
+def get_transport() -> Transport:
+    if _transport is None:
+        configure()
+    return _transport
+
+
+@atexit.register
+def _close_transport():
+    if _transport is not None:
+        _transport.close()
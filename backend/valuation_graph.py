@@ -0,0 +1,247 @@
+import logging
+import math
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import ratings
+from market_params import MarketSnapshot, get_market_params
+
+logger = logging.getLogger(__name__)
+
+# Entradas de cada ticker: preço, ações, beta, moedas (cotação e demonstrações) e a linha mais recente de cada demonstração
+TICKER_INPUTS = (
+    'price', 'shares_outstanding', 'beta', 'currency', 'financial_currency', 'income', 'balance', 'cash_flow'
+)
+# Entrada compartilhada por todos os tickers: o snapshot de parâmetros de mercado (juros, prêmio, impostos, câmbio)
+GLOBAL_INPUTS = ('market',)
+QUALITY_ERROR = {'fcf_to_income': 0, 'debt_to_fcf': float('inf'), 'working_capital_change': 0}
+
+
+class Node(NamedTuple):
+    name: str
+    inputs: Tuple[str, ...]
+    compute: Callable
+
+
+class ValuationEvent(NamedTuple):
+    ticker: str
+    node: str
+    old: object
+    new: object
+
+
+def _market_cap(price, shares):
+    if price is None or shares is None:
+        return None
+    return price * shares
+
+
+def _growth_rate(cash_flow):
+    if cash_flow is None:
+        return None
+    history = cash_flow['fcf_history']
+    return ratings.cagr(history, len(history))
+
+
+def _quality(income, balance, cash_flow):
+    """Same rules (and error defaults) as YahooFinanceAPI.calculate_quality_metrics"""
+    if income is None or balance is None or cash_flow is None:
+        return QUALITY_ERROR
+    if income.get('net_income') is None or cash_flow.get('operating_cash_flow') is None:
+        return QUALITY_ERROR
+    fcf = cash_flow['operating_cash_flow'] + (cash_flow.get('capital_expenditure') or 0.0)
+    return ratings.quality_metrics(
+        income['net_income'], fcf, balance.get('total_debt') or 0.0, cash_flow.get('working_capital_change') or 0.0
+    )
+
+
+def _country(ticker, market):
+    return market.for_ticker(ticker)
+
+
+def _fx(ticker, financial_currency, currency, market):
+    """Statement-to-quote currency factor; takes the ticker so it is computed when the ticker is added"""
+    return market.statement_fx(financial_currency, currency)
+
+
+def _wacc(beta, income, balance, market_cap, country, fx):
+    """
+    Same rules as YahooFinanceAPI.calculate_wacc, with debt and interest in
+    the quote currency; the market cap follows the price
+    """
+    if income is None or balance is None or market_cap is None:
+        return ratings.DEFAULT_WACC
+    return ratings.wacc(
+        1.0 if beta is None else beta, (balance.get('total_debt') or 0.0) * fx,
+        (income.get('interest_expense') or 0.0) * fx,
+        market_cap, country.risk_free_rate, country.equity_risk_premium, country.tax_rate
+    )
+
+
+def _multiple(growth_rate, quality, wacc):
+    if growth_rate is None:
+        return None
+    return ratings.dynamic_multiple(growth_rate, quality, wacc)
+
+
+def _fcf_per_share(cash_flow, shares, fx):
+    if cash_flow is None or not cash_flow['fcf_history'] or not shares:
+        return None
+    return cash_flow['fcf_history'][0] * fx / shares
+
+
+def _fair_value(fcf_per_share, multiple):
+    if fcf_per_share is None or multiple is None:
+        return None
+    return fcf_per_share * multiple
+
+
+def _upside(fair_value, price):
+    if fair_value is None or not price:
+        return None
+    return ((fair_value / price) - 1) * 100
+
+
+def _optional(rule: Callable) -> Callable:
+    return lambda value: None if value is None else rule(value)
+
+
+# Em ordem topológica: cada nó só depende de entradas ou de nós anteriores
+NODES = [
+    Node('country', ('ticker', 'market'), _country),
+    Node('fx', ('ticker', 'financial_currency', 'currency', 'market'), _fx),
+    Node('market_cap', ('price', 'shares_outstanding'), _market_cap),
+    Node('growth_rate', ('cash_flow',), _growth_rate),
+    Node('quality', ('income', 'balance', 'cash_flow'), _quality),
+    Node('wacc', ('beta', 'income', 'balance', 'market_cap', 'country', 'fx'), _wacc),
+    Node('multiple', ('growth_rate', 'quality', 'wacc'), _multiple),
+    Node('fcf_per_share', ('cash_flow', 'shares_outstanding', 'fx'), _fcf_per_share),
+    Node('fair_value', ('fcf_per_share', 'multiple'), _fair_value),
+    Node('upside', ('fair_value', 'price'), _upside),
+    Node('recommendation', ('upside',), _optional(ratings.recommendation)),
+    Node('growth_rating', ('growth_rate',), _optional(ratings.growth_rating)),
+    Node('quality_rating', ('quality',), ratings.fcf_quality_rating),
+]
+OUTPUTS = tuple(node.name for node in NODES)
+
+
+def _same(old, new) -> bool:
+    if isinstance(old, float) and isinstance(new, float) and math.isnan(old) and math.isnan(new):
+        return True
+    return old == new
+
+
+def inputs_from_record(record: Dict[str, List[Dict]]) -> Dict[str, object]:
+    """Graph inputs from one fundamentals_store.extract() record"""
+    def newest_first(statement: str) -> List[Dict]:
+        return sorted(record.get(statement) or [], key=lambda row: str(row['period']), reverse=True)
+
+    inputs: Dict[str, object] = {}
+    market = newest_first('market')
+    if market:
+        inputs['price'] = market[0].get('price')
+        inputs['shares_outstanding'] = market[0].get('shares_outstanding')
+        inputs['beta'] = market[0].get('beta')
+        inputs['currency'] = market[0].get('currency')
+        inputs['financial_currency'] = market[0].get('financial_currency')
+    for statement in ('income', 'balance'):
+        rows = newest_first(statement)
+        inputs[statement] = {k: v for k, v in rows[0].items() if k not in ('ticker', 'period')} if rows else None
+    rows = newest_first('cash_flow')
+    if rows:
+        cash_flow = {k: v for k, v in rows[0].items() if k not in ('ticker', 'period')}
+        cash_flow['fcf_history'] = tuple(r['free_cash_flow'] for r in rows if r.get('free_cash_flow') is not None)
+        inputs['cash_flow'] = cash_flow
+    else:
+        inputs['cash_flow'] = None
+    return inputs
+
+
+class ValuationGraph:
+    """
+    Incremental valuation of many tickers. Inputs (price, statements, beta,
+    market parameters) are set as they change; recompute() re-evaluates only
+    the nodes downstream of a changed input, stops wherever a node's value
+    is unchanged, and returns the changed nodes as events. A price tick
+    touches market cap, WACC, multiple, upside and recommendation of one
+    ticker; new market parameters touch WACC and below only for the tickers
+    whose country's rates changed.
+    """
+
+    def __init__(self, market: Optional[MarketSnapshot] = None):
+        self.globals: Dict[str, object] = {'market': market or get_market_params().snapshot()}
+        self._values: Dict[str, Dict[str, object]] = {}
+        self._dirty: Dict[str, set] = {}
+        self._global_dirty: set = set()
+        self.computed = 0  # Nós avaliados desde a criação (mede o trabalho incremental)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self._values
+
+    def tickers(self) -> List[str]:
+        return list(self._values)
+
+    def set(self, ticker: str, **inputs):
+        """Set inputs of one ticker; only values that differ mark it dirty"""
+        unknown = set(inputs) - set(TICKER_INPUTS)
+        if unknown:
+            raise ValueError(f"Entradas inválidas: {', '.join(sorted(unknown))}")
+        if ticker not in self._values:
+            self._values[ticker] = {'ticker': ticker}
+            self._dirty.setdefault(ticker, set()).add('ticker')
+        values = self._values[ticker]
+        for name, value in inputs.items():
+            if name in values and _same(values[name], value):
+                continue
+            values[name] = value
+            self._dirty.setdefault(ticker, set()).add(name)
+
+    def set_global(self, **inputs):
+        unknown = set(inputs) - set(GLOBAL_INPUTS)
+        if unknown:
+            raise ValueError(f"Entradas globais inválidas: {', '.join(sorted(unknown))}")
+        for name, value in inputs.items():
+            if not _same(self.globals[name], value):
+                self.globals[name] = value
+                self._global_dirty.add(name)
+
+    def update(self, ticker: str, record: Dict[str, List[Dict]]):
+        """Set every input from a fundamentals_store.extract() record"""
+        self.set(ticker, **inputs_from_record(record))
+
+    def remove(self, ticker: str):
+        self._values.pop(ticker, None)
+        self._dirty.pop(ticker, None)
+
+    def value(self, ticker: str, name: str):
+        return self._values.get(ticker, {}).get(name)
+
+    def values(self, ticker: str) -> Dict[str, object]:
+        """Outputs of one ticker (as of the last recompute)"""
+        values = self._values.get(ticker, {})
+        return {name: values.get(name) for name in OUTPUTS}
+
+    def recompute(self) -> List[ValuationEvent]:
+        """Propagate pending input changes; returns the outputs whose value changed"""
+        events: List[ValuationEvent] = []
+        tickers = list(self._values) if self._global_dirty else list(self._dirty)
+        for ticker in tickers:
+            changed = self._dirty.pop(ticker, set()) | self._global_dirty
+            values = self._values[ticker]
+            for node in NODES:
+                if changed.isdisjoint(node.inputs):
+                    continue
+                args = [self.globals[name] if name in self.globals else values.get(name) for name in node.inputs]
+                try:
+                    new = node.compute(*args)
+                except Exception as e:
+                    logger.debug(f"Falha ao calcular {node.name} de {ticker}: {str(e)}")
+                    new = None
+                self.computed += 1
+                old = values.get(node.name)
+                if node.name in values and _same(old, new):
+                    continue
+                values[node.name] = new
+                changed.add(node.name)
+                events.append(ValuationEvent(ticker, node.name, old, new))
+        self._global_dirty.clear()
+        return events
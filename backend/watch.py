@@ -0,0 +1,194 @@
+import asyncio
+import heapq
+import logging
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from rich.table import Table
+
+from market_params import get_market_params
+from valuation_graph import ValuationEvent, ValuationGraph
+
+logger = logging.getLogger(__name__)
+
+PRICE = 'price'
+FUNDAMENTALS = 'fundamentals'
+
+# Por quanto tempo uma mudança de recomendação continua destacada
+CHANGE_HIGHLIGHT_SECONDS = 15 * 60
+
+RECOMMENDATION_STYLES = {
+    'Strong Buy': 'bold green',
+    'Buy': 'green',
+    'Hold': 'yellow',
+    'Sell': 'red',
+    'Strong Sell': 'bold red',
+}
+
+
+class WatchEntry:
+    __slots__ = (
+        'ticker', 'price', 'fair_value', 'upside', 'recommendation',
+        'previous_recommendation', 'changed_at', 'error',
+        'price_updated_at', 'fundamentals_updated_at'
+    )
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self.price: Optional[float] = None
+        self.fair_value: Optional[float] = None
+        self.upside: Optional[float] = None
+        self.recommendation: Optional[str] = None
+        self.previous_recommendation: Optional[str] = None
+        self.changed_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.price_updated_at: Optional[float] = None
+        self.fundamentals_updated_at: Optional[float] = None
+
+
+class StaggeredScheduler:
+    """
+    Spreads periodic jobs evenly over their interval so refreshes never
+    arrive in bursts, and keeps each job on its own fixed cadence.
+    """
+
+    def __init__(self, jitter: float = 0.1):
+        self.jitter = jitter
+        self._heap: List[Tuple[float, int, str, str, float]] = []
+        self._counter = 0
+
+    def add_jobs(self, keys: List[str], kind: str, interval: float, start: Optional[float] = None):
+        """Schedule one job per key, offset by interval / len(keys)"""
+        start = time.monotonic() if start is None else start
+        spacing = interval / max(len(keys), 1)
+        for i, key in enumerate(keys):
+            self._push(start + i * spacing, key, kind, interval)
+
+    def _push(self, due: float, key: str, kind: str, interval: float):
+        self._counter += 1
+        heapq.heappush(self._heap, (due, self._counter, key, kind, interval))
+
+    def remove(self, key: str):
+        self._heap = [job for job in self._heap if job[2] != key]
+        heapq.heapify(self._heap)
+
+    async def next_job(self) -> Tuple[str, str]:
+        """Wait until the next job is due and reschedule it"""
+        while not self._heap:
+            await asyncio.sleep(1)
+        due, _, key, kind, interval = heapq.heappop(self._heap)
+        delay = due - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        next_due = max(due + interval, time.monotonic()) + random.uniform(0, self.jitter * interval)
+        self._push(next_due, key, kind, interval)
+        return key, kind
+
+
+class Watcher:
+    """
+    Keeps a watchlist up to date with cheap price refreshes and rare
+    fundamentals refreshes. Every refresh only feeds the valuation graph;
+    the table follows the outputs the graph reports as changed.
+    """
+
+    def __init__(self, tickers: List[str], source, price_interval: float = 30.0,
+                 fundamentals_interval: float = 3600.0, concurrency: int = 4):
+        self.source = source
+        self.entries: Dict[str, WatchEntry] = {t: WatchEntry(t) for t in tickers}
+        self.price_interval = price_interval
+        self.fundamentals_interval = fundamentals_interval
+        self.scheduler = StaggeredScheduler()
+        self.graph = ValuationGraph()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.changed = asyncio.Event()
+
+    async def refresh(self, ticker: str, kind: str):
+        entry = self.entries.get(ticker)
+        if entry is None:
+            return
+        async with self._semaphore:
+            try:
+                if kind == FUNDAMENTALS:
+                    self.graph.update(ticker, await self.source.get_fundamentals(ticker))
+                    entry.fundamentals_updated_at = time.time()
+                else:
+                    if ticker not in self.graph:
+                        return  # Sem fundamentos ainda não há o que reavaliar
+                    self.graph.set(ticker, price=await self.source.get_current_price(ticker))
+                entry.price = self.graph.value(ticker, 'price')
+                entry.price_updated_at = time.time()
+                # Parâmetros de mercado novos (a cada intervalo de atualização) reavaliam só o WACC em diante
+                self.graph.set_global(market=get_market_params().snapshot())
+                self.apply(self.graph.recompute())
+                entry.error = None if entry.recommendation is not None else "Dados insuficientes para avaliar"
+            except Exception as e:
+                entry.error = str(e)
+                logger.debug(f"Falha ao atualizar {kind} de {ticker}: {str(e)}")
+        self.changed.set()
+
+    def apply(self, events: List[ValuationEvent]):
+        """Copy the changed graph outputs to the entries, highlighting recommendation changes"""
+        for event in events:
+            entry = self.entries.get(event.ticker)
+            if entry is None:
+                continue
+            if event.node == 'fair_value':
+                entry.fair_value = event.new
+            elif event.node == 'upside':
+                entry.upside = event.new
+            elif event.node == 'recommendation':
+                if event.old is not None and event.new is not None:
+                    entry.previous_recommendation = event.old
+                    entry.changed_at = time.time()
+                entry.recommendation = event.new
+
+    async def run(self):
+        """Refresh forever; fundamentals first, then prices on their own cadence"""
+        tickers = list(self.entries)
+        now = time.monotonic()
+        self.scheduler.add_jobs(tickers, FUNDAMENTALS, self.fundamentals_interval, start=now)
+        # Os preços começam depois da primeira rodada de fundamentos
+        self.scheduler.add_jobs(tickers, PRICE, self.price_interval, start=now + self.price_interval)
+
+        pending = set()
+        while True:
+            ticker, kind = await self.scheduler.next_job()
+            task = asyncio.create_task(self.refresh(ticker, kind))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+    def build_table(self) -> Table:
+        table = Table(title="Watchlist", show_header=True)
+        table.add_column("Ticker", style="cyan")
+        table.add_column("Preço", justify="right")
+        table.add_column("Valor Justo", justify="right")
+        table.add_column("Upside", justify="right")
+        table.add_column("Recomendação")
+        table.add_column("Atualizado", justify="right")
+
+        now = time.time()
+        for entry in self.entries.values():
+            if entry.recommendation is None:
+                status = f"[red]{entry.error}[/red]" if entry.error else "[dim]carregando...[/dim]"
+                table.add_row(entry.ticker, "-", "-", "-", status, "-")
+                continue
+
+            style = RECOMMENDATION_STYLES[entry.recommendation]
+            recommendation = f"[{style}]{entry.recommendation}[/{style}]"
+            if entry.changed_at and now - entry.changed_at < CHANGE_HIGHLIGHT_SECONDS:
+                recommendation = f"[reverse]{entry.previous_recommendation} → {entry.recommendation}[/reverse]"
+            if entry.error:
+                recommendation += " [red]![/red]"
+
+            age = int(now - entry.price_updated_at)
+            table.add_row(
+                entry.ticker,
+                f"${entry.price:,.2f}",
+                f"${entry.fair_value:,.2f}",
+                f"{entry.upside:+.1f}%",
+                recommendation,
+                f"{age}s"
+            )
+        return table
@@ -1,410 +1,598 @@
 import asyncio
-import traceback
+import contextvars
+import logging
+import os
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
-from typing import Dict, Optional, List
+from typing import Callable, Dict, Optional, List, Tuple
 import numpy as np
 
 import yfinance as yf
 import pandas as pd
 
+import fundamentals_store
+import metrics
+import ratings
+from market_params import MarketSnapshot, get_market_params
+from resilience import CircuitOpenError, get_upstream, is_overload
+from retry import DeadlineExceeded, get_policy, hedged, run_in_thread
+from snapshot import FinancialSnapshot
+from tracing import span
+from transport import get_transport
+
+logger = logging.getLogger(__name__)
+
+
+def _encode_attribute(value):
+    """Make a yfinance attribute (DataFrame, dict or number) JSON friendly for the transport archive"""
+    if isinstance(value, pd.DataFrame):
+        return {'frame': {
+            'index': [str(label) for label in value.index],
+            'columns': [str(column) for column in value.columns],
+            'data': [[None if pd.isna(v) else v for v in row] for row in value.values.tolist()],
+        }}
+    return {'value': value}
+
+
+def _decode_attribute(encoded):
+    if 'frame' not in encoded:
+        return encoded['value']
+    frame = encoded['frame']
+    try:
+        columns = pd.to_datetime(frame['columns'])
+    except (ValueError, TypeError):
+        columns = frame['columns']
+    decoded = pd.DataFrame(frame['data'], index=frame['index'], columns=columns)
+    try:
+        return decoded.astype(float)
+    except (ValueError, TypeError):
+        return decoded
+
+
+# Campos do info usados nos cálculos: só eles seguem para os processos no modo com processos
+INFO_FIELDS = (
+    'currentPrice', 'regularMarketPrice', 'sharesOutstanding', 'beta', 'marketCap', 'financialCurrency', 'currency'
+)
+QUALITY_ERROR = {'fcf_to_income': 0, 'debt_to_fcf': float('inf'), 'working_capital_change': 0}
+# Últimos resultados bons mantidos para servir enquanto o Yahoo estiver limitando ou com o circuito aberto
+STALE_ENTRIES = 10000
+
+
+def _pack_frame(frame: pd.DataFrame) -> Tuple[Tuple[str, ...], np.ndarray]:
+    """
+    A statement as (row labels, float64 values with the periods as columns,
+    newest first). The parsing only looks at labels and column order, so
+    this is all a worker process needs, and it pickles as one flat buffer
+    instead of a DataFrame with its index objects.
+    """
+    if frame is None or frame.empty:
+        return (), np.empty((0, 0))
+    try:
+        values = frame.to_numpy(dtype='float64', na_value=np.nan)
+    except (ValueError, TypeError):
+        values = frame.apply(pd.to_numeric, errors='coerce').to_numpy(dtype='float64')
+    return tuple(str(label) for label in frame.index), values
+
+
+def _unpack_frame(packed: Tuple[Tuple[str, ...], np.ndarray]) -> pd.DataFrame:
+    labels, values = packed
+    if not labels:
+        return pd.DataFrame()
+    return pd.DataFrame(values, index=list(labels))
+
+
+def _parse_fcf_history(cash_flow: pd.DataFrame) -> List[float]:
+    """Extract the FCF of every period, newest first, from a cash flow statement"""
+    fcf_history = []
+
+    # Try to get FCF directly first
+    if 'Free Cash Flow' in cash_flow.index:
+        logger.debug("Found Free Cash Flow field, using it directly")
+        for period in cash_flow.columns:
+            try:
+                value = cash_flow.loc['Free Cash Flow', period]
+                if pd.notna(value):
+                    fcf = float(value)
+                    fcf_history.append(fcf)
+            except Exception as e:
+                logger.debug(f"Error getting FCF for period {period}: {str(e)}")
+                continue
+
+    # If we couldn't get FCF directly, try calculating it
+    if not fcf_history:
+        logger.debug("Could not get FCF directly, trying to calculate from components")
+        for period in cash_flow.columns:
+            try:
+                # Try to get Operating Cash Flow and Capital Expenditure
+                ocf = None
+                capex = None
+
+                # Look for Operating Cash Flow
+                for field in cash_flow.index:
+                    if any(term in field.lower() for term in ['operating', 'operations']):
+                        try:
+                            value = cash_flow.loc[field, period]
+                            if pd.notna(value):
+                                ocf = float(value)
+                                break
+                        except Exception as e:
+                            logger.debug(f"Error getting OCF from {field}: {str(e)}")
+                            continue
+
+                # Look for Capital Expenditure
+                if 'Capital Expenditure' in cash_flow.index:
+                    try:
+                        value = cash_flow.loc['Capital Expenditure', period]
+                        if pd.notna(value):
+                            capex = float(value)
+                    except Exception as e:
+                        logger.debug(f"Error getting CapEx: {str(e)}")
+
+                if capex is None:
+                    for field in cash_flow.index:
+                        if any(term in field.lower() for term in ['capex', 'capital expenditure', 'fixed assets']):
+                            try:
+                                value = cash_flow.loc[field, period]
+                                if pd.notna(value):
+                                    capex = float(value)
+                                    break
+                            except Exception as e:
+                                logger.debug(f"Error getting CapEx from {field}: {str(e)}")
+                                continue
+
+                if capex is None:
+                    logger.debug(f"Could not find CapEx for period {period}, using 0")
+                    capex = 0
+
+                if ocf is not None:
+                    fcf = ocf + capex  # CapEx is typically negative
+                    fcf_history.append(fcf)
+
+            except Exception as e:
+                logger.debug(f"Could not calculate FCF for period {period}: {str(e)}", exc_info=True)
+                continue
+
+    if not fcf_history:
+        raise ValueError("Could not calculate historical FCF. Available fields: " +
+                       ", ".join(cash_flow.index))
+
+    return fcf_history
+
+
+def _quality_metrics(income: pd.DataFrame, balance: pd.DataFrame, cash_flow: pd.DataFrame) -> Dict:
+    """FCF quality metrics from the latest statements (error defaults if they are incomplete)"""
+    try:
+        if any(df.empty for df in [income, balance, cash_flow]):
+            raise ValueError("Missing financial statements")
+
+        # Get latest values
+        net_income = None
+        for field in ['Net Income', 'Net Income Common Stockholders']:
+            if field in income.index:
+                net_income = float(income.loc[field].iloc[0])
+                break
+
+        if net_income is None:
+            raise ValueError("Could not find Net Income")
+
+        # Get FCF from cash flow
+        ocf = None
+        ocf_fields = [
+            'Total Cash From Operating Activities',
+            'Operating Cash Flow',
+            'Cash Flow From Operating Activities',
+            'Net Operating Cash Flow',
+            'Cash Flow from Operating Activities'
+        ]
+        for field in ocf_fields:
+            if field in cash_flow.index:
+                ocf = float(cash_flow.loc[field].iloc[0])
+                break
+
+        if ocf is None:
+            raise ValueError("Could not find Operating Cash Flow")
+
+        capex = 0
+        capex_fields = [
+            'Capital Expenditures',
+            'Purchase Of Plant And Equipment',
+            'Purchase Of Property And Equipment',
+            'Property Plant And Equipment',
+            'Capex',
+            'Capital Expenditure'
+        ]
+        for field in capex_fields:
+            if field in cash_flow.index:
+                capex = float(cash_flow.loc[field].iloc[0])
+                break
+
+        fcf = ocf + capex
+
+        # Get total debt
+        total_debt = 0
+        debt_fields = [
+            'Total Debt',
+            'Long Term Debt',
+            'Short Long Term Debt',
+            'Current Debt'
+        ]
+        for field in debt_fields:
+            if field in balance.index:
+                total_debt += float(balance.loc[field].iloc[0])
+
+        # Get working capital changes
+        wc_change = 0
+        wc_fields = [
+            'Change In Working Capital',
+            'Changes In Working Capital'
+        ]
+        for field in wc_fields:
+            if field in cash_flow.index:
+                wc_change = float(cash_flow.loc[field].iloc[0])
+                break
+
+        return ratings.quality_metrics(net_income, fcf, total_debt, wc_change)
+    except Exception as e:
+        logger.warning(f"Error calculating quality metrics: {str(e)}")
+        return dict(QUALITY_ERROR)
+
+
+def _reporting_fx(info: Dict, market: MarketSnapshot) -> float:
+    """Factor from the statements' currency to the quote currency (1.0 when equal or unknown)"""
+    reporting, quote = info.get('financialCurrency'), info.get('currency')
+    if reporting and quote and reporting != quote and market.fx_rate(reporting, quote) is None:
+        logger.warning(f"Sem câmbio {reporting}/{quote} nos parâmetros de mercado; valores não convertidos")
+    return market.statement_fx(reporting, quote)
+
+
+def _wacc(ticker: str, info: Dict, balance: pd.DataFrame, income: pd.DataFrame, market: MarketSnapshot) -> float:
+    """WACC with the rates of the ticker's country (the default WACC if the statements are incomplete)"""
+    try:
+        params = market.for_ticker(ticker)
+        if any(df.empty for df in [balance, income]):
+            raise ValueError("Missing financial statements")
+
+        beta = info.get('beta', 1.0)
+
+        # Get total debt
+        total_debt = 0
+        debt_fields = [
+            'Total Debt',
+            'Long Term Debt',
+            'Short Long Term Debt',
+            'Current Debt'
+        ]
+        for field in debt_fields:
+            if field in balance.index:
+                total_debt += float(balance.loc[field].iloc[0])
+
+        # Get interest expense
+        interest_expense = 0
+        interest_fields = [
+            'Interest Expense',
+            'Interest Expense Non Operating',
+            'Interest Expense Net'
+        ]
+        for field in interest_fields:
+            if field in income.index:
+                interest_expense += abs(float(income.loc[field].iloc[0]))
+
+        # Dívida na moeda das demonstrações; o valor de mercado na moeda da cotação
+        fx = _reporting_fx(info, market)
+        market_cap = info.get('marketCap', 0)
+        return ratings.wacc(
+            beta, total_debt * fx, interest_expense * fx, market_cap,
+            params.risk_free_rate, params.equity_risk_premium, params.tax_rate
+        )  # Return as percentage
+    except Exception as e:
+        logger.warning(f"Error calculating WACC: {str(e)}")
+        return ratings.DEFAULT_WACC  # Return default WACC of 8%
+
+
+def _dynamic_multiple(growth_rate: float, quality_metrics: Dict, wacc: float) -> float:
+    try:
+        return ratings.dynamic_multiple(growth_rate, quality_metrics, wacc)
+    except Exception as e:
+        logger.warning(f"Error calculating dynamic multiple: {str(e)}")
+        return 10.0  # Default to 10x multiple
+
+
+def _compute_snapshot(ticker: str, info: Dict, statements: Dict[str, pd.DataFrame],
+                      market: MarketSnapshot) -> FinancialSnapshot:
+    """The CPU part of a fetch: parse the statements and apply the valuation rules"""
+    cash_flow = statements['cash_flow']
+    if cash_flow.empty:
+        cash_flow = statements['quarterly_cash_flow']
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Available cash flow fields: {', '.join(cash_flow.index)}")
+
+    # Calculate historical FCF (in the quote currency, e.g. ADRs of Brazilian companies)
+    fx = _reporting_fx(info, market)
+    with span('parse_fcf', ticker=ticker):
+        fcf_history = FinancialSnapshot.history(fcf * fx for fcf in _parse_fcf_history(cash_flow))
+
+    # Calculate growth rate
+    growth_rate = ratings.cagr(fcf_history, len(fcf_history))
+    logger.debug(f"Calculated growth rate: {growth_rate:.2f}%")
+
+    # Calculate quality metrics
+    with span('quality_metrics', ticker=ticker):
+        quality_metrics = _quality_metrics(statements['income'], statements['balance'], statements['cash_flow'])
+    logger.debug("Calculated quality metrics")
+
+    # Calculate WACC
+    with span('wacc', ticker=ticker):
+        wacc = _wacc(ticker, info, statements['balance'], statements['income'], market)
+    logger.debug(f"Calculated WACC: {wacc:.2f}%")
+
+    # Get dynamic multiple
+    with span('multiple', ticker=ticker):
+        multiple = _dynamic_multiple(growth_rate, quality_metrics, wacc)
+    logger.debug(f"Suggested multiple: {multiple:.1f}x")
+
+    return FinancialSnapshot(
+        ticker=ticker,
+        current_price=float(info.get('currentPrice') or info.get('regularMarketPrice')),
+        shares_outstanding=float(info['sharesOutstanding']),
+        fcf_history=fcf_history,
+        growth_rate=float(growth_rate),
+        fcf_to_income=float(quality_metrics['fcf_to_income']),
+        debt_to_fcf=float(quality_metrics['debt_to_fcf']),
+        working_capital_change=float(quality_metrics['working_capital_change']),
+        wacc=float(wacc),
+        suggested_multiple=float(multiple),
+    )
+
+
+def _compute_chunk(chunk: List[Tuple]) -> List[Tuple[Optional[FinancialSnapshot], Optional[str]]]:
+    """Worker process side of the process mode: (snapshot, None) or (None, error) per ticker"""
+    results = []
+    for ticker, info, packed, market in chunk:
+        try:
+            statements = {name: _unpack_frame(arrays) for name, arrays in packed.items()}
+            results.append((_compute_snapshot(ticker, info, statements, market), None))
+        except Exception as e:
+            logger.error(f"Error computing {ticker}: {str(e)}")
+            results.append((None, str(e)))
+    return results
+
+
 class YahooFinanceAPI:
-    def __init__(self):
-        """Initialize the Yahoo Finance API wrapper"""
-        self._executor = ThreadPoolExecutor(max_workers=3)
-        print("Initialized YahooFinanceAPI")
+    def __init__(self, max_workers: int = 3, processes: int = 0, chunk_size: int = 16,
+                 hedge_after: Optional[float] = None):
+        """
+        Initialize the Yahoo Finance API wrapper. With processes > 0 the
+        fetches stay on the thread pool and the parsing and metrics run in
+        that many worker processes, chunk_size tickers per round trip.
+        A fetch still running after hedge_after seconds (default
+        YAHOO_HEDGE_AFTER_MS, off when 0) gets a duplicate on another thread.
+        """
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        if hedge_after is None:
+            hedge_after = float(os.environ.get('YAHOO_HEDGE_AFTER_MS') or 0) / 1000
+        self.hedge_after = hedge_after
+        self._last_good: 'OrderedDict[str, FinancialSnapshot]' = OrderedDict()
+        self._pool = None
+        if processes > 0:
+            from process_pool import ChunkedProcessPool
+            self._pool = ChunkedProcessPool(_compute_chunk, processes, chunk_size)
+        logger.debug("Initialized YahooFinanceAPI")
+
+    def close(self):
+        """Stop the worker processes (process mode only)"""
+        if self._pool is not None:
+            self._pool.close()
 
     def calculate_cagr(self, values: List[float], years: int) -> float:
         """Calculate Compound Annual Growth Rate"""
-        if len(values) < 2 or years < 1:
-            return 0.0
+        return ratings.cagr(values, years)
+
+    def _call_yahoo(self, request: Dict, fetch: Callable[[], object],
+                    encode: Optional[Callable] = None, decode: Optional[Callable] = None):
+        """One Yahoo request through the retry policy, the circuit breaker and the transport, counted in metrics"""
         try:
-            start_value = values[-1]  # Oldest value
-            end_value = values[0]     # Newest value
-            if start_value <= 0:
-                return 0.0
-            return (pow(end_value / start_value, 1/years) - 1) * 100
-        except Exception:
-            return 0.0
+            value = get_policy('yahoo').call_sync(lambda: get_upstream('yahoo').call_sync(
+                lambda: get_transport().call_sync('yahoo', request, fetch, encode=encode, decode=decode)
+            ))
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
+        except Exception as e:
+            metrics.record_upstream('yahoo', e)
+            raise
+        metrics.record_upstream('yahoo')
+        return value
+
+    def _statement(self, stock: yf.Ticker, name: str):
+        """Access a yfinance attribute (fetched lazily on first access), timing the fetch"""
+        with span(f'fetch.{name}', ticker=stock.ticker):
+            return self._call_yahoo(
+                {'ticker': stock.ticker, 'attribute': name}, lambda: getattr(stock, name),
+                encode=_encode_attribute, decode=_decode_attribute
+            )
+
+    def _statements(self, stock: yf.Ticker, names=('income', 'balance', 'cash_flow')) -> Dict[str, pd.DataFrame]:
+        """Latest statements by name; one that fails to load comes back empty"""
+        attributes = {
+            'income': ('income_stmt', 'financials'),  # Try income_stmt first, fall back to financials
+            'balance': ('balance_sheet',),
+            'cash_flow': ('cashflow',),
+            'quarterly_cash_flow': ('quarterly_cashflow',),
+        }
+        statements = {}
+        for name in names:
+            frame = pd.DataFrame()
+            for attribute in attributes[name]:
+                try:
+                    frame = self._statement(stock, attribute)
+                except Exception as e:
+                    # Limitação ou circuito aberto: falha o ticker em vez de seguir com métricas padrão
+                    if isinstance(e, (CircuitOpenError, DeadlineExceeded)) or is_overload(e):
+                        raise
+                    logger.warning(f"Error getting {attribute}: {str(e)}")
+                    continue
+                if not frame.empty:
+                    break
+            statements[name] = frame
+        return statements
 
     def calculate_quality_metrics(self, stock: yf.Ticker) -> Dict:
         """Calculate FCF quality metrics"""
-        try:
-            # Get financial statements
-            income = stock.income_stmt  # Try income_stmt first
-            if income.empty:
-                income = stock.financials  # Fall back to financials
-                
-            balance = stock.balance_sheet
-            cash_flow = stock.cashflow
-
-            if any(df.empty for df in [income, balance, cash_flow]):
-                raise ValueError("Missing financial statements")
-
-            # Get latest values
-            net_income = None
-            for field in ['Net Income', 'Net Income Common Stockholders']:
-                if field in income.index:
-                    net_income = float(income.loc[field].iloc[0])
-                    break
-            
-            if net_income is None:
-                raise ValueError("Could not find Net Income")
-
-            # Get FCF from cash flow
-            ocf = None
-            ocf_fields = [
-                'Total Cash From Operating Activities',
-                'Operating Cash Flow',
-                'Cash Flow From Operating Activities',
-                'Net Operating Cash Flow',
-                'Cash Flow from Operating Activities'
-            ]
-            for field in ocf_fields:
-                if field in cash_flow.index:
-                    ocf = float(cash_flow.loc[field].iloc[0])
-                    break
-            
-            if ocf is None:
-                raise ValueError("Could not find Operating Cash Flow")
-
-            capex = 0
-            capex_fields = [
-                'Capital Expenditures',
-                'Purchase Of Plant And Equipment',
-                'Purchase Of Property And Equipment',
-                'Property Plant And Equipment',
-                'Capex',
-                'Capital Expenditure'
-            ]
-            for field in capex_fields:
-                if field in cash_flow.index:
-                    capex = float(cash_flow.loc[field].iloc[0])
-                    break
+        statements = self._statements(stock)
+        return _quality_metrics(statements['income'], statements['balance'], statements['cash_flow'])
 
-            fcf = ocf + capex
-
-            # Get total debt
-            total_debt = 0
-            debt_fields = [
-                'Total Debt',
-                'Long Term Debt',
-                'Short Long Term Debt',
-                'Current Debt'
-            ]
-            for field in debt_fields:
-                if field in balance.index:
-                    total_debt += float(balance.loc[field].iloc[0])
-            
-            # Calculate metrics
-            fcf_to_income = (fcf / net_income * 100) if net_income != 0 else 0
-            debt_to_fcf = total_debt / fcf if fcf != 0 else float('inf')
-            
-            # Get working capital changes
-            wc_change = 0
-            wc_fields = [
-                'Change In Working Capital',
-                'Changes In Working Capital'
-            ]
-            for field in wc_fields:
-                if field in cash_flow.index:
-                    wc_change = float(cash_flow.loc[field].iloc[0])
-                    break
-            
-            return {
-                'fcf_to_income': fcf_to_income,
-                'debt_to_fcf': debt_to_fcf,
-                'working_capital_change': wc_change
-            }
-        except Exception as e:
-            print(f"Error calculating quality metrics: {str(e)}")
-            return {
-                'fcf_to_income': 0,
-                'debt_to_fcf': float('inf'),
-                'working_capital_change': 0
-            }
-
-    def calculate_wacc(self, stock: yf.Ticker) -> float:
-        """Calculate Weighted Average Cost of Capital"""
+    def calculate_wacc(self, stock: yf.Ticker, market: Optional[MarketSnapshot] = None) -> float:
+        """Calculate Weighted Average Cost of Capital with the rates of the ticker's country"""
         try:
-            info = stock.info
-            balance = stock.balance_sheet
-            income = stock.income_stmt
-            if income.empty:
-                income = stock.financials
-
-            if any(df.empty for df in [balance, income]):
-                raise ValueError("Missing financial statements")
-
-            # Cost of Equity using CAPM
-            risk_free_rate = 0.0425  # 10-year Treasury yield (approximate)
-            market_premium = 0.06     # Historical market risk premium
-            beta = info.get('beta', 1.0)
-            cost_of_equity = risk_free_rate + (beta * market_premium)
-
-            # Get total debt
-            total_debt = 0
-            debt_fields = [
-                'Total Debt',
-                'Long Term Debt',
-                'Short Long Term Debt',
-                'Current Debt'
-            ]
-            for field in debt_fields:
-                if field in balance.index:
-                    total_debt += float(balance.loc[field].iloc[0])
-
-            # Get interest expense
-            interest_expense = 0
-            interest_fields = [
-                'Interest Expense',
-                'Interest Expense Non Operating',
-                'Interest Expense Net'
-            ]
-            for field in interest_fields:
-                if field in income.index:
-                    interest_expense += abs(float(income.loc[field].iloc[0]))
-
-            # Cost of Debt
-            cost_of_debt = (interest_expense / total_debt) if total_debt > 0 else 0
-            tax_rate = 0.21  # Approximate corporate tax rate
-            after_tax_cost_of_debt = cost_of_debt * (1 - tax_rate)
-
-            # Capital Structure
-            market_cap = info.get('marketCap', 0)
-            total_capital = market_cap + total_debt
-            equity_weight = market_cap / total_capital if total_capital > 0 else 1
-            debt_weight = 1 - equity_weight
-
-            # WACC
-            wacc = (cost_of_equity * equity_weight) + (after_tax_cost_of_debt * debt_weight)
-            return wacc * 100  # Return as percentage
+            info = self._statement(stock, 'info')
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
-            print(f"Error calculating WACC: {str(e)}")
-            return 8.0  # Return default WACC of 8%
+            logger.warning(f"Error calculating WACC: {str(e)}")
+            return ratings.DEFAULT_WACC
+        statements = self._statements(stock, ('income', 'balance'))
+        market = market or get_market_params().snapshot()
+        return _wacc(stock.ticker, info, statements['balance'], statements['income'], market)
 
     def get_dynamic_multiple(self, growth_rate: float, quality_metrics: Dict, wacc: float) -> float:
         """Calculate dynamic FCF multiple based on growth and quality"""
-        try:
-            # Base multiple based on growth rate
-            if growth_rate > 15:
-                base_multiple = 15
-            elif growth_rate > 10:
-                base_multiple = 12
-            elif growth_rate > 5:
-                base_multiple = 10
-            else:
-                base_multiple = 8
-
-            # Adjust for FCF quality
-            quality_score = 1.0
-            if quality_metrics['fcf_to_income'] > 90:
-                quality_score += 0.2
-            elif quality_metrics['fcf_to_income'] < 70:
-                quality_score -= 0.2
-
-            if quality_metrics['debt_to_fcf'] < 3:
-                quality_score += 0.2
-            elif quality_metrics['debt_to_fcf'] > 5:
-                quality_score -= 0.2
-
-            # Adjust for WACC
-            wacc_adjustment = 1.0
-            if wacc < 8:
-                wacc_adjustment = 1.1
-            elif wacc > 12:
-                wacc_adjustment = 0.9
-
-            return base_multiple * quality_score * wacc_adjustment
-        except Exception as e:
-            print(f"Error calculating dynamic multiple: {str(e)}")
-            return 10.0  # Default to 10x multiple
+        return _dynamic_multiple(growth_rate, quality_metrics, wacc)
 
-    def _get_data_sync(self, ticker: str) -> Dict:
-        """Synchronously fetch stock data"""
-        try:
-            stock = yf.Ticker(ticker)
-            print(f"Fetching data for {ticker}")
-            
-            # Get basic info
-            info = stock.info
-            current_price = info.get('currentPrice') or info.get('regularMarketPrice')
-            shares_outstanding = info.get('sharesOutstanding')
-            
-            if not current_price or not shares_outstanding:
-                raise ValueError("Could not get basic stock information")
+    def _fetch_sync(self, ticker: str) -> Tuple[Dict, Dict[str, pd.DataFrame]]:
+        """The network part of a fetch: the info fields and statements used by _compute_snapshot"""
+        stock = yf.Ticker(ticker)
+        logger.debug(f"Fetching data for {ticker}")
 
-            # Get financial statements
-            print("Fetching financial statements...")
-            
-            # Try different approaches to get cash flow data
-            cash_flow = None
-            try:
-                print("Trying annual cash flow...")
-                cf = stock.cashflow
-                if not cf.empty:
-                    cash_flow = cf
-                    print("Got annual cash flow data")
-                    print(cash_flow)
-            except Exception as e:
-                print(f"Error getting annual cash flow: {str(e)}")
-                
-            if cash_flow is None:
-                try:
-                    print("Trying quarterly cash flow...")
-                    cf = stock.quarterly_cashflow
-                    if not cf.empty:
-                        cash_flow = cf
-                        print("Got quarterly cash flow data")
-                        print(cash_flow)
-                except Exception as e:
-                    print(f"Error getting quarterly cash flow: {str(e)}")
+        # Get basic info
+        info = self._statement(stock, 'info')
+        current_price = info.get('currentPrice') or info.get('regularMarketPrice')
+        shares_outstanding = info.get('sharesOutstanding')
 
-            if cash_flow is None:
-                raise ValueError("No cash flow data available")
+        if not current_price or not shares_outstanding:
+            raise ValueError("Could not get basic stock information")
 
-            print("\nAvailable cash flow fields:")
-            for field in cash_flow.index:
-                print(f"  - {field}")
+        # Get financial statements
+        logger.debug("Fetching financial statements...")
+        statements = self._statements(stock)
 
-            # Calculate historical FCF
-            fcf_history = []
-            
-            # Try to get FCF directly first
-            if 'Free Cash Flow' in cash_flow.index:
-                print("\nFound Free Cash Flow field, using it directly")
-                for period in cash_flow.columns:
-                    try:
-                        value = cash_flow.loc['Free Cash Flow', period]
-                        if pd.notna(value):
-                            fcf = float(value)
-                            print(f"Period {period}: FCF = {fcf:,.2f}")
-                            fcf_history.append(fcf)
-                    except Exception as e:
-                        print(f"Error getting FCF for period {period}: {str(e)}")
-                        continue
-            
-            # If we couldn't get FCF directly, try calculating it
-            if not fcf_history:
-                print("\nCould not get FCF directly, trying to calculate from components")
-                for period in cash_flow.columns:
-                    try:
-                        print(f"\nAnalyzing period: {period}")
-                        
-                        # Try to get Operating Cash Flow and Capital Expenditure
-                        ocf = None
-                        capex = None
-                        
-                        # Look for Operating Cash Flow
-                        for field in cash_flow.index:
-                            if any(term in field.lower() for term in ['operating', 'operations']):
-                                try:
-                                    value = cash_flow.loc[field, period]
-                                    if pd.notna(value):
-                                        ocf = float(value)
-                                        print(f"Found OCF in field '{field}': {ocf:,.2f}")
-                                        break
-                                except Exception as e:
-                                    print(f"Error getting OCF from {field}: {str(e)}")
-                                    continue
-                        
-                        # Look for Capital Expenditure
-                        if 'Capital Expenditure' in cash_flow.index:
-                            try:
-                                value = cash_flow.loc['Capital Expenditure', period]
-                                if pd.notna(value):
-                                    capex = float(value)
-                                    print(f"Found CapEx: {capex:,.2f}")
-                            except Exception as e:
-                                print(f"Error getting CapEx: {str(e)}")
-                        
-                        if capex is None:
-                            for field in cash_flow.index:
-                                if any(term in field.lower() for term in ['capex', 'capital expenditure', 'fixed assets']):
-                                    try:
-                                        value = cash_flow.loc[field, period]
-                                        if pd.notna(value):
-                                            capex = float(value)
-                                            print(f"Found CapEx in field '{field}': {capex:,.2f}")
-                                            break
-                                    except Exception as e:
-                                        print(f"Error getting CapEx from {field}: {str(e)}")
-                                        continue
-                        
-                        if capex is None:
-                            print(f"Could not find CapEx for period {period}, using 0")
-                            capex = 0
-                        
-                        if ocf is not None:
-                            fcf = ocf + capex  # CapEx is typically negative
-                            print(f"Calculated FCF: {fcf:,.2f}")
-                            fcf_history.append(fcf)
-                        
-                    except Exception as e:
-                        print(f"Could not calculate FCF for period {period}: {str(e)}")
-                        print(f"Traceback: {traceback.format_exc()}")
-                        continue
-
-            if not fcf_history:
-                raise ValueError("Could not calculate historical FCF. Available fields: " + 
-                               ", ".join(cash_flow.index))
+        # Without annual cash flow data, the FCF comes from the quarterly statement
+        if statements['cash_flow'].empty:
+            statements.update(self._statements(stock, ('quarterly_cash_flow',)))
+            if statements['quarterly_cash_flow'].empty:
+                raise ValueError("No cash flow data available")
+            logger.debug("Got quarterly cash flow data")
 
-            # Calculate growth rate
-            growth_rate = self.calculate_cagr(fcf_history, len(fcf_history))
-            print(f"Calculated growth rate: {growth_rate:.2f}%")
-            
-            # Calculate quality metrics
-            quality_metrics = self.calculate_quality_metrics(stock)
-            print("Calculated quality metrics")
-            
-            # Calculate WACC
-            wacc = self.calculate_wacc(stock)
-            print(f"Calculated WACC: {wacc:.2f}%")
-            
-            # Get dynamic multiple
-            multiple = self.get_dynamic_multiple(growth_rate, quality_metrics, wacc)
-            print(f"Suggested multiple: {multiple:.1f}x")
+        return {field: info.get(field) for field in INFO_FIELDS if field in info}, statements
 
-            # Current FCF
-            latest_fcf = fcf_history[0]
-            
-            # Prepare final data
-            data = {
-                'cash_flow': {
-                    'free_cashflow': {
-                        'latest': latest_fcf,
-                        'history': fcf_history,
-                        'growth_rate': growth_rate
-                    },
-                    'quality': quality_metrics
-                },
-                'market_data': {
-                    'shares_outstanding': shares_outstanding,
-                    'current_price': current_price
-                },
-                'valuation': {
-                    'wacc': wacc,
-                    'suggested_multiple': multiple
-                }
-            }
-            
-            return data
-            
+    def _get_data_sync(self, ticker: str) -> FinancialSnapshot:
+        """Synchronously fetch stock data"""
+        try:
+            info, statements = self._fetch_sync(ticker)
+            return _compute_snapshot(ticker, info, statements, get_market_params().snapshot())
+        except (CircuitOpenError, DeadlineExceeded):
+            raise  # Registrado uma vez, ao abrir o circuito
         except Exception as e:
-            print(f"Error in _get_data_sync for {ticker}: {str(e)}")
-            print(f"Traceback: {traceback.format_exc()}")
+            logger.error(f"Error in _get_data_sync for {ticker}: {str(e)}")
+            logger.debug("Traceback", exc_info=True)
             raise
 
-    async def _get_stock_data(self, ticker: str) -> Dict:
+    async def _get_stock_data(self, ticker: str) -> FinancialSnapshot:
         """Asynchronously fetch stock data"""
         try:
-            print(f"Starting data fetch for {ticker}")
-            loop = asyncio.get_running_loop()
-            return await loop.run_in_executor(self._executor, self._get_data_sync, ticker)
+            logger.debug(f"Starting data fetch for {ticker}")
+            # Busca lenta demais: uma cópia em outra thread após hedge_after; vale a que terminar primeiro.
+            # A thread que perde não é interrompida: ela para antes da próxima consulta ao Yahoo
+            if self._pool is None:
+                return await hedged(
+                    lambda: run_in_thread(self._executor, self._get_data_sync, ticker),
+                    self.hedge_after, 'yahoo'
+                )
+
+            # Modo com processos: a busca fica nas threads e o cálculo vai para os processos, em blocos
+            info, statements = await hedged(
+                lambda: run_in_thread(self._executor, self._fetch_sync, ticker),
+                self.hedge_after, 'yahoo'
+            )
+            packed = {name: _pack_frame(frame) for name, frame in statements.items()}
+            statements = None
+            with span('yahoo.compute', ticker=ticker):
+                return await self._pool.submit((ticker, info, packed, get_market_params().snapshot()))
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
         except Exception as e:
-            print(f"Error in _get_stock_data for {ticker}: {str(e)}")
+            logger.error(f"Error in _get_stock_data for {ticker}: {str(e)}")
             raise
 
+    def _get_price_history_sync(self, stock: yf.Ticker, period: str):
+        """Daily history (yf.Ticker.history) over period, e.g. '10y'"""
+        with span('fetch.history', ticker=stock.ticker, period=period):
+            return self._call_yahoo(
+                {'ticker': stock.ticker, 'attribute': 'history', 'period': period},
+                lambda: stock.history(period=period, auto_adjust=True),
+                encode=_encode_attribute, decode=_decode_attribute
+            )
+
+    def _get_fundamentals_sync(self, ticker: str, price_period: Optional[str] = None) -> Dict[str, List[Dict]]:
+        """Fetch the statements of one ticker (and the price history, if asked) as fundamentals_store rows"""
+        stock = yf.Ticker(ticker)
+        info = self._statement(stock, 'info')
+        statements = self._statements(stock)
+        prices = self._get_price_history_sync(stock, price_period) if price_period else None
+        return fundamentals_store.extract(ticker, statements, info, prices=prices)
+
+    async def get_fundamentals(self, ticker: str, price_period: Optional[str] = None) -> Dict[str, List[Dict]]:
+        """Statements of one ticker reduced to plain rows for the columnar store"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        with span('yahoo.get_fundamentals', ticker=ticker):
+            return await loop.run_in_executor(
+                self._executor, context.run, self._get_fundamentals_sync, ticker, price_period
+            )
+
+    def _get_price_sync(self, ticker: str) -> float:
+        """Synchronously fetch only the latest price (much cheaper than the statements)"""
+        stock = yf.Ticker(ticker)
+        try:
+            price = self._call_yahoo(
+                {'ticker': ticker, 'attribute': 'fast_info.last_price'}, lambda: stock.fast_info.last_price
+            )
+        except (CircuitOpenError, DeadlineExceeded):
+            raise
+        except Exception:
+            price = None  # Tenta o info abaixo
+        if not price:
+            info = self._statement(stock, 'info')
+            price = info.get('currentPrice') or info.get('regularMarketPrice')
+        if not price:
+            raise ValueError(f"Could not get price for {ticker}")
+        return float(price)
+
+    async def get_current_price(self, ticker: str) -> float:
+        """Get the latest price for a stock"""
+        loop = asyncio.get_running_loop()
+        # O contexto leva o prazo da requisição para a thread
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, context.run, self._get_price_sync, ticker)
+
+    async def get_snapshot(self, ticker: str) -> FinancialSnapshot:
+        """Get financial data for a stock as a compact FinancialSnapshot"""
+        try:
+            with span('yahoo.get_financials', ticker=ticker):
+                snapshot = await self._get_stock_data(ticker)
+        except Exception as e:
+            stale = self._last_good.get(ticker) if isinstance(e, (CircuitOpenError, DeadlineExceeded)) or is_overload(e) else None
+            if stale is not None:
+                logger.warning(f"Yahoo Finance indisponível para {ticker}; usando os últimos dados obtidos ({str(e)})")
+                return stale
+            logger.error(f"Error in get_financials for {ticker}: {str(e)}")
+            raise Exception(f"Failed to fetch Yahoo Finance data: {str(e)}")
+        self._last_good[ticker] = snapshot
+        self._last_good.move_to_end(ticker)
+        if len(self._last_good) > STALE_ENTRIES:
+            self._last_good.popitem(last=False)
+        return snapshot
+
     async def get_financials(self, ticker: str) -> Dict:
         """
         Get financial data for a stock
@@ -413,11 +601,6 @@ class YahooFinanceAPI:
             ticker (str): Stock ticker symbol
             
         Returns:
-            Dict containing processed financial data
+            Dict containing processed financial data (FinancialSnapshot.as_dict layout)
         """
-        try:
-            data = await self._get_stock_data(ticker)
-            return data
-        except Exception as e:
-            print(f"Error in get_financials for {ticker}: {str(e)}")
-            raise Exception(f"Failed to fetch Yahoo Finance data: {str(e)}")
+        return (await self.get_snapshot(ticker)).as_dict()